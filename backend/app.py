@@ -1,10 +1,20 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 from flask_migrate import Migrate
 from config import config
 from models import db, User
+from utils.cache import calendar_cache
+from utils import ical
+from utils.auth import user_version_cache
+from utils.password import password_hasher
+from utils.image_variants import MANIFEST_SUFFIX
+from utils.file_storage import get_storage
+from utils.job_queue import job_queue
+from utils.recurrence import occurrence_cache
+from werkzeug.security import safe_join
+import mimetypes
 import os
 
 
@@ -20,6 +30,18 @@ def create_app(config_name='default'):
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     jwt = JWTManager(app)
     migrate = Migrate(app, db)
+    calendar_cache.resize(app.config['CALENDAR_CACHE_SIZE'])
+    ical.feed_cache.resize(app.config['ICAL_FEED_CACHE_SIZE'])
+    ical.vevent_cache.resize(app.config['ICAL_EVENT_CACHE_SIZE'])
+    occurrence_cache.resize(app.config['RECURRENCE_CACHE_SIZE'])
+    user_version_cache.ttl = app.config['USER_VERSION_CACHE_TTL']
+    job_queue.init_app(app)
+    password_hasher.configure(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_QUEUE_DEPTH'],
+        app.config['PASSWORD_HASH_TIMEOUT']
+    )
     
     # JWT 错误处理
     @jwt.invalid_token_loader
@@ -51,15 +73,16 @@ def create_app(config_name='default'):
         RefreshTokenResource, UserProfileResource
     )
     from resources.events import (
-        EventListResource, EventDetailResource,
-        EventCalendarResource, ImageUploadResource, UpcomingEventsResource
+        EventListResource, EventDetailResource, EventImportResource, EventExportResource, EventConflictResource,
+        EventCalendarResource, CalendarFeedResource, ImageUploadResource, UpcomingEventsResource
     )
     from resources.members import (
-        MemberListResource, MemberDetailResource, MemberStatsResource
+        MemberListResource, MemberDetailResource, MemberStatsResource, MemberImportResource
     )
     from resources.analytics import (
         AnalyticsOverviewResource, AnalyticsEventsResource, AnalyticsMembersResource
     )
+    from resources.metrics import MetricsResource
     
     # 认证相关路由
     api.add_resource(RegisterResource, '/auth/register')
@@ -70,13 +93,18 @@ def create_app(config_name='default'):
     
     # 日程相关路由
     api.add_resource(EventListResource, '/events')
+    api.add_resource(EventImportResource, '/events/import')
+    api.add_resource(EventExportResource, '/events/export')
+    api.add_resource(EventConflictResource, '/events/conflicts')
     api.add_resource(EventDetailResource, '/events/<int:event_id>')
     api.add_resource(EventCalendarResource, '/calendar')
+    api.add_resource(CalendarFeedResource, '/calendar.ics')
     api.add_resource(ImageUploadResource, '/upload/image')
     api.add_resource(UpcomingEventsResource, '/events/upcoming')
     
     # 人员管理路由
     api.add_resource(MemberListResource, '/members')
+    api.add_resource(MemberImportResource, '/members/import')
     api.add_resource(MemberDetailResource, '/members/<int:member_id>')
     api.add_resource(MemberStatsResource, '/members/stats')
     
@@ -85,6 +113,9 @@ def create_app(config_name='default'):
     api.add_resource(AnalyticsEventsResource, '/analytics/events')
     api.add_resource(AnalyticsMembersResource, '/analytics/members')
     
+    # 运行指标路由
+    api.add_resource(MetricsResource, '/metrics')
+    
     # 错误处理
     @app.errorhandler(404)
     def not_found(error):
@@ -100,19 +131,60 @@ def create_app(config_name='default'):
         return jsonify({'status': 'ok', 'message': 'QD-Calendar API is running'}), 200
     
     # 静态文件服务 - 提供上传的图片访问
+    if app.config['UPLOADS_SENDFILE'] == 'x-sendfile':
+        # send_file 只返回 X-Sendfile 头，由 Apache / lighttpd 发送文件内容
+        app.config['USE_X_SENDFILE'] = True
+    
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        """提供上传文件的访问"""
-        upload_folder = app.config['UPLOAD_FOLDER']
-        # 如果是相对路径，转换为绝对路径
-        if not os.path.isabs(upload_folder):
-            backend_dir = os.path.dirname(os.path.abspath(__file__))
-            upload_folder = os.path.join(backend_dir, upload_folder)
+        """
+        提供上传文件的访问
+        
+        上传文件名按内容哈希或唯一 ID 生成，内容永不改变，图片响应带
+        Cache-Control: immutable 长期缓存；支持条件请求（ETag / Last-Modified）和 Range 请求。
+        配置 UPLOADS_SENDFILE 后交给前端 Web 服务器发送文件内容。
+        """
+        # 临时目录和衍生图清单不对外提供
+        if filename.startswith('.') or '/.' in filename or filename.endswith(MANIFEST_SUFFIX):
+            return jsonify({'message': '资源不存在'}), 404
+        
+        immutable = '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+        max_age = app.config['UPLOADS_MAX_AGE'] if immutable else None
+        storage = get_storage()
+        upload_folder = storage.backend.local_path('')
         
-        return send_from_directory(upload_folder, filename)
+        if upload_folder is None:
+            # 非本地后端：从后端读取后发送（send_file 同样处理条件请求和 Range）
+            try:
+                file_obj = storage.backend.open(filename)
+            except FileNotFoundError:
+                return jsonify({'message': '资源不存在'}), 404
+            response = send_file(
+                file_obj, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                etag=filename, max_age=max_age
+            )
+        elif app.config['UPLOADS_SENDFILE'] == 'x-accel':
+            # Nginx internal location 负责发送文件，也由它处理条件请求和 Range
+            file_path = safe_join(upload_folder, filename)
+            if not file_path or not os.path.isfile(file_path):
+                return jsonify({'message': '资源不存在'}), 404
+            
+            response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = f"{app.config['UPLOADS_ACCEL_PREFIX'].rstrip('/')}/{filename}"
+        else:
+            response = send_from_directory(upload_folder, filename, max_age=max_age)
+        
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['UPLOADS_MAX_AGE']
+            response.cache_control.immutable = True
+        return response
     
     # 创建数据库表和初始管理员用户
     with app.app_context():
+        # 启动时创建文件存储实例，存储配置错误（如 s3 后端未安装 boto3）时立即报错
+        get_storage()
+        
         db.create_all()
         
         # 检查是否存在管理员账户
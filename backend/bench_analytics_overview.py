@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+数据分析总览基准测试
+
+在一个临时数据库中生成一年的日程与参与人员，对一个月的总览统计分别计时并统计 SQL 语句数：
+- legacy：原先的七条独立查询（每条都重新按月份过滤 events）
+- engine：条件聚合引擎（ANALYTICS_USE_ROLLUP=false）
+- rollup：每日统计汇总表（ANALYTICS_USE_ROLLUP=true）
+
+运行方式：
+python bench_analytics_overview.py [--events 50000] [--members 2000] [--runs 60] [--database-url sqlite:////tmp/bench.db]
+
+--database-url 必须指向空数据库，默认在临时目录中创建 SQLite 数据库。
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import event as sa_event, func
+from app import create_app
+import config as app_config
+from models import db, Event, Member, User, event_members
+from utils import analytics_rollup
+from utils.analytics_engine import STATUSES, PRIORITIES, daily_overview, sum_records
+
+BATCH_SIZE = 5000
+YEAR = 2025
+
+
+def make_config(database_url):
+    class BenchConfig(app_config.Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        JOB_QUEUE_PATH = os.path.join(tempfile.mkdtemp(prefix='qd-bench-jobs-'), 'jobs.sqlite3')
+        JOB_QUEUE_WORKERS = 0
+    
+    app_config.config['bench'] = BenchConfig
+    return 'bench'
+
+
+def seed(event_count, member_count, rng):
+    """批量生成人员、日程（全年随机分布）和参与关系，并重建每日统计汇总"""
+    user = User(username='bench', password_hash='-', role='admin')
+    db.session.add(user)
+    db.session.execute(Member.__table__.insert(), [
+        {'name': f'成员{i}', 'is_active': True} for i in range(member_count)
+    ])
+    db.session.commit()
+    member_ids = [member_id for member_id, in db.session.query(Member.id)]
+    
+    first_day = date(YEAR, 1, 1)
+    for offset in range(0, event_count, BATCH_SIZE):
+        size = min(BATCH_SIZE, event_count - offset)
+        db.session.execute(Event.__table__.insert(), [
+            {
+                'title': f'日程{offset + i}',
+                'event_date': first_day + timedelta(days=rng.randrange(365)),
+                'status': rng.choice(STATUSES),
+                'priority': rng.choice(PRIORITIES),
+                'created_by': user.id,
+                'revision': 0
+            }
+            for i in range(size)
+        ])
+        event_ids = [
+            event_id for event_id, in
+            db.session.query(Event.id).order_by(Event.id.desc()).limit(size)
+        ]
+        db.session.execute(event_members.insert(), [
+            {'event_id': event_id, 'member_id': member_id}
+            for event_id in event_ids
+            for member_id in rng.sample(member_ids, rng.randrange(6))
+        ])
+        db.session.commit()
+        print(f"[INFO] Seeded {offset + size} events")
+    
+    written = analytics_rollup.rebuild(first_day, date(YEAR, 12, 31))
+    print(f"[INFO] Rebuilt {written} daily stat rows")
+
+
+def legacy_overview(start_date, end_date):
+    """原先的实现：七条查询各自按月份过滤"""
+    in_month = (Event.event_date >= start_date, Event.event_date < end_date)
+    total_events = Event.query.filter(*in_month).count()
+    completed_events = Event.query.filter(*in_month, Event.status == 'completed').count()
+    total_participants = db.session.query(
+        func.count(event_members.c.member_id)
+    ).join(Event, Event.id == event_members.c.event_id).filter(*in_month).scalar() or 0
+    unique_participants = db.session.query(
+        func.count(func.distinct(event_members.c.member_id))
+    ).join(Event, Event.id == event_members.c.event_id).filter(*in_month).scalar() or 0
+    status_stats = db.session.query(
+        Event.status, func.count(Event.id)
+    ).filter(*in_month).group_by(Event.status).all()
+    priority_stats = db.session.query(
+        Event.priority, func.count(Event.id)
+    ).filter(*in_month).group_by(Event.priority).all()
+    daily_stats = db.session.query(
+        Event.event_date, func.count(Event.id)
+    ).filter(*in_month).group_by(Event.event_date).order_by(Event.event_date).all()
+    return {
+        'total_events': total_events,
+        'completed_events': completed_events,
+        'total_participants': total_participants,
+        'unique_participants': unique_participants,
+        'status': {status: count for status, count in status_stats},
+        'priority': {priority: count for priority, count in priority_stats},
+        'daily': [(stat_date, count) for stat_date, count in daily_stats]
+    }
+
+
+def current_overview(start_date, end_date):
+    """现在的实现（与 AnalyticsOverviewResource 相同的数据来源）"""
+    overview = daily_overview(start_date, end_date)
+    totals = sum_records(record for _, record in overview['daily'])
+    return {
+        'total_events': totals['total_events'],
+        'completed_events': totals['completed_count'],
+        'total_participants': overview['total_participants'],
+        'unique_participants': overview['unique_participants'],
+        'status': {status: totals[f'{status}_count'] for status in STATUSES if totals[f'{status}_count']},
+        'priority': {priority: totals[f'{priority}_count'] for priority in PRIORITIES if totals[f'{priority}_count']},
+        'daily': [
+            (stat_date, record['total_events'])
+            for stat_date, record in overview['daily'] if record['total_events']
+        ]
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(fn, months, runs):
+    """返回 (每次调用的 SQL 语句数, 各次耗时毫秒, 各月份结果)"""
+    statements = []
+    
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    results = [fn(*month) for month in months]  # 预热
+    db.session.rollback()
+    sa_event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        samples = []
+        for run in range(runs):
+            start_date, end_date = months[run % len(months)]
+            started = time.perf_counter()
+            fn(start_date, end_date)
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', count_statement)
+    return len(statements) / runs, samples, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据分析总览基准测试')
+    parser.add_argument('--events', type=int, default=50000, help='生成的日程数量（全年随机分布）')
+    parser.add_argument('--members', type=int, default=2000, help='生成的人员数量')
+    parser.add_argument('--runs', type=int, default=60, help='每种实现的计时次数（轮流统计 12 个月）')
+    parser.add_argument('--database-url', help='空数据库的连接地址（默认临时 SQLite 文件）')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    args = parser.parse_args()
+    
+    database_url = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='qd-bench-'), 'bench.db'
+    )
+    app = create_app(make_config(database_url))
+    
+    with app.app_context():
+        db.create_all()
+        if Event.query.first() is not None:
+            parser.error('--database-url 指向的数据库中已有日程数据')
+        
+        print(f"[INFO] Database: {database_url}")
+        seed(args.events, args.members, random.Random(args.seed))
+        
+        months = [
+            (date(YEAR, month, 1), date(YEAR + month // 12, month % 12 + 1, 1))
+            for month in range(1, 13)
+        ]
+        
+        results = {}
+        print(f"\n{'path':<10}{'queries':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, use_rollup, fn in (
+            ('legacy', None, legacy_overview),
+            ('engine', False, current_overview),
+            ('rollup', True, current_overview)
+        ):
+            if use_rollup is not None:
+                app.config['ANALYTICS_USE_ROLLUP'] = use_rollup
+            queries, samples, results[name] = measure(fn, months, args.runs)
+            print(f"{name:<10}{queries:>9.1f}{statistics.median(samples):>10.2f}"
+                  f"{percentile(samples, 95):>10.2f}{max(samples):>10.2f}")
+        
+        same = results['legacy'] == results['engine'] == results['rollup']
+        print(f"\n[{'SUCCESS' if same else 'ERROR'}] Results of all paths {'match' if same else 'differ'}")
+
+
+if __name__ == '__main__':
+    main()
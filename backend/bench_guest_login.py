@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+游客登录基准测试
+
+在一个临时数据库中模拟来自不同 IP 的游客连续登录，统计每次登录的 SQL 语句数、耗时与吞吐量：
+- legacy：原先的实现（按 IP 查找 guest_<ip> 用户，新 IP 插入用户记录并计算密码哈希）
+- stateless：现在的 POST /api/auth/guest-login（签发无状态游客令牌）
+
+两者都通过测试客户端走完整的请求处理，最后校验游客令牌可以读取日程、不能创建日程。
+
+运行方式：
+python bench_guest_login.py [--logins 200] [--database-url sqlite:////tmp/bench.db]
+
+--database-url 必须指向空数据库，默认在临时目录中创建 SQLite 数据库。
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from flask import request
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event
+from werkzeug.security import generate_password_hash
+from app import create_app
+import config as app_config
+from models import db, User
+
+
+def make_config(database_url):
+    class BenchConfig(app_config.Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        JOB_QUEUE_PATH = os.path.join(tempfile.mkdtemp(prefix='qd-bench-jobs-'), 'jobs.sqlite3')
+        JOB_QUEUE_WORKERS = 0
+    
+    app_config.config['bench'] = BenchConfig
+    return 'bench'
+
+
+def legacy_guest_login():
+    """原先的游客登录：每个新 IP 一条用户记录和一次密码哈希"""
+    guest_username = f"guest_{request.remote_addr}"
+    user = User.query.filter_by(username=guest_username).first()
+    
+    if not user:
+        user = User(username=guest_username, role='guest')
+        user.password_hash = generate_password_hash('guest_password')
+        db.session.add(user)
+        db.session.commit()
+    
+    access_token = create_access_token(identity=str(user.id))
+    return {
+        'message': '游客登录成功',
+        'access_token': access_token,
+        'user': user.to_dict()
+    }, 200
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(client, url, logins, first_ip):
+    """依次以 logins 个不同 IP 登录，返回 (每次登录的 SQL 语句数, 各次耗时毫秒, 总秒数, 最后的令牌)"""
+    statements = []
+    
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    sa_event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        samples = []
+        token = None
+        started = time.perf_counter()
+        for i in range(logins):
+            ip = first_ip + i
+            remote_addr = f'10.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}'
+            request_started = time.perf_counter()
+            response = client.post(url, environ_base={'REMOTE_ADDR': remote_addr})
+            samples.append((time.perf_counter() - request_started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} 返回 {response.status_code}: {response.get_data(as_text=True)}')
+            token = response.get_json()['access_token']
+        elapsed = time.perf_counter() - started
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', count_statement)
+    return len(statements) / logins, samples, elapsed, token
+
+
+def main():
+    parser = argparse.ArgumentParser(description='游客登录基准测试')
+    parser.add_argument('--logins', type=int, default=200, help='每种实现的登录次数（每次使用不同 IP）')
+    parser.add_argument('--database-url', help='空数据库的连接地址（默认临时 SQLite 文件）')
+    args = parser.parse_args()
+    
+    database_url = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='qd-bench-'), 'bench.db'
+    )
+    app = create_app(make_config(database_url))
+    app.add_url_rule('/bench/legacy-guest-login', view_func=legacy_guest_login, methods=['POST'])
+    client = app.test_client()
+    
+    with app.app_context():
+        db.create_all()
+        if User.query.filter_by(role='guest').first() is not None:
+            parser.error('--database-url 指向的数据库中已有游客用户')
+        print(f"[INFO] Database: {database_url}")
+        
+        print(f"\n{'path':<11}{'queries':>9}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'users':>8}")
+        token = None
+        for index, (name, url) in enumerate((
+            ('legacy', '/bench/legacy-guest-login'),
+            ('stateless', '/api/auth/guest-login')
+        )):
+            client.post(url, environ_base={'REMOTE_ADDR': '127.0.0.1'})  # 预热
+            users_before = User.query.count()
+            queries, samples, elapsed, token = measure(client, url, args.logins, (index + 1) << 16)
+            users_added = User.query.count() - users_before
+            print(f"{name:<11}{queries:>9.1f}{args.logins / elapsed:>10.0f}{statistics.median(samples):>10.2f}"
+                  f"{percentile(samples, 95):>10.2f}{users_added:>8}")
+        
+        headers = {'Authorization': f'Bearer {token}'}
+        can_read = client.get('/api/events', headers=headers).status_code == 200
+        can_write = client.post('/api/events', headers=headers, json={'title': 'x', 'event_date': '2025-01-01'}).status_code != 403
+        ok = can_read and not can_write
+        print(f"\n[{'SUCCESS' if ok else 'ERROR'}] Guest token read access: {can_read}, write access: {can_write}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+人员搜索基准测试
+
+在一个临时数据库中生成指定数量的人员并建立搜索索引，
+对常见姓氏、完整姓名、部门、职位等搜索词分别计时（与 GET /api/members?search= 相同的查询与分页）。
+
+运行方式：
+python bench_member_search.py [--members 100000] [--runs 30] [--database-url sqlite:////tmp/bench.db]
+
+--database-url 必须指向空数据库，默认在临时目录中创建 SQLite 数据库。
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from app import create_app
+import config as app_config
+from models import db, Member, member_search_grams
+from utils import member_search
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤'
+GIVEN = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华玉萍红娥玲芬燕彬鹏辉晨宇浩然子轩欣怡梓涵一诺思远嘉怡雨桐'
+DEPARTMENTS = ['技术部', '市场部', '销售部', '财务部', '人力资源部', '行政部', '产品部', '运营部', '客服部', '法务部',
+               'Engineering', 'Marketing', 'Sales', 'Finance', 'Operations']
+POSITIONS = ['经理', '主管', '专员', '工程师', '高级工程师', '总监', '助理', '实习生', '顾问', '架构师',
+             'Manager', 'Engineer', 'Senior Engineer', 'Director', 'Analyst']
+
+BATCH_SIZE = 5000
+
+
+def make_config(database_url):
+    class BenchConfig(app_config.Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        JOB_QUEUE_PATH = os.path.join(tempfile.mkdtemp(prefix='qd-bench-jobs-'), 'jobs.sqlite3')
+        JOB_QUEUE_WORKERS = 0
+    
+    app_config.config['bench'] = BenchConfig
+    return 'bench'
+
+
+def seed(count, rng):
+    """批量生成人员和搜索索引片段，返回一个实际存在的完整姓名"""
+    sample_name = None
+    for offset in range(0, count, BATCH_SIZE):
+        rows = []
+        for _ in range(min(BATCH_SIZE, count - offset)):
+            name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2))))
+            rows.append({
+                'name': name,
+                'department': rng.choice(DEPARTMENTS),
+                'position': rng.choice(POSITIONS),
+                'is_active': True
+            })
+        db.session.execute(Member.__table__.insert(), rows)
+        
+        members = Member.query.order_by(Member.id.desc()).limit(len(rows)).all()
+        grams = [
+            {'gram': gram, 'member_id': member.id}
+            for member in members
+            for gram in member_search.member_grams(member)
+        ]
+        db.session.execute(member_search_grams.insert(), grams)
+        db.session.commit()
+        
+        sample_name = sample_name or members[0].name
+        print(f"[INFO] Seeded {offset + len(rows)} members")
+    return sample_name
+
+
+def search(term, max_candidates, per_page=50):
+    query = member_search.apply_search(Member.query, term, max_candidates)
+    pagination = query.paginate(page=1, per_page=per_page, error_out=False)
+    members = [member.to_dict() for member in pagination.items]
+    return pagination.total, members
+
+
+def uses_scan(term, max_candidates):
+    """该搜索词是否不使用索引、直接做子串匹配"""
+    grams = member_search.query_grams(term)
+    return not grams or member_search.candidate_filter(grams, max_candidates) is None
+
+
+def like_total(term):
+    """不使用索引的子串匹配人数，用于校验搜索结果完整"""
+    contains = f'%{member_search._escape_like(term)}%'
+    return Member.query.filter(db.or_(
+        Member.name.like(contains, escape='\\'),
+        Member.department.like(contains, escape='\\'),
+        Member.position.like(contains, escape='\\')
+    )).count()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='人员搜索基准测试')
+    parser.add_argument('--members', type=int, default=100000, help='生成的人员数量')
+    parser.add_argument('--runs', type=int, default=30, help='每个搜索词的计时次数')
+    parser.add_argument('--max-candidates', type=int, help='使用索引的候选记录上限（默认使用 MEMBER_SEARCH_MAX_CANDIDATES，0 表示始终使用索引）')
+    parser.add_argument('--database-url', help='空数据库的连接地址（默认临时 SQLite 文件）')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    args = parser.parse_args()
+    
+    database_url = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='qd-bench-'), 'bench.db'
+    )
+    app = create_app(make_config(database_url))
+    
+    with app.app_context():
+        db.create_all()
+        if Member.query.first() is not None:
+            parser.error('--database-url 指向的数据库中已有人员数据')
+        
+        print(f"[INFO] Database: {database_url}")
+        sample_name = seed(args.members, random.Random(args.seed))
+        max_candidates = app.config['MEMBER_SEARCH_MAX_CANDIDATES'] if args.max_candidates is None else args.max_candidates
+        print(f"[INFO] Max candidates: {max_candidates or 'unlimited'}")
+        
+        terms = [sample_name[0], sample_name, sample_name[1:], '技术', '工程师', 'engineer', 'enginee', 'nagere', 'ops', '不存在的人']
+        complete = True
+        print(f"\n{'term':<16}{'matches':>9}{'scan':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for term in terms:
+            search(term, max_candidates)  # 预热
+            samples = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                total, _ = search(term, max_candidates)
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+            complete = complete and total == like_total(term)
+            scan = 'like' if uses_scan(term, max_candidates) else 'index'
+            print(f"{term:<16}{total:>9}{scan:>6}{statistics.median(samples):>10.2f}"
+                  f"{percentile(samples, 95):>10.2f}{max(samples):>10.2f}")
+        
+        print(f"\n[{'SUCCESS' if complete else 'ERROR'}] Match counts {'equal' if complete else 'differ from'} a full substring scan")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 """清除测试活动数据（没有图片的活动）"""
 from app import create_app
 from models import db, Event
+from utils import analytics_rollup
 
 app = create_app()
 
@@ -12,11 +13,16 @@ with app.app_context():
     ).all()
     
     print(f"[INFO] Found {len(events_without_image)} events without images")
+    original_stats = analytics_rollup.contribution([event.id for event in events_without_image])
     
     for event in events_without_image:
         print(f"[DELETE] {event.title} ({event.event_date})")
         db.session.delete(event)
     
+    # 同步更新受影响日期的每日统计汇总
+    db.session.flush()
+    analytics_rollup.apply_delta(original_stats, {})
+    
     db.session.commit()
     print(f"\n[SUCCESS] Deleted {len(events_without_image)} events without images")
     
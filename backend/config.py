@@ -26,6 +26,22 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-please-change')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # 密码哈希：方法格式同 Werkzeug（如 scrypt:32768:8:1、pbkdf2:sha256:600000），
+    # 修改后旧哈希在用户下次登录时自动按新策略重新计算
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 16))  # 排队上限，超出返回 503
+    PASSWORD_HASH_TIMEOUT = 10  # 等待哈希结果的秒数
+    
+    # 提交后任务队列（删除文件等副作用）：SQLite 日志文件与工作线程数，0 表示提交后同步执行
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs.sqlite3'))
+    JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', 2))
+    JOB_QUEUE_MAX_ATTEMPTS = 5
+    JOB_QUEUE_RETRY_BACKOFF = 2.0  # 首次重试等待秒数，之后每次翻倍
+    
+    # 游客令牌：无状态、只读，有效期较短
+    GUEST_TOKEN_EXPIRES = timedelta(hours=2)
+    USER_VERSION_CACHE_TTL = int(os.getenv('USER_VERSION_CACHE_TTL', 60))  # 权限校验缓存用户令牌版本的秒数
     
 
     
@@ -36,10 +52,62 @@ class Config:
     # 文件上传配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    UPLOAD_CHUNK_SIZE = 64 * 1024  # 上传文件分块写入的大小
+    UPLOAD_MAX_SIZE = MAX_CONTENT_LENGTH  # 单个文件大小上限
+    IMAGE_VARIANT_WIDTHS = (320, 800, 1600)  # 衍生图宽度（WebP + JPEG，需要 Pillow）
+    IMAGE_VARIANT_QUALITY = 80
+    IMAGE_VARIANT_WORKERS = 2  # 生成衍生图的后台进程数
     
-    # 本地文件存储配置
-    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')  # 上传文件夹
+    # 文件存储配置
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')  # local / memory（测试用）/ s3
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')  # 上传文件夹（local 后端）
+    UPLOAD_TMP_FOLDER = os.getenv('UPLOAD_TMP_FOLDER')  # 非本地后端的上传临时目录，默认系统临时目录
+    S3_BUCKET = os.getenv('S3_BUCKET')  # s3 后端（需要安装 requirements-s3.txt，密钥使用 boto3 默认来源）
+    S3_PREFIX = os.getenv('S3_PREFIX', '')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # MinIO 等 S3 兼容服务的地址
+    S3_REGION = os.getenv('S3_REGION')
     FILE_SERVER_URL = os.getenv('FILE_SERVER_URL', '/uploads')  # 文件访问URL前缀
+    UPLOADS_MAX_AGE = 365 * 24 * 3600  # 上传图片的浏览器缓存时间（文件名唯一，内容不变）
+    # 交给前端 Web 服务器发送文件：'' 由 Flask 发送，'x-sendfile'（Apache/lighttpd），'x-accel'（Nginx）
+    UPLOADS_SENDFILE = os.getenv('UPLOADS_SENDFILE', '')
+    UPLOADS_ACCEL_PREFIX = os.getenv('UPLOADS_ACCEL_PREFIX', '/_protected_uploads')  # Nginx internal location
+    
+    # 日程列表分页配置（游标分页）
+    EVENTS_PAGE_SIZE = int(os.getenv('EVENTS_PAGE_SIZE', 200))  # 默认每页条数
+    EVENTS_MAX_PAGE_SIZE = int(os.getenv('EVENTS_MAX_PAGE_SIZE', 500))  # 每页最大条数
+    
+    # 批量导入配置
+    EVENT_IMPORT_CHUNK_SIZE = int(os.getenv('EVENT_IMPORT_CHUNK_SIZE', 1000))  # 每个事务写入的日程数
+    MEMBER_IMPORT_CHUNK_SIZE = int(os.getenv('MEMBER_IMPORT_CHUNK_SIZE', 1000))  # 每个事务写入的人员数
+    MEMBER_IMPORT_KEY = os.getenv('MEMBER_IMPORT_KEY', 'email')  # 人员导入默认唯一键
+    
+    # 人员搜索：最少片段的倒排记录超过这么多条时不使用索引，直接做子串匹配，0 表示始终使用索引
+    MEMBER_SEARCH_MAX_CANDIDATES = int(os.getenv('MEMBER_SEARCH_MAX_CANDIDATES', 10000))
+    
+    # 导出配置
+    EVENT_EXPORT_BATCH_SIZE = int(os.getenv('EVENT_EXPORT_BATCH_SIZE', 500))  # 服务端游标每批读取的日程数
+    
+    # iCalendar 订阅源配置
+    ICAL_PAST_DAYS = int(os.getenv('ICAL_PAST_DAYS', 30))  # 默认包含过去多少天的日程
+    ICAL_FUTURE_DAYS = int(os.getenv('ICAL_FUTURE_DAYS', 365))  # 默认包含未来多少天的日程
+    ICAL_FEED_CACHE_SIZE = int(os.getenv('ICAL_FEED_CACHE_SIZE', 64))  # 缓存的订阅源（过滤条件组合）数
+    ICAL_EVENT_CACHE_SIZE = int(os.getenv('ICAL_EVENT_CACHE_SIZE', 5000))  # 缓存的 VEVENT 数
+    
+    # 月历缓存配置（按 年-月 缓存，LRU 淘汰）
+    CALENDAR_CACHE_SIZE = int(os.getenv('CALENDAR_CACHE_SIZE', 24))  # 最多缓存的月份数
+    
+    # 重复日程配置
+    RECURRENCE_CACHE_SIZE = int(os.getenv('RECURRENCE_CACHE_SIZE', 4096))  # 缓存的 (规则, 日期窗口) 展开结果数
+    RECURRENCE_EXPAND_DAYS = int(os.getenv('RECURRENCE_EXPAND_DAYS', 366))  # 列表只给出起始日期时最多展开多少天
+    
+    # 人员时间冲突检测：off 不检查，warn 在响应中返回冲突，reject 有冲突时返回 409 不保存
+    EVENT_CONFLICT_MODE = os.getenv('EVENT_CONFLICT_MODE', 'warn')
+    EVENT_CONFLICT_DEFAULT_MINUTES = int(os.getenv('EVENT_CONFLICT_DEFAULT_MINUTES', 60))  # 未设置结束时间的日程按多少分钟计算
+    EVENT_CONFLICT_HORIZON_DAYS = int(os.getenv('EVENT_CONFLICT_HORIZON_DAYS', 180))  # 重复日程检查首次日期后多少天内的发生
+    
+    # 数据分析配置：是否读取每日统计汇总表（关闭时直接对原始表做单次条件聚合）
+    ANALYTICS_USE_ROLLUP = os.getenv('ANALYTICS_USE_ROLLUP', 'true').lower() == 'true'
+    ANALYTICS_MAX_RANGE_DAYS = int(os.getenv('ANALYTICS_MAX_RANGE_DAYS', 731))  # 单次统计区间最大天数
 
 
 class DevelopmentConfig(Config):
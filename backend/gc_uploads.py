@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+回收孤儿上传文件
+
+删除（或移入隔离目录）没有任何日程引用、且超过保留期的上传文件及其衍生图。
+按目录逐个处理，可用 --max-dirs 分批运行，--resume 从上次的断点继续。
+
+运行方式：
+python gc_uploads.py [--grace-hours 24] [--quarantine /path/to/dir] [--dry-run] [--max-dirs 100] [--resume]
+"""
+import argparse
+from app import create_app
+from utils.file_storage import get_storage
+from utils import upload_gc
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回收孤儿上传文件')
+    parser.add_argument('--grace-hours', type=float, default=24, help='保留期（小时），较新的文件不处理，默认 24')
+    parser.add_argument('--quarantine', help='隔离目录：移动孤儿文件到该目录而不是删除')
+    parser.add_argument('--dry-run', action='store_true', help='只列出孤儿文件，不做修改')
+    parser.add_argument('--max-dirs', type=int, default=0, help='本次最多处理的目录数（默认不限）')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的目录继续')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        stats = upload_gc.collect(
+            get_storage(),
+            grace_seconds=args.grace_hours * 3600,
+            quarantine=args.quarantine,
+            dry_run=args.dry_run,
+            resume=args.resume,
+            max_dirs=args.max_dirs
+        )
+        
+        print(f"[INFO] Scanned {stats['files']} files in {stats['dirs']} directories, "
+              f"skipped {stats['recent']} recent uploads")
+        print(f"[SUCCESS] {'Found' if args.dry_run else 'Removed'} {stats['orphans']} orphaned files "
+              f"({stats['bytes']} bytes), {stats['tmp_removed']} stale temp files")
+        if not stats['finished']:
+            print("[INFO] Stopped early, run again with --resume to continue")
+
+
+if __name__ == '__main__':
+    main()
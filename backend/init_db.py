@@ -6,6 +6,7 @@ import os
 from datetime import datetime, date, time
 from app import create_app
 from models import db, User, Event
+from utils import analytics_rollup
 
 def init_database():
     """初始化数据库"""
@@ -126,12 +127,18 @@ def init_database():
             }
         ]
         
+        events = []
         for event_data in sample_events:
             event = Event(
                 **event_data,
                 created_by=admin.id
             )
             db.session.add(event)
+            events.append(event)
+        db.session.flush()
+        
+        # 生成示例日程的每日统计汇总
+        analytics_rollup.apply_delta({}, analytics_rollup.contribution([event.id for event in events]))
         
         db.session.commit()
         
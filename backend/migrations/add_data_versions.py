@@ -0,0 +1,53 @@
+"""
+数据库迁移脚本：创建 data_versions 表
+- 记录日程数据的写入版本号，日程、人员或参与关系有写入时在同一事务中递增，
+  ETag 校验只需一次主键查询
+
+运行方式：
+python migrations/add_data_versions.py
+"""
+
+import sys
+import os
+
+# 添加父目录到路径以便导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import config
+from models import db
+from sqlalchemy import text
+
+def migrate():
+    """执行数据库迁移"""
+    # 不使用 create_app：其中的管理员检查会查询 users.token_version，
+    # 在 add_user_token_version.py 执行前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
+    
+    with app.app_context():
+        try:
+            print("开始执行数据库迁移...")
+            
+            db.session.execute(text(
+                "CREATE TABLE IF NOT EXISTS data_versions ("
+                "name VARCHAR(50) NOT NULL PRIMARY KEY, "
+                "version BIGINT NOT NULL DEFAULT 0 COMMENT '写入版本号'"
+                ")"
+            ))
+            print("✓ 创建表: data_versions")
+            
+            db.session.execute(text("INSERT IGNORE INTO data_versions (name, version) VALUES ('events', 0)"))
+            print("✓ 初始化版本号: events")
+            
+            db.session.commit()
+            print("\n✅ 数据库迁移成功完成！")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ 迁移失败: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
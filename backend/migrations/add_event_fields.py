@@ -14,12 +14,18 @@ import os
 # 添加父目录到路径以便导入
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app, db
+from flask import Flask
+from config import config
+from models import db
 from sqlalchemy import text
 
 def migrate():
     """执行数据库迁移"""
-    app = create_app()
+    # 不使用 create_app：其中的管理员检查会查询 users.token_version，
+    # 在 add_user_token_version.py 执行前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
     
     with app.app_context():
         try:
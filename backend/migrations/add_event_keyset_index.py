@@ -0,0 +1,49 @@
+"""
+数据库迁移脚本：为 events 表添加游标分页使用的复合索引
+- ix_events_date_start_id: (event_date, start_time, id)
+
+运行方式：
+python migrations/add_event_keyset_index.py
+"""
+
+import sys
+import os
+
+# 添加父目录到路径以便导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import config
+from models import db
+from sqlalchemy import text
+
+def migrate():
+    """执行数据库迁移"""
+    # 不使用 create_app：其中的管理员检查会查询 users.token_version，
+    # 在 add_user_token_version.py 执行前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
+    
+    with app.app_context():
+        try:
+            print("开始执行数据库迁移...")
+            
+            # 检查索引是否已存在
+            result = db.session.execute(text("SHOW INDEX FROM events WHERE Key_name = 'ix_events_date_start_id'"))
+            if result.fetchone():
+                print("索引 ix_events_date_start_id 已存在，跳过")
+            else:
+                db.session.execute(text("CREATE INDEX ix_events_date_start_id ON events (event_date, start_time, id)"))
+                print("✓ 添加索引: ix_events_date_start_id")
+            
+            db.session.commit()
+            print("\n✅ 数据库迁移成功完成！")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ 迁移失败: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,71 @@
+"""
+数据库迁移脚本：为 events 表添加重复规则字段
+- recurrence_freq: 重复频率 daily / weekly / monthly（为空表示单次日程）
+- recurrence_interval: 重复间隔
+- recurrence_until / recurrence_count: 截止日期 / 重复次数
+- recurrence_exdates: 排除日期（JSON 数组）
+- recurrence_end: 最后日期（由规则计算，用于按日期范围查找重复日程）
+
+运行方式：
+python migrations/add_event_recurrence.py
+"""
+
+import sys
+import os
+
+# 添加父目录到路径以便导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import config
+from models import db
+from sqlalchemy import text
+
+COLUMNS = [
+    ('recurrence_freq', "ENUM('daily', 'weekly', 'monthly') NULL COMMENT '重复频率'"),
+    ('recurrence_interval', "INT NOT NULL DEFAULT 1 COMMENT '重复间隔'"),
+    ('recurrence_until', "DATE NULL COMMENT '重复截止日期'"),
+    ('recurrence_count', "INT NULL COMMENT '重复次数'"),
+    ('recurrence_exdates', "TEXT NULL COMMENT '排除日期'"),
+    ('recurrence_end', "DATE NULL COMMENT '最后日期'"),
+]
+
+def migrate():
+    """执行数据库迁移"""
+    # 不使用 create_app：其中的管理员检查会查询 users.token_version，
+    # 在 add_user_token_version.py 执行前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
+    
+    with app.app_context():
+        try:
+            print("开始执行数据库迁移...")
+            
+            # 检查字段是否已存在
+            for name, definition in COLUMNS:
+                result = db.session.execute(text(f"SHOW COLUMNS FROM events LIKE '{name}'"))
+                if result.fetchone():
+                    print(f"字段 {name} 已存在，跳过")
+                else:
+                    db.session.execute(text(f"ALTER TABLE events ADD COLUMN {name} {definition}"))
+                    print(f"✓ 添加字段: {name}")
+            
+            # 检查索引是否已存在
+            result = db.session.execute(text("SHOW INDEX FROM events WHERE Key_name = 'ix_events_recurrence'"))
+            if result.fetchone():
+                print("索引 ix_events_recurrence 已存在，跳过")
+            else:
+                db.session.execute(text("CREATE INDEX ix_events_recurrence ON events (recurrence_freq, recurrence_end)"))
+                print("✓ 添加索引: ix_events_recurrence")
+            
+            db.session.commit()
+            print("\n✅ 数据库迁移成功完成！")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ 迁移失败: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,49 @@
+"""
+数据库迁移脚本：为 events 表添加修订号字段
+- revision: 每次更新递增，用于 ETag 条件请求校验
+
+运行方式：
+python migrations/add_event_revision.py
+"""
+
+import sys
+import os
+
+# 添加父目录到路径以便导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import config
+from models import db
+from sqlalchemy import text
+
+def migrate():
+    """执行数据库迁移"""
+    # 不使用 create_app：其中的管理员检查会查询 users.token_version，
+    # 在 add_user_token_version.py 执行前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
+    
+    with app.app_context():
+        try:
+            print("开始执行数据库迁移...")
+            
+            # 检查字段是否已存在
+            result = db.session.execute(text("SHOW COLUMNS FROM events LIKE 'revision'"))
+            if result.fetchone():
+                print("字段 revision 已存在，跳过")
+            else:
+                db.session.execute(text("ALTER TABLE events ADD COLUMN revision INT NOT NULL DEFAULT 0 COMMENT '修订号'"))
+                print("✓ 添加字段: revision")
+            
+            db.session.commit()
+            print("\n✅ 数据库迁移成功完成！")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ 迁移失败: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
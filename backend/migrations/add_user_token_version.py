@@ -0,0 +1,51 @@
+"""
+数据库迁移脚本：为 users 表添加令牌版本字段
+- token_version: 递增后该用户已签发的令牌失效
+
+升级已有数据库时必须最先运行：应用启动时的管理员检查会查询该字段，
+字段添加前应用和依赖 create_app 的脚本都无法启动（完整顺序见 README 的“升级已有数据库”）。
+
+运行方式：
+python migrations/add_user_token_version.py
+"""
+
+import sys
+import os
+
+# 添加父目录到路径以便导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import config
+from models import db
+from sqlalchemy import text
+
+def migrate():
+    """执行数据库迁移"""
+    # 不使用 create_app：其中的管理员检查会查询 users 表，在字段添加前会失败
+    app = Flask(__name__)
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    db.init_app(app)
+    
+    with app.app_context():
+        try:
+            print("开始执行数据库迁移...")
+            
+            # 检查字段是否已存在
+            result = db.session.execute(text("SHOW COLUMNS FROM users LIKE 'token_version'"))
+            if result.fetchone():
+                print("字段 token_version 已存在，跳过")
+            else:
+                db.session.execute(text("ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0 COMMENT '令牌版本'"))
+                print("✓ 添加字段: token_version")
+            
+            db.session.commit()
+            print("\n✅ 数据库迁移成功完成！")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ 迁移失败: {str(e)}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -1,6 +1,12 @@
+import json
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.security import check_password_hash
+from utils.password import generate_hash
+from utils.image_variants import variant_urls
 
 db = SQLAlchemy()
 
@@ -14,6 +20,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.Enum('admin', 'user', 'guest'), default='user', nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 令牌版本，递增后旧令牌失效
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -21,13 +28,17 @@ class User(db.Model):
     events = db.relationship('Event', backref='creator', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """设置密码（哈希）"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码（在当前线程按配置的哈希策略计算，请求中请使用 password_hasher）"""
+        self.password_hash = generate_hash(password)
     
     def check_password(self, password):
         """验证密码"""
         return check_password_hash(self.password_hash, password)
     
+    def token_claims(self):
+        """写入 JWT 的附加声明（角色与令牌版本）"""
+        return {'role': self.role, 'ver': self.token_version or 0}
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -76,6 +87,13 @@ class Member(db.Model):
         return f'<Member {self.name}>'
 
 
+# 人员搜索 n-gram 倒排索引（姓名、部门、职位的单字与双字片段）
+member_search_grams = db.Table('member_search_grams',
+    db.Column('gram', db.String(16), primary_key=True),  # 片段的码点编码，见 utils/member_search.py
+    db.Column('member_id', db.Integer, db.ForeignKey('members.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
+
 # 事件参与者关联表（多对多关系）
 event_members = db.Table('event_members',
     db.Column('event_id', db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), primary_key=True),
@@ -87,6 +105,12 @@ event_members = db.Table('event_members',
 class Event(db.Model):
     """日程事件模型"""
     __tablename__ = 'events'
+    __table_args__ = (
+        # 列表排序与游标分页使用的复合索引
+        db.Index('ix_events_date_start_id', 'event_date', 'start_time', 'id'),
+        # 按日期窗口查找重复日程（首次日期 <= 窗口结束 且 最后日期 >= 窗口起始）
+        db.Index('ix_events_recurrence', 'recurrence_freq', 'recurrence_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -106,12 +130,104 @@ class Event(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 修订号，每次更新递增
+    
+    # 重复规则（为空表示单次日程），event_date 为首次日期
+    recurrence_freq = db.Column(db.Enum('daily', 'weekly', 'monthly'), nullable=True)
+    recurrence_interval = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # 每隔几天/周/月
+    recurrence_until = db.Column(db.Date, nullable=True)  # 截止日期（含）
+    recurrence_count = db.Column(db.Integer, nullable=True)  # 重复次数
+    recurrence_exdates = db.Column(db.Text, nullable=True)  # 排除日期，JSON 数组
+    recurrence_end = db.Column(db.Date, nullable=True)  # 最后日期（由规则计算，无限重复时为空）
     
     # 关系：参与该事件的人员
     members = db.relationship('Member', secondary=event_members, backref='events', lazy='dynamic')
     
     def to_dict(self):
         """转换为字典"""
+        members = [{'id': m.id, 'name': m.name} for m in self.members.all()]
+        creator_name = self.creator.username if self.creator else None
+        return self._build_dict(members, creator_name)
+    
+    @classmethod
+    def to_dict_batch(cls, events):
+        """
+        批量转换为字典（用于列表接口）
+        
+        创建者与参与人员对整个结果集各只查询一次，
+        查询次数与事件数量无关，返回结构与 to_dict 完全一致。
+        """
+        events = list(events)
+        if not events:
+            return []
+        
+        event_ids = [event.id for event in events]
+        creator_ids = {event.created_by for event in events if event.created_by is not None}
+        
+        # 1. 批量加载创建者用户名
+        creator_names = {}
+        if creator_ids:
+            creator_names = dict(
+                db.session.query(User.id, User.username)
+                .filter(User.id.in_(creator_ids))
+                .all()
+            )
+        
+        # 2. 批量加载参与人员
+        members_by_event = {event_id: [] for event_id in event_ids}
+        member_rows = db.session.query(
+            event_members.c.event_id, Member.id, Member.name
+        ).join(
+            Member, Member.id == event_members.c.member_id
+        ).filter(
+            event_members.c.event_id.in_(event_ids)
+        ).order_by(
+            event_members.c.event_id, Member.id
+        ).all()
+        for event_id, member_id, member_name in member_rows:
+            members_by_event[event_id].append({'id': member_id, 'name': member_name})
+        
+        return [
+            event._build_dict(members_by_event[event.id], creator_names.get(event.created_by))
+            for event in events
+        ]
+    
+    @classmethod
+    def touch_by_members(cls, member_ids):
+        """将这些人员参与的所有日程标记为已更新（人员信息会出现在日程详情中）"""
+        member_ids = list(member_ids)
+        if not member_ids:
+            return
+        event_ids = db.session.query(event_members.c.event_id).filter(
+            event_members.c.member_id.in_(member_ids)
+        )
+        cls.query.filter(cls.id.in_(event_ids)).update({
+            cls.updated_at: datetime.utcnow(),
+            cls.revision: cls.revision + 1
+        }, synchronize_session=False)
+    
+    @classmethod
+    def touch_by_image(cls, url):
+        """将使用该背景图片的日程标记为已更新（衍生图生成完成后调用）"""
+        cls.query.filter(cls.background_image == url).update({
+            cls.updated_at: datetime.utcnow(),
+            cls.revision: cls.revision + 1
+        }, synchronize_session=False)
+    
+    def recurrence_dict(self):
+        """重复规则的字典形式，单次日程返回 None"""
+        if not self.recurrence_freq:
+            return None
+        return {
+            'freq': self.recurrence_freq,
+            'interval': self.recurrence_interval or 1,
+            'until': self.recurrence_until.isoformat() if self.recurrence_until else None,
+            'count': self.recurrence_count,
+            'exdates': json.loads(self.recurrence_exdates) if self.recurrence_exdates else []
+        }
+    
+    def _build_dict(self, members, creator_name):
+        """根据已加载的参与人员和创建者组装字典"""
         return {
             'id': self.id,
             'title': self.title,
@@ -120,15 +236,17 @@ class Event(db.Model):
             'start_time': self.start_time.strftime('%H:%M:%S') if self.start_time else None,
             'end_time': self.end_time.strftime('%H:%M:%S') if self.end_time else None,
             'background_image': self.background_image,
+            'variants': variant_urls(self.background_image),  # 衍生尺寸，未生成时为 None（使用原图）
             'priority': self.priority,
             'status': self.status,
             'organizer_department': self.organizer_department,  # 新增
             'expected_participants': self.expected_participants,  # 新增
             'location': self.location,  # 新增
-            'participant_count': self.members.count(),  # 实时计算参与人数
+            'recurrence': self.recurrence_dict(),  # 重复规则
+            'participant_count': len(members),  # 实时计算参与人数
             'created_by': self.created_by,
-            'creator_name': self.creator.username if self.creator else None,
-            'members': [{'id': m.id, 'name': m.name} for m in self.members.all()],  # 参与人员列表
+            'creator_name': creator_name,
+            'members': members,  # 参与人员列表
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -143,11 +261,135 @@ class Event(db.Model):
             'priority': self.priority,
             'status': self.status,
             'background_image': self.background_image,
+            'variants': variant_urls(self.background_image),
             'organizer_department': self.organizer_department,
             'location': self.location,
-            'expected_participants': self.expected_participants
+            'expected_participants': self.expected_participants,
+            'recurring': self.recurrence_freq is not None
         }
     
     def __repr__(self):
         return f'<Event {self.title} on {self.event_date}>'
 
+
+
+class DailyEventStat(db.Model):
+    """每日活动统计汇总（数据分析预聚合表）"""
+    __tablename__ = 'daily_event_stats'
+    
+    stat_date = db.Column(db.Date, primary_key=True)
+    total_events = db.Column(db.Integer, nullable=False, default=0)
+    
+    # 按状态统计
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    in_progress_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # 按优先级统计
+    low_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_count = db.Column(db.Integer, nullable=False, default=0)
+    high_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # 参与人次
+    total_participants = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyEventStat {self.stat_date}: {self.total_events}>'
+
+
+class StoredFile(db.Model):
+    """内容寻址存储的文件（按内容哈希去重，引用计数为 0 时可删除）"""
+    __tablename__ = 'stored_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False, index=True)  # 文件内容的 SHA-256
+    url = db.Column(db.String(500), unique=True, nullable=False, index=True)  # 访问 URL
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 引用该文件的日程数
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'url': self.url,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<StoredFile {self.sha256[:12]} refs={self.ref_count}>'
+
+
+class DataVersion(db.Model):
+    """数据写入版本号：同一事务内有写入时递增，用作 ETag 校验值（主键查询，无需扫描数据表）"""
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    
+    @classmethod
+    def current(cls, name):
+        """读取当前版本号（尚无记录时为 0）"""
+        return db.session.query(cls.version).filter(cls.name == name).scalar() or 0
+    
+    @classmethod
+    def bump(cls, session, name):
+        """在给定会话的当前事务中递增版本号"""
+        result = session.execute(
+            db.update(cls).where(cls.name == name).values(version=cls.version + 1)
+        )
+        if result.rowcount:
+            return
+        try:
+            with session.begin_nested():
+                session.execute(db.insert(cls).values(name=name, version=1))
+        except IntegrityError:
+            # 并发事务刚插入了该记录
+            session.execute(db.update(cls).where(cls.name == name).values(version=cls.version + 1))
+
+
+# 日程版本号：日程、人员及参与关系有写入时递增（日程详情中包含人员信息）
+EVENTS_VERSION = 'events'
+EVENTS_VERSION_TABLES = frozenset({'events', 'members', 'event_members'})
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_writes(session, flush_context):
+    """记录本事务是否通过 ORM 对象写入了日程相关数据"""
+    if any(isinstance(obj, (Event, Member)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['events_written'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state):
+    """记录本事务是否通过批量语句（query.update、table.insert() 等）写入了日程相关数据"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if getattr(table, 'name', None) in EVENTS_VERSION_TABLES:
+        orm_execute_state.session.info['events_written'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_events_version(session):
+    """提交前递增日程版本号，与业务数据在同一事务中生效"""
+    session.flush()
+    if session.info.pop('events_written', False):
+        DataVersion.bump(session, EVENTS_VERSION)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_events_written(session):
+    session.info.pop('events_written', None)
+
+
+@event.listens_for(Event, 'before_update')
+def _bump_event_revision(mapper, connection, target):
+    """每次更新日程时递增修订号（用于 ETag 校验）"""
+    target.revision = (target.revision or 0) + 1
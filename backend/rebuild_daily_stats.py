@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+重建每日活动统计汇总（daily_event_stats）
+
+首次部署汇总表或数据被直接修改后运行，默认覆盖全部日程日期范围。
+
+运行方式：
+python rebuild_daily_stats.py [--start 2025-01-01] [--end 2025-12-31]
+"""
+import argparse
+from datetime import datetime
+from sqlalchemy import func
+from app import create_app
+from models import db, Event
+from utils import analytics_rollup
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建每日活动统计汇总')
+    parser.add_argument('--start', type=parse_date, help='起始日期 YYYY-MM-DD（默认最早的日程日期）')
+    parser.add_argument('--end', type=parse_date, help='结束日期 YYYY-MM-DD（默认最晚的日程日期）')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        first_date, last_date = db.session.query(
+            func.min(Event.event_date), func.max(Event.event_date)
+        ).one()
+        
+        start_date = args.start or first_date
+        end_date = args.end or last_date
+        
+        if not start_date or not end_date:
+            print("[INFO] No events found, nothing to rebuild")
+            return
+        
+        print(f"[INFO] Rebuilding daily stats from {start_date} to {end_date}")
+        written = analytics_rollup.rebuild(start_date, end_date)
+        print(f"[SUCCESS] Wrote {written} daily stat rows")
+
+
+if __name__ == '__main__':
+    main()
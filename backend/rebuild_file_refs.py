@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+重新计算内容寻址文件的引用计数（stored_files.ref_count）
+
+日程的背景图片被直接在数据库中修改后运行，按日程的实际引用重新统计。
+
+运行方式：
+python rebuild_file_refs.py
+"""
+from sqlalchemy import func
+from app import create_app
+from models import db, Event, StoredFile
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        counts = dict(
+            db.session.query(Event.background_image, func.count(Event.id))
+            .filter(Event.background_image.isnot(None))
+            .group_by(Event.background_image)
+            .all()
+        )
+        
+        changed = 0
+        for stored in StoredFile.query.all():
+            ref_count = counts.get(stored.url, 0)
+            if stored.ref_count != ref_count:
+                print(f"[INFO] {stored.url}: {stored.ref_count} -> {ref_count}")
+                stored.ref_count = ref_count
+                changed += 1
+        
+        db.session.commit()
+        print(f"[SUCCESS] Updated reference counts of {changed} files")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+重建人员搜索 n-gram 索引（member_search_grams）
+
+首次部署搜索索引或人员数据被直接修改后运行。
+
+运行方式：
+python rebuild_member_search.py
+"""
+from app import create_app
+from models import db, Member
+from utils import member_search
+
+BATCH_SIZE = 1000
+
+
+def main():
+    app = create_app()
+    
+    with app.app_context():
+        total = 0
+        last_id = 0
+        while True:
+            members = Member.query.filter(
+                Member.id > last_id
+            ).order_by(Member.id).limit(BATCH_SIZE).all()
+            if not members:
+                break
+            
+            member_search.reindex_members(members)
+            db.session.commit()
+            
+            total += len(members)
+            last_id = members[-1].id
+            print(f"[INFO] Indexed {total} members")
+        
+        print(f"[SUCCESS] Rebuilt search index for {total} members")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,10 @@
 from flask import request, current_app
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required
-from models import db, Event, Member, event_members
-from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from models import db, Event, Member, User, event_members
+from utils.analytics_engine import STATUSES, PRIORITIES, daily_overview, sum_records
+from utils.analytics_period import parse_period, period_info, group_by_bucket, bucket_info
+from sqlalchemy import func
 
 
 class AnalyticsOverviewResource(Resource):
@@ -15,85 +16,50 @@ class AnalyticsOverviewResource(Resource):
     @jwt_required()
     def get(self):
         """获取数据分析总览"""
+        # 解析统计区间（start_date/end_date 或 year/month）与时间粒度
         try:
-            # 获取查询参数
-            year = request.args.get('year', datetime.now().year, type=int)
-            month = request.args.get('month', datetime.now().month, type=int)
-            
-            # 计算月份的起止日期
-            start_date = datetime(year, month, 1).date()
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1).date()
-            else:
-                end_date = datetime(year, month + 1, 1).date()
-            
-            # 1. 本月活动总数
-            total_events = Event.query.filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).count()
-            
-            # 2. 本月已完成活动数
-            completed_events = Event.query.filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date,
-                Event.status == 'completed'
-            ).count()
-            
-            # 3. 本月活动参与总人次
-            total_participants = db.session.query(
-                func.count(event_members.c.member_id)
-            ).join(
-                Event, Event.id == event_members.c.event_id
-            ).filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).scalar() or 0
+            start_date, end_date, granularity = parse_period(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        try:
+            # 每日统计（汇总表或单次条件聚合）
+            overview = daily_overview(start_date, end_date)
+            totals = sum_records(record for _, record in overview['daily'])
             
-            # 4. 本月活动覆盖人数（去重）
-            unique_participants = db.session.query(
-                func.count(func.distinct(event_members.c.member_id))
-            ).join(
-                Event, Event.id == event_members.c.event_id
-            ).filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).scalar() or 0
+            total_events = totals['total_events']
+            completed_events = totals['completed_count']
+            total_participants = overview['total_participants']
+            unique_participants = overview['unique_participants']
             
-            # 5. 按状态统计
-            status_stats = db.session.query(
-                Event.status,
-                func.count(Event.id).label('count')
-            ).filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).group_by(Event.status).all()
+            # 按状态、优先级统计
+            status_stats = [
+                (status, totals[f'{status}_count'])
+                for status in STATUSES if totals[f'{status}_count'] > 0
+            ]
+            priority_stats = [
+                (priority, totals[f'{priority}_count'])
+                for priority in PRIORITIES if totals[f'{priority}_count'] > 0
+            ]
             
-            # 6. 按优先级统计
-            priority_stats = db.session.query(
-                Event.priority,
-                func.count(Event.id).label('count')
-            ).filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).group_by(Event.priority).all()
+            # 每日活动数量趋势
+            daily_stats = [
+                (stat_date, record['total_events'])
+                for stat_date, record in overview['daily']
+            ]
             
-            # 7. 每日活动数量趋势
-            daily_stats = db.session.query(
-                Event.event_date,
-                func.count(Event.id).label('count')
-            ).filter(
-                Event.event_date >= start_date,
-                Event.event_date < end_date
-            ).group_by(Event.event_date).order_by(Event.event_date).all()
+            # 按时间粒度汇总趋势（对每日记录一次遍历）
+            trend = []
+            for bucket, items in group_by_bucket(overview['daily'], granularity).items():
+                bucket_totals = sum_records(record for _, record in items)
+                trend.append({
+                    **bucket_info(bucket, granularity),
+                    'total_events': bucket_totals['total_events'],
+                    'completed_events': bucket_totals['completed_count']
+                })
             
             return {
-                'period': {
-                    'year': year,
-                    'month': month,
-                    'start_date': start_date.isoformat(),
-                    'end_date': (end_date - timedelta(days=1)).isoformat()
-                },
+                'period': period_info(start_date, end_date, granularity),
                 'overview': {
                     'total_events': total_events,
                     'completed_events': completed_events,
@@ -113,7 +79,8 @@ class AnalyticsOverviewResource(Resource):
                 'daily_trend': [
                     {'date': date.isoformat(), 'count': count}
                     for date, count in daily_stats
-                ]
+                ],
+                'trend': trend
             }, 200
             
         except Exception as e:
@@ -129,45 +96,62 @@ class AnalyticsEventsResource(Resource):
     @jwt_required()
     def get(self):
         """获取活动详细分析"""
+        # 解析统计区间（start_date/end_date 或 year/month）与时间粒度
         try:
-            # 获取查询参数
-            year = request.args.get('year', datetime.now().year, type=int)
-            month = request.args.get('month', datetime.now().month, type=int)
-            
-            # 计算月份的起止日期
-            start_date = datetime(year, month, 1).date()
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1).date()
-            else:
-                end_date = datetime(year, month + 1, 1).date()
-            
-            # 获取活动列表及其参与人数
-            events = Event.query.filter(
+            start_date, end_date, granularity = parse_period(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        try:
+            # 一次关联分组查询得到每个活动的参与人数和创建者
+            participant_count = func.count(event_members.c.member_id).label('participant_count')
+            query = db.session.query(
+                Event.id,
+                Event.title,
+                Event.event_date,
+                Event.start_time,
+                Event.status,
+                Event.priority,
+                participant_count,
+                User.username
+            ).outerjoin(
+                event_members, Event.id == event_members.c.event_id
+            ).outerjoin(
+                User, User.id == Event.created_by
+            ).filter(
                 Event.event_date >= start_date,
                 Event.event_date < end_date
-            ).order_by(Event.event_date.desc()).all()
+            ).group_by(
+                Event.id, Event.title, Event.event_date, Event.start_time,
+                Event.status, Event.priority, User.username
+            )
             
-            events_data = []
-            for event in events:
-                participant_count = event.members.count()
-                events_data.append({
-                    'id': event.id,
-                    'title': event.title,
-                    'event_date': event.event_date.isoformat(),
-                    'start_time': event.start_time.strftime('%H:%M') if event.start_time else None,
-                    'status': event.status,
-                    'priority': event.priority,
-                    'participant_count': participant_count,
-                    'creator_name': event.creator.username if event.creator else None
-                })
+            events = query.order_by(Event.event_date.desc(), Event.id.desc()).all()
+            
+            # 参与人数 TOP 5 活动（由数据库排序截取）
+            top_rows = query.order_by(
+                participant_count.desc(), Event.event_date.desc(), Event.id.desc()
+            ).limit(5).all()
+            
+            events_data = [_event_row_to_dict(row) for row in events]
+            top_events = [_event_row_to_dict(row) for row in top_rows]
             
-            # 参与人数 TOP 5 活动
-            top_events = sorted(events_data, key=lambda x: x['participant_count'], reverse=True)[:5]
+            # 按时间粒度汇总活动数与参与人次（对结果行一次遍历）
+            trend = [
+                {
+                    **bucket_info(bucket, granularity),
+                    'total_events': len(rows),
+                    'total_participants': sum(row.participant_count for row in rows)
+                }
+                for bucket, rows in group_by_bucket(events, granularity, key=lambda row: row.event_date).items()
+            ]
             
             return {
+                'period': period_info(start_date, end_date, granularity),
                 'events': events_data,
                 'top_events': top_events,
-                'total': len(events_data)
+                'total': len(events_data),
+                'trend': trend
             }, 200
             
         except Exception as e:
@@ -181,18 +165,13 @@ class AnalyticsMembersResource(Resource):
     @jwt_required()
     def get(self):
         """获取人员参与分析"""
+        # 解析统计区间（start_date/end_date 或 year/month）与时间粒度
+        try:
+            start_date, end_date, granularity = parse_period(request.args)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
         try:
-            # 获取查询参数
-            year = request.args.get('year', datetime.now().year, type=int)
-            month = request.args.get('month', datetime.now().month, type=int)
-            
-            # 计算月份的起止日期
-            start_date = datetime(year, month, 1).date()
-            if month == 12:
-                end_date = datetime(year + 1, 1, 1).date()
-            else:
-                end_date = datetime(year, month + 1, 1).date()
-            
             # 统计各人员的参与次数
             member_stats = db.session.query(
                 Member.id,
@@ -229,7 +208,28 @@ class AnalyticsMembersResource(Resource):
                 Member.department
             ).all()
             
+            # 按时间粒度统计参与人次与覆盖人数（去重需在桶内计算，取回明细后一次遍历）
+            participation_rows = db.session.query(
+                Event.event_date,
+                event_members.c.member_id
+            ).join(
+                event_members, Event.id == event_members.c.event_id
+            ).filter(
+                Event.event_date >= start_date,
+                Event.event_date < end_date
+            ).all()
+            
+            trend = [
+                {
+                    **bucket_info(bucket, granularity),
+                    'participations': len(rows),
+                    'unique_participants': len({member_id for _, member_id in rows})
+                }
+                for bucket, rows in group_by_bucket(participation_rows, granularity).items()
+            ]
+            
             return {
+                'period': period_info(start_date, end_date, granularity),
                 'member_participation': [
                     {
                         'member_id': member_id,
@@ -256,7 +256,8 @@ class AnalyticsMembersResource(Resource):
                         'event_count': event_count
                     }
                     for member_id, name, department, event_count in member_stats[:10]
-                ]
+                ],
+                'trend': trend
             }, 200
             
         except Exception as e:
@@ -266,6 +267,21 @@ class AnalyticsMembersResource(Resource):
             return {'message': '获取人员参与分析失败'}, 500
 
 
+def _event_row_to_dict(row):
+    """将活动统计查询的结果行转换为字典"""
+    event_id, title, event_date, start_time, status, priority, participant_count, creator_name = row
+    return {
+        'id': event_id,
+        'title': title,
+        'event_date': event_date.isoformat(),
+        'start_time': start_time.strftime('%H:%M') if start_time else None,
+        'status': status,
+        'priority': priority,
+        'participant_count': participant_count,
+        'creator_name': creator_name
+    }
+
+
 def get_status_label(status):
     """获取状态标签"""
     labels = {
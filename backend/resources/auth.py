@@ -1,7 +1,14 @@
 from flask import request, jsonify
 from flask_restful import Resource
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from models import db, User
+from utils.auth import create_guest_token, is_guest_token, guest_profile
+from utils.password import password_hasher, HasherBusy
+
+
+def _busy_response():
+    """密码哈希线程池繁忙时的快速失败响应"""
+    return {'message': '服务繁忙，请稍后重试'}, 503, {'Retry-After': '1'}
 
 
 class RegisterResource(Resource):
@@ -26,8 +33,12 @@ class RegisterResource(Resource):
             return {'message': '邮箱已被使用'}, 400
         
         # 创建新用户（默认为普通用户）
-        user = User(username=username, email=email, role='user')
-        user.set_password(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            return _busy_response()
+        
+        user = User(username=username, email=email, role='user', password_hash=password_hash)
         
         try:
             db.session.add(user)
@@ -56,12 +67,26 @@ class LoginResource(Resource):
         # 查找用户
         user = User.query.filter_by(username=username).first()
         
-        if not user or not user.check_password(password):
-            return {'message': '用户名或密码错误'}, 401
+        try:
+            if not user or not password_hasher.verify(user.password_hash, password):
+                return {'message': '用户名或密码错误'}, 401
+        except HasherBusy:
+            return _busy_response()
+        
+        # 哈希策略变更后，用本次提交的明文按新策略重新哈希；繁忙或失败时下次登录再试
+        if password_hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = password_hasher.rehash(password)
+                db.session.commit()
+            except HasherBusy:
+                pass
+            except Exception:
+                db.session.rollback()
         
-        # 创建访问令牌（identity 必须是字符串）
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
+        # 创建访问令牌（identity 必须是字符串，角色与令牌版本写入声明）
+        claims = user.token_claims()
+        access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
         
         return {
             'message': '登录成功',
@@ -75,27 +100,13 @@ class GuestLoginResource(Resource):
     """游客登录（无需认证）"""
     
     def post(self):
-        # 创建或获取游客账户
-        guest_username = f"guest_{request.remote_addr}"
-        user = User.query.filter_by(username=guest_username).first()
-        
-        if not user:
-            user = User(username=guest_username, role='guest')
-            user.set_password('guest_password')  # 游客使用默认密码
-            try:
-                db.session.add(user)
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                return {'message': f'创建游客账户失败: {str(e)}'}, 500
-        
-        # 创建访问令牌（identity 必须是字符串）
-        access_token = create_access_token(identity=str(user.id))
+        # 游客令牌为签名的短期只读令牌，不创建用户记录，也不计算密码哈希
+        access_token, guest_identity = create_guest_token()
         
         return {
             'message': '游客登录成功',
             'access_token': access_token,
-            'user': user.to_dict()
+            'user': guest_profile(guest_identity)
         }, 200
 
 
@@ -104,9 +115,22 @@ class RefreshTokenResource(Resource):
     
     @jwt_required(refresh=True)
     def post(self):
+        if is_guest_token(get_jwt()):
+            return {'message': '游客令牌不支持刷新，请重新登录'}, 401
+        
         current_user_id = get_jwt_identity()
+        # 刷新时重新读取用户，使新令牌携带最新的角色与令牌版本
+        user = User.query.get(int(current_user_id))
+        
+        if not user:
+            return {'message': '用户不存在'}, 401
+        
+        claims = get_jwt()
+        if 'ver' in claims and claims['ver'] != (user.token_version or 0):
+            return {'message': '登录状态已失效，请重新登录'}, 401
+        
         # current_user_id 已经是字符串，直接使用
-        new_access_token = create_access_token(identity=current_user_id)
+        new_access_token = create_access_token(identity=current_user_id, additional_claims=user.token_claims())
         
         return {
             'access_token': new_access_token
@@ -119,6 +143,9 @@ class UserProfileResource(Resource):
     @jwt_required()
     def get(self):
         current_user_id = get_jwt_identity()
+        if is_guest_token(get_jwt()):
+            return guest_profile(current_user_id), 200
+        
         # current_user_id 是字符串，需要转换为整数
         user = User.query.get(int(current_user_id))
         
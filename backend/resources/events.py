@@ -1,27 +1,197 @@
-from flask import request, current_app
+from flask import request, current_app, Response, stream_with_context
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, date
-from models import db, Event, User, Member
-from utils.file_storage import FileStorage, allowed_file
-from functools import wraps
+from datetime import datetime, date, timedelta
+from models import db, Event, Member, event_members
+from utils.file_storage import (
+    get_storage, UploadTooLarge, allowed_file, acquire_files, release_files
+)
+from utils.auth import admin_required
+from utils.cache import calendar_cache
+from utils import analytics_rollup
+from utils.bulk_import import iter_request_rows, chunked, validate_event_rows, insert_event_chunk
+from utils.event_export import iter_event_batches, ndjson_lines, csv_lines
+from utils import ical
+from utils import recurrence
+from utils.conflicts import CONFLICT_MODES, find_conflicts
+from utils.http_cache import (
+    event_validator, make_etag, is_not_modified, not_modified_response, etag_headers
+)
+import base64
+import binascii
+import csv
+import json
 
 
-def admin_required(fn):
-    """装饰器：要求管理员权限"""
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        # current_user_id 是字符串，需要转换为整数
-        user = User.query.get(int(current_user_id))
-        
-        if not user or user.role != 'admin':
-            return {'message': '需要管理员权限'}, 403
-        
-        return fn(*args, **kwargs)
+def _encode_cursor(event_date, start_time, event_id):
+    """将排序键编码为不透明的分页游标"""
+    payload = [
+        event_date.isoformat(),
+        start_time.strftime('%H:%M:%S') if start_time else None,
+        event_id
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """解析分页游标，返回 (event_date, start_time, id)，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date_str, time_str, event_id = json.loads(raw)
+        event_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        start_time = datetime.strptime(time_str, '%H:%M:%S').time() if time_str else None
+        return event_date, start_time, int(event_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f'无效的分页游标: {cursor}') from e
+
+
+def _keyset_after(event_date, start_time, event_id):
+    """
+    构造 (event_date, start_time, id) 严格大于游标位置的过滤条件
+    
+    start_time 可为空，MySQL 升序排序时 NULL 排在最前，
+    因此空值需要单独展开，保证条件可以直接走复合索引定位。
+    """
+    if start_time is None:
+        same_day_after = db.or_(
+            Event.start_time.isnot(None),
+            db.and_(Event.start_time.is_(None), Event.id > event_id)
+        )
+    else:
+        same_day_after = db.or_(
+            Event.start_time > start_time,
+            db.and_(Event.start_time == start_time, Event.id > event_id)
+        )
     
-    return wrapper
+    return db.or_(
+        Event.event_date > event_date,
+        db.and_(Event.event_date == event_date, same_day_after)
+    )
+
+
+def _invalidate_calendar(*dates):
+    """使给定日期所在月份的月历缓存失效"""
+    for d in dates:
+        if d:
+            calendar_cache.invalidate((d.year, d.month))
+
+
+def _date_range(args):
+    """解析 start_date / end_date 查询参数，缺省或格式错误时为 None"""
+    def parse(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            return None
+    
+    return parse(args.get('start_date')), parse(args.get('end_date'))
+
+
+def _event_filters(args):
+    """根据查询参数构造日程过滤条件（日期范围、状态、优先级）"""
+    # 获取查询参数
+    start, end = _date_range(args)
+    status = args.get('status')
+    priority = args.get('priority')
+    
+    filters = []
+    
+    # 按日期过滤（重复日程与日期范围有交集即匹配）
+    if start or end:
+        filters.append(recurrence.window_filter(start, end))
+    
+    # 按状态过滤
+    if status and status in ['pending', 'in_progress', 'completed', 'cancelled']:
+        filters.append(Event.status == status)
+    
+    # 按优先级过滤
+    if priority and priority in ['low', 'medium', 'high']:
+        filters.append(Event.priority == priority)
+    
+    return filters
+
+
+# 修改后需要重新检查人员时间冲突的字段
+SCHEDULE_FIELDS = {'member_ids', 'event_date', 'start_time', 'end_time', 'recurrence', 'status'}
+
+MEMBER_IDS_ERROR = 'member_ids 必须是人员 ID（正整数）列表'
+
+
+def _parse_member_ids(value):
+    """
+    校验参与人员 ID 列表：缺省或 null 视为空列表，元素须为正整数（或纯数字字符串）
+    
+    Returns:
+        list: 去重后的人员 ID，格式错误时返回 None
+    """
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        return None
+    
+    member_ids = []
+    for member_id in value:
+        if isinstance(member_id, str) and member_id.strip().isascii() and member_id.strip().isdigit():
+            member_id = int(member_id)
+        if isinstance(member_id, bool) or not isinstance(member_id, int) or member_id <= 0:
+            return None
+        member_ids.append(member_id)
+    return list(dict.fromkeys(member_ids))
+
+
+def _check_conflicts(event, member_ids):
+    """
+    检查参与人员的时间冲突
+    
+    处理方式由 EVENT_CONFLICT_MODE 配置（off / warn / reject），可用 ?on_conflict= 按请求覆盖。
+    
+    Returns:
+        tuple: (处理方式, 冲突列表)
+    """
+    mode = request.args.get('on_conflict')
+    if mode not in CONFLICT_MODES:
+        mode = current_app.config['EVENT_CONFLICT_MODE']
+    if mode == 'off':
+        return mode, []
+    
+    conflicts = find_conflicts(
+        event, member_ids,
+        horizon_days=current_app.config['EVENT_CONFLICT_HORIZON_DAYS'],
+        default_minutes=current_app.config['EVENT_CONFLICT_DEFAULT_MINUTES']
+    )
+    return mode, conflicts
+
+
+def _conflict_response(conflicts):
+    return {'message': '参与人员存在时间冲突', 'conflicts': conflicts}, 409
+
+
+def _window_page(filters, start, end, cursor_key, size):
+    """
+    日期范围内按 (日期, 开始时间, id) 排序的前 size 条 (日程, 日期)
+    
+    单次日程仍由数据库按游标分页；重复日程只在范围内展开，
+    与单次日程按同一排序键合并，游标对两者含义相同。
+    """
+    singles = Event.query.filter(*filters, Event.recurrence_freq.is_(None))
+    if cursor_key:
+        singles = singles.filter(_keyset_after(*cursor_key))
+    singles = singles.order_by(
+        Event.event_date.asc(), Event.start_time.asc(), Event.id.asc()
+    ).limit(size).all()
+    
+    # 只给出起始日期时限制展开长度（无限重复的日程不会无限展开）
+    expand_end = end or start + timedelta(days=current_app.config['RECURRENCE_EXPAND_DAYS'])
+    series = Event.query.filter(*filters, Event.recurrence_freq.isnot(None)).all()
+    occurrences = recurrence.expand(series, start or date.min, expand_end)
+    if cursor_key:
+        after = recurrence.order_key(*cursor_key)
+        occurrences = [item for item in occurrences if recurrence.sort_key(*item) > after]
+    
+    items = [(event, event.event_date) for event in singles] + occurrences[:size]
+    items.sort(key=lambda item: recurrence.sort_key(*item))
+    return items[:size]
 
 
 class EventListResource(Resource):
@@ -29,46 +199,60 @@ class EventListResource(Resource):
     
     @jwt_required(optional=True)
     def get(self):
-        """获取日程列表（所有用户可见）"""
-        # 获取查询参数
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        status = request.args.get('status')
-        priority = request.args.get('priority')
-        
-        query = Event.query
-        
-        # 按日期过滤
-        if start_date:
-            try:
-                start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                query = query.filter(Event.event_date >= start)
-            except ValueError:
-                pass
-        
-        if end_date:
+        """
+        获取日程列表（所有用户可见）
+        
+        指定 start_date / end_date 时重复日程按发生日期展开，否则每个重复日程只出现一次（首次日期）。
+        """
+        filters = _event_filters(request.args)
+        start, end = _date_range(request.args)
+        
+        # 分页参数
+        page_size = current_app.config['EVENTS_PAGE_SIZE']
+        max_page_size = current_app.config['EVENTS_MAX_PAGE_SIZE']
+        limit = request.args.get('limit', page_size, type=int)
+        limit = max(1, min(limit, max_page_size))
+        
+        cursor_key = None
+        cursor = request.args.get('cursor')
+        if cursor:
             try:
-                end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                query = query.filter(Event.event_date <= end)
+                cursor_key = _decode_cursor(cursor)
             except ValueError:
-                pass
-        
-        # 按状态过滤
-        if status and status in ['pending', 'in_progress', 'completed', 'cancelled']:
-            query = query.filter(Event.status == status)
+                return {'message': '无效的分页游标'}, 400
         
-        # 按优先级过滤
-        if priority and priority in ['low', 'medium', 'high']:
-            query = query.filter(Event.priority == priority)
+        # 条件请求：数据未变化时直接返回 304，不做序列化
+        etag = make_etag('events', sorted(request.args.items(multi=True)), event_validator())
+        if is_not_modified(etag):
+            return not_modified_response(etag)
         
-        # 排序
-        query = query.order_by(Event.event_date.asc(), Event.start_time.asc())
+        # 多取一条用于判断是否还有下一页
+        if start or end:
+            items = _window_page(filters, start, end, cursor_key, limit + 1)
+        else:
+            query = Event.query.filter(*filters)
+            if cursor_key:
+                query = query.filter(_keyset_after(*cursor_key))
+            # 排序（与复合索引 event_date, start_time, id 一致）
+            query = query.order_by(Event.event_date.asc(), Event.start_time.asc(), Event.id.asc())
+            items = [(event, event.event_date) for event in query.limit(limit + 1).all()]
+        has_more = len(items) > limit
+        items = items[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last, last_date = items[-1]
+            next_cursor = _encode_cursor(last_date, last.start_time, last.id)
+        
+        events = recurrence.occurrence_dicts(items)
         
-        events = query.all()
         return {
-            'events': [event.to_dict() for event in events],
-            'count': len(events)
-        }, 200
+            'events': events,
+            'count': len(events),
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }, 200, etag_headers(etag)
     
     @admin_required
     def post(self):
@@ -91,6 +275,10 @@ class EventListResource(Resource):
         if not data.get('organizer_department'):
             return {'message': '举办部门不能为空'}, 400
         
+        member_ids = _parse_member_ids(data.get('member_ids'))
+        if member_ids is None:
+            return {'message': MEMBER_IDS_ERROR}, 400
+        
         try:
             # 解析日期
             event_date = datetime.strptime(data['event_date'], '%Y-%m-%d').date()
@@ -105,6 +293,12 @@ class EventListResource(Resource):
             if data.get('end_time'):
                 end_time = datetime.strptime(data['end_time'], '%H:%M:%S').time()
             
+            # 重复规则（可选）
+            try:
+                rule_fields = recurrence.parse_recurrence(data.get('recurrence'), event_date)
+            except ValueError as e:
+                return {'message': f'重复规则错误: {str(e)}'}, 400
+            
             # 创建日程
             event = Event(
                 title=data['title'],
@@ -118,24 +312,38 @@ class EventListResource(Resource):
                 organizer_department=data.get('organizer_department'),  # 新增
                 expected_participants=data.get('expected_participants'),  # 新增
                 location=data.get('location'),  # 新增
-                created_by=current_user_id
+                created_by=current_user_id,
+                **rule_fields
             )
             
             db.session.add(event)
             db.session.flush()  # 获取event.id
             
             # 添加参与人员
-            if data.get('member_ids'):
-                member_ids = data['member_ids']
+            if member_ids:
                 members = Member.query.filter(Member.id.in_(member_ids)).all()
                 for member in members:
                     event.members.append(member)
             
+            # 参与人员时间冲突检测（reject 模式下有冲突则不创建）
+            mode, conflicts = _check_conflicts(event, member_ids)
+            if conflicts and mode == 'reject':
+                db.session.rollback()
+                return _conflict_response(conflicts)
+            
+            # 背景图片引用计数
+            acquire_files([event.background_image])
+            
+            # 同步更新每日统计汇总（增量）
+            analytics_rollup.apply_delta({}, analytics_rollup.contribution([event.id]))
+            
             db.session.commit()
+            _invalidate_calendar(event.event_date)
             
             return {
                 'message': '日程创建成功',
-                'event': event.to_dict()
+                'event': event.to_dict(),
+                'conflicts': conflicts
             }, 201
             
         except ValueError as e:
@@ -145,6 +353,107 @@ class EventListResource(Resource):
             return {'message': f'创建日程失败: {str(e)}'}, 500
 
 
+class EventImportResource(Resource):
+    """日程批量导入资源"""
+    
+    @admin_required
+    def post(self):
+        """
+        批量导入日程（仅管理员）
+        
+        支持 CSV / JSON 数组 / JSON Lines。先校验全部数据，
+        默认有任何错误则不导入；?skip_invalid=true 时跳过错误行只导入有效行。
+        """
+        current_user_id = int(get_jwt_identity())
+        skip_invalid = request.args.get('skip_invalid', 'false').lower() == 'true'
+        
+        try:
+            rows = list(iter_request_rows())
+        except (ValueError, csv.Error) as e:
+            return {'message': f'读取导入数据失败: {str(e)}'}, 400
+        
+        if not rows:
+            return {'message': '导入数据为空'}, 400
+        
+        # 预先校验所有行
+        valid, errors = validate_event_rows(rows, current_user_id)
+        if errors and not skip_invalid:
+            return {
+                'message': '导入数据校验失败，未导入任何日程',
+                'imported': 0,
+                'failed': len(errors),
+                'errors': errors
+            }, 400
+        
+        # 分片批量写入，每个分片一个事务
+        chunk_size = current_app.config['EVENT_IMPORT_CHUNK_SIZE']
+        imported = 0
+        try:
+            for chunk in chunked(valid, chunk_size):
+                insert_event_chunk(chunk)
+                acquire_files([values['background_image'] for _, values, _ in chunk])
+                
+                analytics_rollup.apply_delta({}, analytics_rollup.contribution_of_rows(
+                    [(values, member_ids) for _, values, member_ids in chunk]
+                ))
+                
+                dates = {values['event_date'] for _, values, _ in chunk}
+                
+                db.session.commit()
+                _invalidate_calendar(*dates)
+                imported += len(chunk)
+                
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"批量导入日程失败: {str(e)}")
+            return {
+                'message': f'批量导入失败: {str(e)}',
+                'imported': imported,
+                'failed': len(errors),
+                'errors': errors
+            }, 500
+        
+        return {
+            'message': f'成功导入 {imported} 条日程',
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors
+        }, 201
+
+
+class EventExportResource(Resource):
+    """日程导出资源"""
+    
+    @admin_required
+    def get(self):
+        """
+        流式导出日程（仅管理员）
+        
+        ?format=ndjson|csv，支持与列表接口相同的 start_date / end_date / status / priority 过滤。
+        数据边查询边输出，内存占用与日程总数无关。
+        """
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return {'message': '不支持的导出格式，可选值: ndjson, csv'}, 400
+        
+        filters = _event_filters(request.args)
+        batches = iter_event_batches(filters, current_app.config['EVENT_EXPORT_BATCH_SIZE'])
+        
+        if export_format == 'csv':
+            body = csv_lines(batches)
+            mimetype = 'text/csv'
+        else:
+            body = ndjson_lines(batches)
+            mimetype = 'application/x-ndjson'
+        
+        filename = f"events-{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+
 class EventDetailResource(Resource):
     """日程详情资源"""
     
@@ -167,6 +476,16 @@ class EventDetailResource(Resource):
             return {'message': '日程不存在'}, 404
         
         data = request.get_json()
+        if 'member_ids' in data:
+            member_ids = _parse_member_ids(data['member_ids'])
+            if member_ids is None:
+                return {'message': MEMBER_IDS_ERROR}, 400
+        else:
+            member_ids = None
+        original_date = event.event_date
+        original_image = event.background_image
+        # 修改前该日程对每日统计汇总的贡献
+        original_stats = analytics_rollup.contribution([event.id])
         
         try:
             # 更新字段
@@ -204,22 +523,56 @@ class EventDetailResource(Resource):
             if 'location' in data:
                 event.location = data['location']
             
+            # 重复规则：传 null 取消重复；修改首次日期时按原规则重新计算最后日期
+            if 'recurrence' in data or ('event_date' in data and event.recurrence_freq):
+                rule = data['recurrence'] if 'recurrence' in data else event.recurrence_dict()
+                try:
+                    rule_fields = recurrence.parse_recurrence(rule, event.event_date)
+                except ValueError as e:
+                    return {'message': f'重复规则错误: {str(e)}'}, 400
+                for field, value in rule_fields.items():
+                    setattr(event, field, value)
+            
             # 更新参与人员
             if 'member_ids' in data:
-                # 清空现有人员
-                event.members.delete()
+                # 清空现有人员（只删除关联记录，不删除人员本身）
+                db.session.execute(
+                    event_members.delete().where(event_members.c.event_id == event.id)
+                )
                 # 添加新人员
-                member_ids = data['member_ids']
                 if member_ids:
                     members = Member.query.filter(Member.id.in_(member_ids)).all()
                     for member in members:
                         event.members.append(member)
+                # 参与人员变化也视为日程更新（刷新 updated_at 与修订号）
+                event.updated_at = datetime.utcnow()
+            
+            # 时间或人员变化时检测冲突（reject 模式下有冲突则不保存）
+            conflicts = []
+            if SCHEDULE_FIELDS & data.keys():
+                if member_ids is None:
+                    member_ids = [m.id for m in event.members]
+                mode, conflicts = _check_conflicts(event, member_ids)
+                if conflicts and mode == 'reject':
+                    db.session.rollback()
+                    return _conflict_response(conflicts)
+            
+            # 更换背景图片时调整新旧图片的引用计数（不再引用的旧图在提交后删除）
+            if event.background_image != original_image:
+                db.session.flush()
+                acquire_files([event.background_image])
+                release_files([original_image])
+            
+            # 同步更新每日统计汇总（日期变更时旧日期减、新日期加）
+            analytics_rollup.apply_delta(original_stats, analytics_rollup.contribution([event.id]))
             
             db.session.commit()
+            _invalidate_calendar(original_date, event.event_date)
             
             return {
                 'message': '日程更新成功',
-                'event': event.to_dict()
+                'event': event.to_dict(),
+                'conflicts': conflicts
             }, 200
             
         except ValueError as e:
@@ -237,13 +590,20 @@ class EventDetailResource(Resource):
             return {'message': '日程不存在'}, 404
         
         try:
-            # 如果有背景图片，尝试删除本地文件
-            if event.background_image:
-                file_storage = FileStorage()
-                file_storage.delete_file(event.background_image)
-            
+            event_date = event.event_date
+            background_image = event.background_image
+            original_stats = analytics_rollup.contribution([event.id])
             db.session.delete(event)
+            db.session.flush()
+            
+            # 背景图片只在最后一个引用删除后才删除文件（由任务队列在提交后执行）
+            release_files([background_image])
+            
+            # 同步更新每日统计汇总
+            analytics_rollup.apply_delta(original_stats, {})
+            
             db.session.commit()
+            _invalidate_calendar(event_date)
             
             return {'message': '日程删除成功'}, 200
             
@@ -252,6 +612,63 @@ class EventDetailResource(Resource):
             return {'message': f'删除日程失败: {str(e)}'}, 500
 
 
+class EventConflictResource(Resource):
+    """人员时间冲突检查资源"""
+    
+    @admin_required
+    def get(self):
+        """
+        检查人员参加某个时间段是否与其已安排的日程冲突（仅管理员）
+        
+        参数：member_ids（逗号分隔）、event_date、start_time、end_time；
+        指定 event_id 时以该日程（含重复规则）为候选，未传的参数使用日程当前值，且不与自身比较。
+        """
+        args = request.args
+        event = None
+        if args.get('event_id'):
+            event = Event.query.get(args.get('event_id', type=int))
+            if not event:
+                return {'message': '日程不存在'}, 404
+        
+        try:
+            if args.get('member_ids'):
+                member_ids = _parse_member_ids([x for x in args['member_ids'].split(',') if x.strip()])
+                if member_ids is None:
+                    return {'message': MEMBER_IDS_ERROR}, 400
+            elif event:
+                member_ids = [m.id for m in event.members]
+            else:
+                return {'message': 'member_ids 不能为空'}, 400
+            
+            if event is None:
+                if not args.get('event_date') or not args.get('start_time'):
+                    return {'message': 'event_date 和 start_time 不能为空'}, 400
+                event = Event()
+            else:
+                # 只用于计算，不修改数据库中的日程
+                db.session.expunge(event)
+            
+            if args.get('event_date'):
+                event.event_date = datetime.strptime(args['event_date'], '%Y-%m-%d').date()
+            if args.get('start_time'):
+                event.start_time = datetime.strptime(args['start_time'], '%H:%M:%S').time()
+            if 'end_time' in args:
+                event.end_time = datetime.strptime(args['end_time'], '%H:%M:%S').time() if args['end_time'] else None
+        except ValueError as e:
+            return {'message': f'参数格式错误: {str(e)}'}, 400
+        
+        conflicts = find_conflicts(
+            event, member_ids,
+            horizon_days=current_app.config['EVENT_CONFLICT_HORIZON_DAYS'],
+            default_minutes=current_app.config['EVENT_CONFLICT_DEFAULT_MINUTES']
+        )
+        return {
+            'conflicts': conflicts,
+            'count': len(conflicts),
+            'has_conflict': bool(conflicts)
+        }, 200
+
+
 class EventCalendarResource(Resource):
     """日历视图资源"""
     
@@ -267,7 +684,7 @@ class EventCalendarResource(Resource):
             year = today.year
             month = today.month
         
-        # 获取该月所有日程
+        # 该月日期范围
         start_date = date(year, month, 1)
         
         if month == 12:
@@ -275,24 +692,86 @@ class EventCalendarResource(Resource):
         else:
             end_date = date(year, month + 1, 1)
         
-        events = Event.query.filter(
-            Event.event_date >= start_date,
-            Event.event_date < end_date
-        ).order_by(Event.event_date.asc(), Event.start_time.asc()).all()
+        month_filters = [
+            recurrence.window_filter(start_date, end_date - timedelta(days=1))
+        ]
+        
+        # 条件请求：数据未变化时直接返回 304
+        etag = make_etag('calendar', year, month, event_validator())
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        # 优先读取月历缓存（校验值一致才使用，保证多进程部署下也不会返回旧数据）
+        cache_key = (year, month)
+        cached, generation = calendar_cache.get(cache_key)
+        if cached is not None and cached[0] == etag:
+            return cached[1], 200, etag_headers(etag)
+        
+        # 获取该月所有日程（重复日程展开为该月内的每次发生）
+        events = Event.query.filter(*month_filters).all()
+        items = recurrence.expand(events, start_date, end_date - timedelta(days=1))
         
         # 按日期分组
         calendar_data = {}
-        for event in events:
-            date_key = event.event_date.isoformat()
+        for data in recurrence.occurrence_dicts(items, summary=True):
+            date_key = data['event_date']
             if date_key not in calendar_data:
                 calendar_data[date_key] = []
-            calendar_data[date_key].append(event.to_summary_dict())
+            calendar_data[date_key].append(data)
         
-        return {
+        payload = {
             'year': year,
             'month': month,
             'calendar': calendar_data
-        }, 200
+        }
+        calendar_cache.set(cache_key, (etag, payload), generation)
+        
+        return payload, 200, etag_headers(etag)
+
+
+class CalendarFeedResource(Resource):
+    """iCalendar 订阅源资源"""
+    
+    def get(self):
+        """
+        获取 .ics 订阅源（无需登录，供日历客户端订阅）
+        
+        可选参数：department（举办部门）、status、start_date / end_date（默认前 30 天至后 365 天）。
+        支持 If-None-Match，未变化时返回 304。
+        """
+        department = request.args.get('department')
+        status = request.args.get('status')
+        today = date.today()
+        
+        try:
+            start = request.args.get('start_date')
+            end = request.args.get('end_date')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else today - timedelta(days=current_app.config['ICAL_PAST_DAYS'])
+            end = datetime.strptime(end, '%Y-%m-%d').date() if end else today + timedelta(days=current_app.config['ICAL_FUTURE_DAYS'])
+        except ValueError:
+            return {'message': '日期格式错误，应为 YYYY-MM-DD'}, 400
+        
+        # 重复日程以 RRULE 输出一次，由日历客户端展开
+        filters = [recurrence.window_filter(start, end)]
+        if department:
+            filters.append(Event.organizer_department == department)
+        if status and status in ['pending', 'in_progress', 'completed', 'cancelled']:
+            filters.append(Event.status == status)
+        
+        cache_key = (department, status, start, end)
+        etag = make_etag('ics', cache_key, event_validator())
+        headers = etag_headers(etag)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        mimetype = 'text/calendar'
+        cached, generation = ical.feed_cache.get(cache_key)
+        if cached is not None and cached[0] == etag:
+            return Response(cached[1], mimetype=mimetype, headers=headers)
+        
+        name = f'QD日历 - {department}' if department else 'QD日历'
+        body = ical.iter_feed(filters, name, cache_key, etag, generation)
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
 
 
 class ImageUploadResource(Resource):
@@ -314,18 +793,20 @@ class ImageUploadResource(Resource):
             return {'message': f'不支持的文件格式，允许的格式: {allowed_exts}'}, 400
         
         try:
-            file_storage = FileStorage()
-            result = file_storage.upload_file(file)
+            result = get_storage().upload_file(file)
             
             if result:
                 return {
                     'message': '图片上传成功',
                     'url': result['url'],
-                    'filename': result['filename']
+                    'filename': result['filename'],
+                    'deduplicated': result['deduplicated']
                 }, 200
             else:
                 return {'message': '图片上传失败'}, 500
                 
+        except UploadTooLarge as e:
+            return {'message': str(e)}, 413
         except Exception as e:
             current_app.logger.error(f"上传图片时出错: {str(e)}")
             return {'message': f'上传失败: {str(e)}'}, 500
@@ -337,22 +818,26 @@ class UpcomingEventsResource(Resource):
     @jwt_required(optional=True)
     def get(self):
         """获取当天及未来一周内的活动"""
-        from datetime import timedelta
-        
         today = date.today()
         next_week = today + timedelta(days=7)
         
         # 查询当天及未来7天的活动
-        events = Event.query.filter(
-            Event.event_date >= today,
-            Event.event_date <= next_week,
+        upcoming_filters = [
+            recurrence.window_filter(today, next_week),
             Event.status != 'cancelled'  # 排除已取消的活动
-        ).order_by(Event.event_date.asc(), Event.start_time.asc()).all()
+        ]
+        
+        # 条件请求：数据未变化时直接返回 304
+        etag = make_etag('upcoming', today.isoformat(), event_validator())
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        events = Event.query.filter(*upcoming_filters).all()
+        events = recurrence.occurrence_dicts(recurrence.expand(events, today, next_week))
         
         return {
-            'events': [event.to_dict() for event in events],
+            'events': events,
             'count': len(events),
             'start_date': today.isoformat(),
             'end_date': next_week.isoformat()
-        }, 200
-
+        }, 200, etag_headers(etag)
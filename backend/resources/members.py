@@ -3,25 +3,14 @@
 """
 from flask import request, current_app
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Member, User
-from functools import wraps
-
-
-def admin_required(fn):
-    """装饰器：要求管理员权限"""
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        # current_user_id 是字符串，需要转换为整数
-        user = User.query.get(int(current_user_id))
-        
-        if not user or user.role != 'admin':
-            return {'message': '需要管理员权限'}, 403
-        
-        return fn(*args, **kwargs)
-    return wrapper
+from flask_jwt_extended import jwt_required
+from models import db, Member, Event
+from utils import analytics_rollup, member_search
+from utils.bulk_import import (
+    iter_request_rows, chunked, parse_member_row, upsert_member_chunk, normalize_contact, MEMBER_KEYS
+)
+from utils.auth import admin_required
+import csv
 
 
 class MemberListResource(Resource):
@@ -44,19 +33,15 @@ class MemberListResource(Resource):
             if is_active is not None:
                 query = query.filter_by(is_active=(is_active.lower() == 'true'))
             
-            # 搜索：姓名、部门、职位
+            # 搜索：姓名、部门、职位（n-gram 索引 + 相关度排序）
+            search = search.strip()
             if search:
-                search_pattern = f'%{search}%'
-                query = query.filter(
-                    db.or_(
-                        Member.name.like(search_pattern),
-                        Member.department.like(search_pattern),
-                        Member.position.like(search_pattern)
-                    )
+                query = member_search.apply_search(
+                    query, search, current_app.config['MEMBER_SEARCH_MAX_CANDIDATES']
                 )
-            
-            # 排序
-            query = query.order_by(Member.created_at.desc())
+            else:
+                # 排序
+                query = query.order_by(Member.created_at.desc())
             
             # 分页
             pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -85,14 +70,16 @@ class MemberListResource(Resource):
             # 创建人员
             member = Member(
                 name=data['name'],
-                phone=data.get('phone'),
-                email=data.get('email'),
+                phone=normalize_contact('phone', data.get('phone')),
+                email=normalize_contact('email', data.get('email')),
                 department=data.get('department'),
                 position=data.get('position'),
                 is_active=data.get('is_active', True)
             )
             
             db.session.add(member)
+            db.session.flush()
+            member_search.reindex_members([member])
             db.session.commit()
             
             return {
@@ -106,6 +93,65 @@ class MemberListResource(Resource):
             return {'message': '创建人员失败'}, 500
 
 
+class MemberImportResource(Resource):
+    """人员批量导入资源"""
+    
+    @admin_required
+    def post(self):
+        """
+        批量导入人员（仅管理员）
+        
+        支持 CSV / JSON 数组 / JSON Lines，按唯一键（?key=email|phone|name）新增或更新，
+        数据逐行流式读取，每个分片一次提交，重复导入不会产生重复人员。
+        """
+        key = request.args.get('key', current_app.config['MEMBER_IMPORT_KEY'])
+        if key not in MEMBER_KEYS:
+            return {'message': f"不支持的唯一键: {key}，可选值: {', '.join(MEMBER_KEYS)}"}, 400
+        
+        chunk_size = current_app.config['MEMBER_IMPORT_CHUNK_SIZE']
+        max_errors = 100
+        result = {'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        errors = []
+        
+        try:
+            rows = enumerate(iter_request_rows(), start=1)
+            for raw_chunk in chunked(rows, chunk_size):
+                chunk = []
+                for index, row in raw_chunk:
+                    try:
+                        chunk.append((index, parse_member_row(row, key)))
+                    except ValueError as e:
+                        result['failed'] += 1
+                        if len(errors) < max_errors:
+                            errors.append({'row': index, 'message': str(e)})
+                
+                if not chunk:
+                    continue
+                
+                stats = upsert_member_chunk(chunk, key)
+                # 姓名变化会影响日程中的参与人员列表
+                Event.touch_by_members(stats['renamed_ids'])
+                db.session.commit()
+                
+                for field in ('inserted', 'updated', 'skipped'):
+                    result[field] += stats[field]
+                    
+        except (ValueError, csv.Error) as e:
+            db.session.rollback()
+            return {'message': f'读取导入数据失败: {str(e)}', **result, 'errors': errors}, 400
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"批量导入人员失败: {str(e)}")
+            return {'message': '批量导入人员失败', **result, 'errors': errors}, 500
+        
+        return {
+            'message': '人员导入完成',
+            'key': key,
+            **result,
+            'errors': errors
+        }, 200
+
+
 class MemberDetailResource(Resource):
     """人员详情资源"""
     
@@ -138,11 +184,14 @@ class MemberDetailResource(Resource):
         try:
             # 更新字段
             if 'name' in data:
+                if data['name'] != member.name:
+                    # 姓名会出现在日程的参与人员列表中
+                    Event.touch_by_members([member.id])
                 member.name = data['name']
             if 'phone' in data:
-                member.phone = data['phone']
+                member.phone = normalize_contact('phone', data['phone'])
             if 'email' in data:
-                member.email = data['email']
+                member.email = normalize_contact('email', data['email'])
             if 'department' in data:
                 member.department = data['department']
             if 'position' in data:
@@ -150,6 +199,10 @@ class MemberDetailResource(Resource):
             if 'is_active' in data:
                 member.is_active = data['is_active']
             
+            # 可搜索字段变化时更新搜索索引
+            if any(field in data for field in member_search.SEARCH_FIELDS):
+                member_search.reindex_members([member])
+            
             db.session.commit()
             
             return {
@@ -171,7 +224,16 @@ class MemberDetailResource(Resource):
             return {'message': '人员不存在'}, 404
         
         try:
+            Event.touch_by_members([member.id])
+            affected_ids = analytics_rollup.event_ids_of_member(member.id)
+            original_stats = analytics_rollup.contribution(affected_ids)
+            member_search.remove_members([member.id])
             db.session.delete(member)
+            db.session.flush()
+            
+            # 人员删除会减少其参与日程当天的参与人次
+            analytics_rollup.apply_delta(original_stats, analytics_rollup.contribution(affected_ids))
+            
             db.session.commit()
             
             return {'message': '人员删除成功'}, 200
@@ -0,0 +1,27 @@
+"""
+运行指标 API 资源
+"""
+from flask_restful import Resource
+from utils.auth import admin_required, user_version_cache
+from utils.cache import calendar_cache
+from utils.recurrence import occurrence_cache
+from utils.password import password_hasher
+from utils.job_queue import job_queue
+from utils import ical
+
+
+class MetricsResource(Resource):
+    """进程内运行指标（仅管理员）"""
+    
+    @admin_required
+    def get(self):
+        """获取当前进程的缓存等运行指标"""
+        return {
+            'calendar_cache': calendar_cache.stats(),
+            'ical_feed_cache': ical.feed_cache.stats(),
+            'ical_event_cache': ical.vevent_cache.stats(),
+            'user_version_cache': user_version_cache.stats(),
+            'recurrence_cache': occurrence_cache.stats(),
+            'password_hasher': password_hasher.stats(),
+            'job_queue': job_queue.stats()
+        }, 200
@@ -0,0 +1,89 @@
+"""
+测试公共配置：使用内存 SQLite 创建应用，每个测试前清空数据
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config as app_config
+from app import create_app
+from models import db, User
+
+
+class TestConfig(app_config.Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'connect_args': {'check_same_thread': False},
+        'poolclass': StaticPool
+    }
+    STORAGE_BACKEND = 'memory'
+    UPLOAD_FOLDER = tempfile.mkdtemp(prefix='qd-test-uploads-')
+    JOB_QUEUE_PATH = os.path.join(tempfile.mkdtemp(prefix='qd-test-jobs-'), 'jobs.sqlite3')
+    JOB_QUEUE_WORKERS = 0  # 任务在提交后同步执行
+
+
+app_config.config['test'] = TestConfig
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app('test')
+
+
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """每个测试前清空除用户以外的数据"""
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name != User.__tablename__:
+                db.session.execute(table.delete())
+        db.session.commit()
+    yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(app):
+    """管理员的认证请求头"""
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        token = create_access_token(identity=str(admin.id), additional_claims=admin.token_claims())
+    return {'Authorization': f'Bearer {token}'}
+
+
+class QueryCounter:
+    """统计代码块内执行的 SQL 语句数"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _count(self, *args, **kwargs):
+        self.count += 1
+    
+    def __enter__(self):
+        sa_event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+    
+    def __exit__(self, *exc):
+        sa_event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+@pytest.fixture
+def count_queries(app):
+    """用法：with count_queries() as counter: ...; counter.count"""
+    with app.app_context():
+        engine = db.engine
+    return lambda: QueryCounter(engine)
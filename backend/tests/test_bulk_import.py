@@ -0,0 +1,72 @@
+"""
+批量导入：有参与人员的日程取回的主键与插入顺序一致
+"""
+from datetime import date, time
+
+from models import db, Event, Member, User, event_members
+from utils import bulk_import
+
+
+def _rows(admin_id, n):
+    return [
+        {
+            'title': f'导入日程{i}',
+            'event_date': date(2030, 1, 1 + i),
+            'start_time': time(9, i),
+            'created_by': admin_id,
+            'location': '会议室',
+            'organizer_department': '技术部',
+            'background_image': '/uploads/a.png'
+        }
+        for i in range(n)
+    ]
+
+
+def _titles(event_ids):
+    titles = dict(db.session.query(Event.id, Event.title).filter(Event.id.in_(event_ids)))
+    return [titles[event_id] for event_id in event_ids]
+
+
+def test_consecutive_insert_returns_ids_in_row_order(app):
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        
+        # 单行时 SQLite 的 lastrowid 就是这一行，核对通过
+        event_ids = bulk_import._insert_consecutive(Event.__table__, _rows(admin.id, 1))
+        assert _titles(event_ids) == ['导入日程0']
+        
+        # 多行时 SQLite 的 lastrowid 是最后一行，与 MySQL 不同，核对失败后逐条插入
+        db.session.execute(Event.__table__.delete())
+        event_ids = bulk_import._insert_consecutive(Event.__table__, _rows(admin.id, 5))
+        db.session.commit()
+        assert _titles(event_ids) == [f'导入日程{i}' for i in range(5)]
+        assert Event.query.count() == 5
+
+
+def test_import_links_members_to_their_own_events(app, client, admin_headers):
+    with app.app_context():
+        members = [Member(name=f'人员{i}') for i in range(3)]
+        db.session.add_all(members)
+        db.session.commit()
+        member_ids = [member.id for member in members]
+    
+    rows = [
+        {
+            'title': f'日程{i}',
+            'event_date': '2030-02-01',
+            'location': '会议室',
+            'organizer_department': '技术部',
+            'background_image': '/uploads/a.png',
+            'member_ids': [member_ids[i % 3]] if i % 2 else []
+        }
+        for i in range(10)
+    ]
+    response = client.post('/api/events/import', headers=admin_headers, json=rows)
+    assert response.status_code == 201
+    assert response.get_json()['imported'] == 10
+    
+    with app.app_context():
+        links = db.session.query(Event.title, event_members.c.member_id).join(
+            event_members, event_members.c.event_id == Event.id
+        ).all()
+        assert sorted(links) == sorted((f'日程{i}', member_ids[i % 3]) for i in range(1, 10, 2))
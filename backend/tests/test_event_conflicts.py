@@ -0,0 +1,89 @@
+"""
+日程人员时间冲突：reject 模式拒绝保存，member_ids 格式错误返回明确的提示
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from models import db, Event, Member, User
+
+EVENT_DATE = date.today() + timedelta(days=3)
+
+
+@pytest.fixture
+def busy_member(app):
+    """已参加 EVENT_DATE 10:00-11:00 日程的人员 ID"""
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        member = Member(name='张三')
+        event = Event(
+            title='已有日程',
+            event_date=EVENT_DATE,
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            location='会议室',
+            organizer_department='技术部',
+            background_image='/uploads/a.png',
+            created_by=admin.id
+        )
+        event.members.append(member)
+        db.session.add(event)
+        db.session.commit()
+        return member.id
+
+
+def _event_payload(**fields):
+    payload = {
+        'title': '新日程',
+        'event_date': EVENT_DATE.isoformat(),
+        'start_time': '10:30:00',
+        'end_time': '11:30:00',
+        'location': '会议室',
+        'organizer_department': '技术部',
+        'background_image': '/uploads/b.png'
+    }
+    payload.update(fields)
+    return payload
+
+
+def test_reject_mode_returns_409_and_saves_nothing(app, client, admin_headers, busy_member):
+    response = client.post(
+        '/api/events?on_conflict=reject', headers=admin_headers,
+        json=_event_payload(member_ids=[busy_member])
+    )
+    assert response.status_code == 409
+    conflicts = response.get_json()['conflicts']
+    assert [c['member_id'] for c in conflicts] == [busy_member]
+    with app.app_context():
+        assert Event.query.count() == 1
+
+
+def test_warn_mode_saves_and_reports_conflicts(app, client, admin_headers, busy_member):
+    response = client.post(
+        '/api/events?on_conflict=warn', headers=admin_headers,
+        json=_event_payload(member_ids=[str(busy_member)])
+    )
+    assert response.status_code == 201
+    assert len(response.get_json()['conflicts']) == 1
+
+
+@pytest.mark.parametrize('member_ids', [['abc'], [1.5], [0], [True], 'abc', {'id': 1}])
+def test_malformed_member_ids_are_rejected(app, client, admin_headers, busy_member, member_ids):
+    response = client.post('/api/events', headers=admin_headers, json=_event_payload(member_ids=member_ids))
+    assert response.status_code == 400
+    assert 'member_ids' in response.get_json()['message']
+    
+    with app.app_context():
+        event_id = Event.query.first().id
+    response = client.put(f'/api/events/{event_id}', headers=admin_headers, json={'member_ids': member_ids})
+    assert response.status_code == 400
+    assert 'member_ids' in response.get_json()['message']
+
+
+def test_conflict_check_rejects_malformed_member_ids(client, admin_headers):
+    response = client.get(
+        f'/api/events/conflicts?member_ids=1,x&event_date={EVENT_DATE}&start_time=10:00:00',
+        headers=admin_headers
+    )
+    assert response.status_code == 400
+    assert 'member_ids' in response.get_json()['message']
@@ -0,0 +1,104 @@
+"""
+日程列表游标分页：游标编解码、空开始时间的排序、无效游标，以及重复日程跨页展开
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from models import db, Event, User
+from resources.events import _decode_cursor, _encode_cursor
+from utils import recurrence
+
+DAY = date(2030, 3, 4)  # 星期一
+
+
+def _add_event(title, event_date, start_time=None, rule=None):
+    admin = User.query.filter_by(role='admin').first()
+    event = Event(
+        title=title,
+        event_date=event_date,
+        start_time=start_time,
+        location='会议室',
+        organizer_department='技术部',
+        background_image='/uploads/a.png',
+        created_by=admin.id,
+        **recurrence.parse_recurrence(rule, event_date)
+    )
+    db.session.add(event)
+    return event
+
+
+def _pages(client, query, limit):
+    """按游标翻完所有页，返回 [(标题, 发生日期), ...] 和页数"""
+    items = []
+    pages = 0
+    cursor = None
+    while True:
+        url = f'/api/events?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.get_json()
+        pages += 1
+        assert len(data['events']) <= limit
+        items += [(event['title'], event['occurrence_date']) for event in data['events']]
+        cursor = data['next_cursor']
+        assert data['has_more'] == (cursor is not None)
+        if not cursor:
+            return items, pages
+
+
+@pytest.mark.parametrize('start_time', [time(9, 30), None])
+def test_cursor_round_trip(start_time):
+    cursor = _encode_cursor(DAY, start_time, 42)
+    assert '=' not in cursor
+    assert _decode_cursor(cursor) == (DAY, start_time, 42)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'bm90LWpzb24', 'WzEsMl0', 'WyIyMDMwLTEzLTAxIixudWxsLDFd'])
+def test_invalid_cursor_returns_400(client, cursor):
+    # 依次为：非 base64、不是 JSON、字段个数不对、日期不合法
+    response = client.get(f'/api/events?cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == '无效的分页游标'
+
+
+def test_null_start_time_sorts_first_within_a_day(app, client):
+    with app.app_context():
+        _add_event('十点', DAY, time(10, 0))
+        _add_event('全天一', DAY)
+        _add_event('九点', DAY, time(9, 0))
+        _add_event('全天二', DAY)
+        _add_event('次日全天', date(2030, 3, 5))
+        _add_event('前一天十点', date(2030, 3, 3), time(10, 0))
+        db.session.commit()
+    
+    for limit in (1, 2, 4):
+        items, _ = _pages(client, '', limit)
+        assert [title for title, _ in items] == ['前一天十点', '全天一', '全天二', '九点', '十点', '次日全天']
+
+
+def test_recurring_series_pages_without_duplicates(app, client):
+    with app.app_context():
+        _add_event('周会', DAY, time(10, 0), {'freq': 'weekly', 'count': 6})
+        _add_event('晨会', DAY, time(9, 0), {'freq': 'daily', 'count': 10})
+        _add_event('单次一', date(2030, 3, 6), time(10, 0))
+        _add_event('单次二', date(2030, 3, 11))
+        _add_event('范围外', date(2030, 5, 1))
+        db.session.commit()
+    
+    items, pages = _pages(client, '&start_date=2030-03-01&end_date=2030-04-30', 3)
+    # 同一天内按开始时间排序：全天（单次二）< 09:00（晨会）< 10:00（周会、单次一）
+    start_order = {'单次二': 0, '晨会': 1, '周会': 2, '单次一': 2}
+    expected = sorted(
+        [('周会', (DAY + timedelta(weeks=i)).isoformat()) for i in range(6)]
+        + [('晨会', (DAY + timedelta(days=i)).isoformat()) for i in range(10)]
+        + [('单次一', '2030-03-06'), ('单次二', '2030-03-11')],
+        key=lambda item: (item[1], start_order[item[0]])
+    )
+    assert len(items) == len(set(items)) == 18
+    assert items == expected
+    assert pages == 6
+    
+    # 不指定日期范围时每个重复日程只出现一次（首次日期）
+    items, _ = _pages(client, '', 3)
+    assert [title for title, _ in items] == ['晨会', '周会', '单次一', '单次二', '范围外']
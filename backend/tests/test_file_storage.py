@@ -0,0 +1,66 @@
+"""
+文件存储：上传、访问与衍生图 URL 都通过存储后端解析（测试使用 memory 后端）
+"""
+import io
+
+import pytest
+
+from utils import storage_backends
+from utils.file_storage import get_storage
+from utils.storage_backends import MemoryBackend, create_backend
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+def _upload(client, headers, content=PNG, filename='poster.png'):
+    return client.post(
+        '/api/upload/image',
+        headers=headers,
+        data={'file': (io.BytesIO(content), filename)},
+        content_type='multipart/form-data'
+    )
+
+
+def test_upload_is_served_from_backend(app, client, admin_headers):
+    with app.app_context():
+        assert isinstance(get_storage().backend, MemoryBackend)
+    
+    response = _upload(client, admin_headers)
+    assert response.status_code == 200
+    url = response.get_json()['url']
+    assert response.get_json()['deduplicated'] is False
+    
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.cache_control.immutable
+    
+    assert _upload(client, admin_headers, filename='again.png').get_json() == {
+        'message': '图片上传成功', 'url': url, 'filename': url.rsplit('/', 1)[1], 'deduplicated': True
+    }
+    assert client.get(url.rsplit('/', 1)[0] + '/missing.png').status_code == 404
+
+
+def test_event_variants_fall_back_to_original_on_non_local_backend(client, admin_headers):
+    url = _upload(client, admin_headers).get_json()['url']
+    response = client.post('/api/events', headers=admin_headers, json={
+        'title': '海报日程',
+        'event_date': '2030-01-01',
+        'location': '会议室',
+        'organizer_department': '技术部',
+        'background_image': url
+    })
+    assert response.status_code == 201
+    event = response.get_json()['event']
+    assert event['background_image'] == url
+    assert event['variants'] is None
+
+
+def test_s3_backend_requires_boto3_and_bucket(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage_backends, 'boto3', None)
+    with pytest.raises(RuntimeError, match='requirements-s3.txt'):
+        create_backend({'STORAGE_BACKEND': 's3', 'S3_BUCKET': 'calendar'}, str(tmp_path))
+    
+    monkeypatch.setattr(storage_backends, 'boto3', object())
+    with pytest.raises(ValueError, match='S3_BUCKET'):
+        create_backend({'STORAGE_BACKEND': 's3'}, str(tmp_path))
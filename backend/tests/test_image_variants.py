@@ -0,0 +1,66 @@
+"""
+衍生图进程池：子进程异常退出后上传接口仍然可用
+"""
+import io
+import os
+import signal
+import time
+
+import pytest
+
+from utils import image_variants
+from utils.file_storage import FileStorage
+from utils.storage_backends import LocalBackend
+
+pytestmark = pytest.mark.skipif(not image_variants.available(), reason='需要安装 Pillow')
+
+
+@pytest.fixture
+def local_storage(app, tmp_path):
+    """衍生图只在本地后端生成：测试期间把应用的存储实例换成本地目录"""
+    previous = app.extensions['file_storage']
+    app.extensions['file_storage'] = FileStorage(
+        LocalBackend(str(tmp_path)), '/uploads', str(tmp_path / '.tmp')
+    )
+    image_variants.variant_cache.clear()
+    yield app.extensions['file_storage']
+    app.extensions['file_storage'] = previous
+
+
+def _png(color):
+    from PIL import Image
+    
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 32), color).save(buf, 'PNG')
+    buf.seek(0)
+    return buf
+
+
+def _upload(client, headers, color):
+    return client.post(
+        '/api/upload/image',
+        headers=headers,
+        data={'file': (_png(color), f'{color}.png')},
+        content_type='multipart/form-data'
+    )
+
+
+def test_upload_succeeds_after_pool_worker_is_killed(client, admin_headers, local_storage):
+    assert _upload(client, admin_headers, 'red').status_code == 200
+    executor = image_variants._executor
+    assert executor is not None
+    
+    for process in list(executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not executor._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert executor._broken
+    
+    response = _upload(client, admin_headers, 'green')
+    assert response.status_code == 200
+    assert response.get_json()['deduplicated'] is False
+    assert image_variants._executor is None  # 损坏的进程池已丢弃，下次上传时重新创建
+    
+    assert _upload(client, admin_headers, 'blue').status_code == 200
+    assert image_variants._executor not in (None, executor)
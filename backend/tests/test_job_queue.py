@@ -0,0 +1,53 @@
+"""
+提交后任务：只在最外层事务提交后执行，保存点回滚只丢弃其中登记的任务
+"""
+import pytest
+
+from models import db
+from utils.job_queue import register, enqueue_after_commit
+
+executed = []
+
+
+@register('test_record')
+def _record(payload):
+    executed.append(payload['name'])
+
+
+@pytest.fixture(autouse=True)
+def reset_executed():
+    executed.clear()
+
+
+def test_savepoint_rollback_keeps_outer_jobs(app):
+    with app.app_context():
+        enqueue_after_commit(db.session, 'test_record', {'name': 'outer'})
+        savepoint = db.session.begin_nested()
+        enqueue_after_commit(db.session, 'test_record', {'name': 'inner'})
+        savepoint.rollback()
+        assert executed == []
+        
+        db.session.commit()
+        assert executed == ['outer']
+
+
+def test_savepoint_release_waits_for_outer_commit(app):
+    with app.app_context():
+        enqueue_after_commit(db.session, 'test_record', {'name': 'outer'})
+        with db.session.begin_nested():
+            enqueue_after_commit(db.session, 'test_record', {'name': 'inner'})
+        assert executed == []
+        
+        db.session.commit()
+        assert executed == ['outer', 'inner']
+
+
+def test_outer_rollback_discards_released_savepoint_jobs(app):
+    with app.app_context():
+        enqueue_after_commit(db.session, 'test_record', {'name': 'outer'})
+        with db.session.begin_nested():
+            enqueue_after_commit(db.session, 'test_record', {'name': 'inner'})
+        db.session.rollback()
+        
+        db.session.commit()
+        assert executed == []
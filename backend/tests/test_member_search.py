@@ -0,0 +1,40 @@
+"""
+人员搜索：结果完整，总数与分页不受候选记录数影响
+"""
+import pytest
+
+from models import db, Member
+from utils import member_search
+
+MEMBER_COUNT = 620
+
+
+@pytest.fixture
+def members(app):
+    with app.app_context():
+        members = [
+            Member(name=f'张{i:03d}', department='技术部' if i % 2 else '市场部', position='工程师')
+            for i in range(MEMBER_COUNT)
+        ]
+        db.session.add_all(members)
+        db.session.flush()
+        member_search.reindex_members(members)
+        db.session.commit()
+
+
+@pytest.mark.parametrize('max_candidates', [0, 500, 10000])
+def test_common_gram_returns_every_match(app, client, admin_headers, members, monkeypatch, max_candidates):
+    monkeypatch.setitem(app.config, 'MEMBER_SEARCH_MAX_CANDIDATES', max_candidates)
+    
+    response = client.get('/api/members?search=张&per_page=100&page=7', headers=admin_headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total'] == MEMBER_COUNT
+    assert data['pages'] == 7
+    assert len(data['members']) == MEMBER_COUNT - 600
+    
+    response = client.get('/api/members?search=技术&per_page=100&page=4', headers=admin_headers)
+    data = response.get_json()
+    assert data['total'] == MEMBER_COUNT // 2
+    assert len(data['members']) == MEMBER_COUNT // 2 - 300
+    assert all(member['department'] == '技术部' for member in data['members'])
@@ -0,0 +1,74 @@
+"""
+查询次数回归测试：日程序列化与列表接口的 SQL 语句数不随日程数量增长
+"""
+from datetime import date, timedelta
+
+from models import db, Event, Member, User
+
+
+def _create_events(app, n, members_per_event=3):
+    """创建 n 个今天起一周内的日程，每个日程关联若干人员"""
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        members = [Member(name=f'人员{i}') for i in range(members_per_event)]
+        db.session.add_all(members)
+        today = date.today()
+        for i in range(n):
+            event = Event(
+                title=f'日程{i}',
+                event_date=today + timedelta(days=i % 7),
+                location='会议室',
+                organizer_department='技术部',
+                background_image='/uploads/a.png',
+                created_by=admin.id
+            )
+            db.session.add(event)
+            for member in members:
+                event.members.append(member)
+        db.session.commit()
+
+
+def _to_dict_batch_queries(app, count_queries):
+    with app.app_context():
+        events = Event.query.all()
+        with count_queries() as counter:
+            Event.to_dict_batch(events)
+        return counter.count
+
+
+def _request_queries(client, count_queries, url):
+    with count_queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+def test_to_dict_batch_query_count_is_constant(app, count_queries):
+    _create_events(app, 3)
+    small = _to_dict_batch_queries(app, count_queries)
+    
+    _create_events(app, 60)
+    large = _to_dict_batch_queries(app, count_queries)
+    
+    assert small == large
+    assert large <= 2  # 创建者一次、参与人员一次
+
+
+def test_event_list_query_count_is_constant(app, client, count_queries):
+    _create_events(app, 3)
+    small = _request_queries(client, count_queries, '/api/events')
+    
+    _create_events(app, 60)
+    large = _request_queries(client, count_queries, '/api/events')
+    
+    assert small == large
+
+
+def test_upcoming_query_count_is_constant(app, client, count_queries):
+    _create_events(app, 3)
+    small = _request_queries(client, count_queries, '/api/events/upcoming')
+    
+    _create_events(app, 60)
+    large = _request_queries(client, count_queries, '/api/events/upcoming')
+    
+    assert small == large
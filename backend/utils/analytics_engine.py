@@ -0,0 +1,135 @@
+"""
+数据分析聚合引擎
+用条件聚合一次性算出各项统计，避免对同一日期范围重复扫描
+"""
+from flask import current_app
+from sqlalchemy import func, case
+from models import db, Event, DailyEventStat, event_members
+
+STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+PRIORITIES = ('low', 'medium', 'high')
+
+COUNTER_FIELDS = (
+    ('total_events',)
+    + tuple(f'{status}_count' for status in STATUSES)
+    + tuple(f'{priority}_count' for priority in PRIORITIES)
+    + ('total_participants',)
+)
+
+
+def empty_record():
+    """一天（或一个统计区间）的空计数记录"""
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def aggregate_events_by_day(*criteria):
+    """
+    一次分组查询得到每天的活动总数及状态、优先级分布
+    
+    Returns:
+        dict: {date: 计数记录}，total_participants 为 0
+    """
+    columns = [func.count(Event.id)]
+    columns += [func.sum(case((Event.status == status, 1), else_=0)) for status in STATUSES]
+    columns += [func.sum(case((Event.priority == priority, 1), else_=0)) for priority in PRIORITIES]
+    
+    rows = db.session.query(Event.event_date, *columns).filter(
+        *criteria
+    ).group_by(Event.event_date).all()
+    
+    stats = {}
+    for row in rows:
+        record = empty_record()
+        for field, value in zip(COUNTER_FIELDS, row[1:]):
+            record[field] = int(value or 0)
+        stats[row[0]] = record
+    return stats
+
+
+def participants_by_day(*criteria):
+    """每天的参与人次：{date: count}"""
+    rows = db.session.query(
+        Event.event_date,
+        func.count(event_members.c.member_id)
+    ).join(
+        event_members, Event.id == event_members.c.event_id
+    ).filter(
+        *criteria
+    ).group_by(Event.event_date).all()
+    return {stat_date: int(count or 0) for stat_date, count in rows}
+
+
+def participant_totals(*criteria):
+    """一次查询得到参与总人次与去重人数：(total, unique)"""
+    total, unique = db.session.query(
+        func.count(event_members.c.member_id),
+        func.count(func.distinct(event_members.c.member_id))
+    ).join(
+        Event, Event.id == event_members.c.event_id
+    ).filter(
+        *criteria
+    ).one()
+    return int(total or 0), int(unique or 0)
+
+
+def unique_participants(*criteria):
+    """去重参与人数（无法按天预聚合，只能实时计算）"""
+    return db.session.query(
+        func.count(func.distinct(event_members.c.member_id))
+    ).join(
+        Event, Event.id == event_members.c.event_id
+    ).filter(
+        *criteria
+    ).scalar() or 0
+
+
+def daily_overview(start_date, end_date):
+    """
+    获取 [start_date, end_date) 范围内的每日统计
+    
+    启用汇总表时读取 daily_event_stats（每天一行），
+    否则直接对原始表做条件聚合；两种方式都只需要两次查询。
+    
+    Returns:
+        dict: {
+            'daily': [(date, 计数记录), ...]（按日期升序，只含有活动的日期）,
+            'total_participants': 参与总人次,
+            'unique_participants': 去重参与人数
+        }
+    """
+    range_criteria = (
+        Event.event_date >= start_date,
+        Event.event_date < end_date
+    )
+    
+    if current_app.config.get('ANALYTICS_USE_ROLLUP', True):
+        rows = DailyEventStat.query.filter(
+            DailyEventStat.stat_date >= start_date,
+            DailyEventStat.stat_date < end_date,
+            DailyEventStat.total_events > 0
+        ).order_by(DailyEventStat.stat_date).all()
+        
+        daily = [
+            (row.stat_date, {field: getattr(row, field) for field in COUNTER_FIELDS})
+            for row in rows
+        ]
+        total_participants = sum(record['total_participants'] for _, record in daily)
+        unique = unique_participants(*range_criteria)
+    else:
+        daily = sorted(aggregate_events_by_day(*range_criteria).items())
+        total_participants, unique = participant_totals(*range_criteria)
+    
+    return {
+        'daily': daily,
+        'total_participants': total_participants,
+        'unique_participants': unique
+    }
+
+
+def sum_records(records):
+    """累加多条计数记录"""
+    total = empty_record()
+    for record in records:
+        for field in COUNTER_FIELDS:
+            total[field] += record[field]
+    return total
@@ -0,0 +1,134 @@
+"""
+数据分析统计区间与时间粒度
+解析 start_date/end_date（或 year/month）参数，并把日期归入日/周/月/季度桶
+"""
+from datetime import datetime, date, timedelta
+from flask import current_app
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+
+def parse_period(args):
+    """
+    从请求参数解析统计区间
+    
+    支持两种方式：
+      1. start_date / end_date（YYYY-MM-DD，均包含）
+      2. year / month（默认当前月，与旧接口兼容）
+    
+    Returns:
+        tuple: (start_date, end_date, granularity)，其中 end_date 为不包含的结束日期
+        
+    Raises:
+        ValueError: 参数格式错误或区间无效
+    """
+    granularity = args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的时间粒度: {granularity}，可选值: {', '.join(GRANULARITIES)}")
+    
+    start_arg = args.get('start_date')
+    end_arg = args.get('end_date')
+    
+    if start_arg or end_arg:
+        if not (start_arg and end_arg):
+            raise ValueError('start_date 和 end_date 需要同时提供')
+        try:
+            start_date = datetime.strptime(start_arg, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_arg, '%Y-%m-%d').date() + timedelta(days=1)
+        except ValueError:
+            raise ValueError('日期格式错误，应为 YYYY-MM-DD')
+    else:
+        year = args.get('year', datetime.now().year, type=int)
+        month = args.get('month', datetime.now().month, type=int)
+        try:
+            start_date = date(year, month, 1)
+        except ValueError:
+            raise ValueError('年份或月份无效')
+        end_date = _add_months(start_date, 1)
+    
+    if end_date <= start_date:
+        raise ValueError('结束日期不能早于开始日期')
+    
+    max_days = current_app.config.get('ANALYTICS_MAX_RANGE_DAYS', 731)
+    if (end_date - start_date).days > max_days:
+        raise ValueError(f'统计区间不能超过 {max_days} 天')
+    
+    return start_date, end_date, granularity
+
+
+def period_info(start_date, end_date, granularity):
+    """响应中的 period 字段（end_date 转换为包含的最后一天）"""
+    info = {
+        'start_date': start_date.isoformat(),
+        'end_date': (end_date - timedelta(days=1)).isoformat(),
+        'granularity': granularity
+    }
+    # 区间恰好是一个自然月时保留 year/month 字段
+    if start_date.day == 1 and end_date == _add_months(start_date, 1):
+        info['year'] = start_date.year
+        info['month'] = start_date.month
+    return info
+
+
+def bucket_start(d, granularity):
+    """日期所在统计桶的起始日期"""
+    if granularity == 'week':
+        return d - timedelta(days=d.weekday())
+    if granularity == 'month':
+        return d.replace(day=1)
+    if granularity == 'quarter':
+        return date(d.year, (d.month - 1) // 3 * 3 + 1, 1)
+    return d
+
+
+def bucket_label(start, granularity):
+    """统计桶的显示标签"""
+    if granularity == 'week':
+        iso_year, iso_week, _ = start.isocalendar()
+        return f'{iso_year}-W{iso_week:02d}'
+    if granularity == 'month':
+        return start.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f'{start.year}-Q{(start.month - 1) // 3 + 1}'
+    return start.isoformat()
+
+
+def bucket_end(start, granularity):
+    """统计桶的最后一天（包含）"""
+    if granularity == 'week':
+        return start + timedelta(days=6)
+    if granularity == 'month':
+        return _add_months(start, 1) - timedelta(days=1)
+    if granularity == 'quarter':
+        return _add_months(start, 3) - timedelta(days=1)
+    return start
+
+
+def group_by_bucket(items, granularity, key=lambda item: item[0]):
+    """
+    按统计桶分组（一次遍历）
+    
+    Args:
+        items: 可迭代对象，元素需能通过 key 取得日期
+        
+    Returns:
+        dict: {桶起始日期: [元素, ...]}，按桶起始日期升序
+    """
+    buckets = {}
+    for item in items:
+        buckets.setdefault(bucket_start(key(item), granularity), []).append(item)
+    return dict(sorted(buckets.items()))
+
+
+def bucket_info(start, granularity):
+    """统计桶的公共字段"""
+    return {
+        'period': bucket_label(start, granularity),
+        'start_date': start.isoformat(),
+        'end_date': bucket_end(start, granularity).isoformat()
+    }
+
+
+def _add_months(d, months):
+    month_index = d.month - 1 + months
+    return date(d.year + month_index // 12, month_index % 12 + 1, 1)
@@ -0,0 +1,137 @@
+"""
+每日活动统计汇总维护
+日程写入时按增量更新 daily_event_stats，全量重建用于回填，供数据分析接口直接读取
+"""
+from datetime import datetime, timedelta
+from models import db, Event, DailyEventStat, event_members
+from utils.analytics_engine import (
+    COUNTER_FIELDS, empty_record, aggregate_events_by_day, participants_by_day
+)
+
+
+def _aggregate(*criteria):
+    """
+    按日期聚合原始表
+    
+    Returns:
+        dict: {date: {列名: 值}}
+    """
+    stats = aggregate_events_by_day(*criteria)
+    for stat_date, count in participants_by_day(*criteria).items():
+        if stat_date in stats:
+            stats[stat_date]['total_participants'] = count
+    return stats
+
+
+def _replace_rows(delete_criterion, stats):
+    """用新的聚合结果替换汇总表中对应的行（在当前事务内执行）"""
+    DailyEventStat.query.filter(delete_criterion).delete(synchronize_session=False)
+    if stats:
+        db.session.execute(
+            DailyEventStat.__table__.insert(),
+            [{'stat_date': stat_date, **record} for stat_date, record in stats.items()]
+        )
+
+
+def contribution(event_ids):
+    """
+    这些日程当前对汇总表的贡献（按日期的计数记录）
+    
+    在修改日程或参与人员之前、之后各调用一次，把两次结果交给 apply_delta。
+    只读取这几个日程本身，不依赖同一天其他事务写入的数据。
+    
+    Returns:
+        dict: {date: {列名: 值}}
+    """
+    event_ids = [event_id for event_id in event_ids if event_id is not None]
+    if not event_ids:
+        return {}
+    return _aggregate(Event.id.in_(event_ids))
+
+
+def contribution_of_rows(rows):
+    """
+    尚未写入的日程行对汇总表的贡献（批量导入使用，无需回查数据库）
+    
+    Args:
+        rows: [(字段字典, 参与人员ID列表), ...]
+    """
+    stats = {}
+    for values, member_ids in rows:
+        record = stats.setdefault(values['event_date'], empty_record())
+        record['total_events'] += 1
+        record[f"{values.get('status') or 'pending'}_count"] += 1
+        record[f"{values.get('priority') or 'medium'}_count"] += 1
+        record['total_participants'] += len(member_ids or [])
+    return stats
+
+
+def _upsert_statement(table, values, increments):
+    """按数据库方言生成 插入或累加 语句（MySQL: ON DUPLICATE KEY UPDATE，其他: ON CONFLICT DO UPDATE）"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        return insert(table).values(**values).on_duplicate_key_update(**increments)
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).values(**values).on_conflict_do_update(index_elements=['stat_date'], set_=increments)
+
+
+def apply_delta(before, after):
+    """
+    把 after - before 的差值以原子增量写入汇总表（在业务数据所在事务内、提交前调用）
+    
+    每天一条 INSERT ... ON DUPLICATE KEY UPDATE col = col + delta，
+    不先读取汇总行，并发写入同一天时不会相互覆盖；按日期顺序写入，减少死锁。
+    """
+    table = DailyEventStat.__table__
+    now = datetime.utcnow()
+    for stat_date in sorted(set(before) | set(after)):
+        old = before.get(stat_date) or empty_record()
+        new = after.get(stat_date) or empty_record()
+        delta = {field: new[field] - old[field] for field in COUNTER_FIELDS if new[field] != old[field]}
+        if not delta:
+            continue
+        
+        # 汇总行不存在时（尚未回填）只能写入非负值
+        values = {field: max(delta.get(field, 0), 0) for field in COUNTER_FIELDS}
+        increments = {field: table.c[field] + value for field, value in delta.items()}
+        increments['updated_at'] = now
+        db.session.execute(_upsert_statement(
+            table, dict(values, stat_date=stat_date, updated_at=now), increments
+        ))
+
+
+def rebuild(start_date, end_date, chunk_days=31):
+    """
+    全量重建 [start_date, end_date] 范围内的汇总数据（每个分片单独提交）
+    
+    Returns:
+        int: 写入的汇总行数
+    """
+    written = 0
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        stats = _aggregate(
+            Event.event_date >= chunk_start,
+            Event.event_date <= chunk_end
+        )
+        _replace_rows(
+            db.and_(DailyEventStat.stat_date >= chunk_start, DailyEventStat.stat_date <= chunk_end),
+            stats
+        )
+        db.session.commit()
+        written += len(stats)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def event_ids_of_member(member_id):
+    """获取某人员参与的全部日程 ID（人员删除会影响这些日程所在日期的参与人次）"""
+    rows = db.session.query(event_members.c.event_id).filter(
+        event_members.c.member_id == member_id
+    ).all()
+    return [row[0] for row in rows]
@@ -0,0 +1,97 @@
+"""
+认证与权限助手
+角色和令牌版本写在 JWT 声明中，权限检查不再每次查询用户表
+"""
+import uuid
+from functools import wraps
+from flask import current_app
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, create_access_token
+from models import User
+from utils.cache import TTLCache
+
+# 用户当前的 (令牌版本, 角色)：key 为用户 ID，短时间缓存以便角色变更及时生效
+user_version_cache = TTLCache(maxsize=1024, ttl=60)
+
+
+def current_user_state(user_id):
+    """
+    获取用户当前的 (令牌版本, 角色)，用户不存在时返回 None
+    
+    结果缓存 USER_VERSION_CACHE_TTL 秒，每个用户在该时间内最多查询一次数据库。
+    """
+    state, generation = user_version_cache.get(user_id)
+    if state is not None:
+        return state
+    
+    user = User.query.with_entities(User.token_version, User.role).filter(User.id == user_id).first()
+    state = (user.token_version or 0, user.role) if user else False
+    user_version_cache.set(user_id, state, generation)
+    return state or None
+
+
+def token_is_current(claims, user_id):
+    """令牌中的版本和角色是否与用户当前状态一致"""
+    state = current_user_state(user_id)
+    return state is not None and state == (claims.get('ver'), claims.get('role'))
+
+
+def create_guest_token():
+    """
+    签发游客访问令牌，返回 (令牌, identity)
+    
+    游客不落库：identity 为随机标识，声明中带 guest 标记和 guest 角色，
+    有效期取 GUEST_TOKEN_EXPIRES。令牌只能访问只读接口。
+    """
+    identity = f"guest:{uuid.uuid4().hex}"
+    token = create_access_token(
+        identity=identity,
+        additional_claims={'role': 'guest', 'ver': 0, 'guest': True},
+        expires_delta=current_app.config['GUEST_TOKEN_EXPIRES']
+    )
+    return token, identity
+
+
+def is_guest_token(claims):
+    """令牌是否为无状态游客令牌"""
+    return bool(claims.get('guest'))
+
+
+def guest_profile(identity):
+    """游客令牌对应的用户资料（与 User.to_dict 字段一致）"""
+    return {
+        'id': None,
+        'username': identity,
+        'role': 'guest',
+        'email': None,
+        'created_at': None
+    }
+
+
+def admin_required(fn):
+    """装饰器：要求管理员权限"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        claims = get_jwt()
+        if is_guest_token(claims):
+            return {'message': '需要管理员权限'}, 403
+        
+        # current_user_id 是字符串，需要转换为整数
+        current_user_id = int(get_jwt_identity())
+        
+        if 'role' not in claims or 'ver' not in claims:
+            # 旧版令牌没有角色声明，回退到查询用户表
+            user = User.query.get(current_user_id)
+            if not user or user.role != 'admin':
+                return {'message': '需要管理员权限'}, 403
+            return fn(*args, **kwargs)
+        
+        if claims['role'] != 'admin':
+            return {'message': '需要管理员权限'}, 403
+        
+        if not token_is_current(claims, current_user_id):
+            return {'message': '账户权限已变更，请重新登录'}, 401
+        
+        return fn(*args, **kwargs)
+    
+    return wrapper
@@ -0,0 +1,466 @@
+"""
+批量导入助手
+从请求中逐行读取 CSV / JSON 数据，校验后按分片批量写入数据库
+"""
+import csv
+import io
+import json
+import re
+import unicodedata
+from datetime import datetime
+from itertools import islice
+from flask import request
+from sqlalchemy import bindparam, select
+from models import db, Event, Member, event_members
+from utils import member_search
+
+EVENT_PRIORITIES = ('low', 'medium', 'high')
+EVENT_STATUSES = ('pending', 'in_progress', 'completed', 'cancelled')
+
+
+def iter_request_rows():
+    """
+    从当前请求中逐行读取导入数据
+    
+    支持：
+      - multipart 上传的 .csv / .json / .jsonl 文件（字段名 file）
+      - text/csv 请求体
+      - application/json 请求体（对象数组）
+    
+    CSV 与 JSON Lines 为流式读取，不会一次性载入整个文件。
+    
+    Yields:
+        dict: 每行数据
+        
+    Raises:
+        ValueError: 无法识别的数据格式
+    """
+    upload = request.files.get('file')
+    if upload:
+        filename = (upload.filename or '').lower()
+        if filename.endswith('.csv'):
+            yield from _iter_csv(upload.stream)
+        elif filename.endswith(('.jsonl', '.ndjson')):
+            yield from _iter_json_lines(upload.stream)
+        elif filename.endswith('.json'):
+            yield from _iter_json_array(json.load(io.TextIOWrapper(upload.stream, encoding='utf-8-sig')))
+        else:
+            raise ValueError('仅支持 .csv、.json、.jsonl 文件')
+        return
+    
+    if request.mimetype == 'text/csv':
+        yield from _iter_csv(request.stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        yield from _iter_json_lines(request.stream)
+    elif request.is_json:
+        yield from _iter_json_array(request.get_json(silent=True))
+    else:
+        raise ValueError('请上传 CSV/JSON 文件或提交 JSON 数组')
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield {key.strip(): value for key, value in row.items() if key}
+
+
+def _iter_json_lines(stream):
+    for line in io.TextIOWrapper(stream, encoding='utf-8-sig'):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json_array(data):
+    if not isinstance(data, list):
+        raise ValueError('JSON 数据必须是数组')
+    yield from data
+
+
+def chunked(iterable, size):
+    """按固定大小切分可迭代对象"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _text(row, key):
+    value = row.get(key)
+    if _blank(value):
+        return None
+    return str(value).strip()
+
+
+def _parse_member_ids(value):
+    """参与人员 ID：JSON 数组，或 CSV 中以 ; 或 , 分隔的字符串"""
+    if _blank(value):
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).replace(';', ',').split(',')
+    return [int(item) for item in items if not _blank(item)]
+
+
+def parse_event_row(row, created_by):
+    """
+    校验并解析一行日程数据（规则与单条创建接口一致）
+    
+    Returns:
+        tuple: (events 表字段字典, 参与人员 ID 列表)
+        
+    Raises:
+        ValueError: 数据不合法
+    """
+    if not isinstance(row, dict):
+        raise ValueError('每行数据必须是对象')
+    
+    title = _text(row, 'title')
+    event_date = _text(row, 'event_date')
+    if not title or not event_date:
+        raise ValueError('标题和日期不能为空')
+    
+    background_image = _text(row, 'background_image')
+    location = _text(row, 'location')
+    organizer_department = _text(row, 'organizer_department')
+    if not background_image:
+        raise ValueError('活动海报（背景图片）不能为空')
+    if not location:
+        raise ValueError('活动地点不能为空')
+    if not organizer_department:
+        raise ValueError('举办部门不能为空')
+    
+    priority = _text(row, 'priority') or 'medium'
+    if priority not in EVENT_PRIORITIES:
+        raise ValueError(f'优先级无效: {priority}')
+    
+    status = _text(row, 'status') or 'pending'
+    if status not in EVENT_STATUSES:
+        raise ValueError(f'状态无效: {status}')
+    
+    try:
+        parsed_date = datetime.strptime(event_date, '%Y-%m-%d').date()
+        start_time = _text(row, 'start_time')
+        end_time = _text(row, 'end_time')
+        start_time = datetime.strptime(start_time, '%H:%M:%S').time() if start_time else None
+        end_time = datetime.strptime(end_time, '%H:%M:%S').time() if end_time else None
+    except ValueError as e:
+        raise ValueError(f'日期或时间格式错误: {str(e)}')
+    
+    expected_participants = _text(row, 'expected_participants')
+    try:
+        expected_participants = int(expected_participants) if expected_participants else None
+        member_ids = _parse_member_ids(row.get('member_ids'))
+    except ValueError:
+        raise ValueError('预计参与人数和参与人员 ID 必须是整数')
+    
+    now = datetime.utcnow()
+    values = {
+        'title': title,
+        'description': row.get('description') or '',
+        'event_date': parsed_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'background_image': background_image,
+        'priority': priority,
+        'status': status,
+        'organizer_department': organizer_department,
+        'expected_participants': expected_participants,
+        'location': location,
+        'created_by': created_by,
+        'created_at': now,
+        'updated_at': now
+    }
+    return values, member_ids
+
+
+def validate_event_rows(rows, created_by):
+    """
+    校验全部日程数据（包括参与人员是否存在）
+    
+    Returns:
+        tuple: (有效行列表 [(行号, 字段字典, 参与人员ID列表)], 错误列表)
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        try:
+            values, member_ids = parse_event_row(row, created_by)
+            valid.append((index, values, member_ids))
+        except ValueError as e:
+            errors.append({'row': index, 'message': str(e)})
+    
+    # 一次查询校验所有引用的人员
+    referenced = {member_id for _, _, member_ids in valid for member_id in member_ids}
+    if referenced:
+        existing = {
+            member_id for (member_id,) in
+            db.session.query(Member.id).filter(Member.id.in_(referenced)).all()
+        }
+        missing = referenced - existing
+        if missing:
+            still_valid = []
+            for index, values, member_ids in valid:
+                unknown = sorted(set(member_ids) & missing)
+                if unknown:
+                    errors.append({'row': index, 'message': f'参与人员不存在: {unknown}'})
+                else:
+                    still_valid.append((index, values, member_ids))
+            valid = still_valid
+            errors.sort(key=lambda error: error['row'])
+    
+    return valid, errors
+
+
+def insert_event_chunk(chunk):
+    """
+    批量插入一个分片的日程及其参与人员关联（调用方负责提交事务）
+    
+    无参与人员的日程使用一次 executemany 插入；
+    有参与人员的日程需要取回主键，数据库支持时使用 executemany + RETURNING，
+    MySQL 使用一条多行 INSERT（见 _insert_consecutive），其他数据库逐条插入。
+    参与人员关联统一 executemany 插入。
+    
+    Args:
+        chunk: [(行号, 字段字典, 参与人员ID列表), ...]
+        
+    Returns:
+        list: 新建日程的 ID（仅包含有参与人员的日程）
+    """
+    table = Event.__table__
+    plain = [values for _, values, member_ids in chunk if not member_ids]
+    linked = [(values, member_ids) for _, values, member_ids in chunk if member_ids]
+    
+    if plain:
+        db.session.execute(table.insert(), plain)
+    
+    if not linked:
+        return []
+    
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True),
+            [values for values, _ in linked]
+        )
+        event_ids = list(result.scalars())
+    elif dialect.name == 'mysql':
+        event_ids = _insert_consecutive(table, [values for values, _ in linked])
+    else:
+        event_ids = _insert_each(table, [values for values, _ in linked])
+    
+    now = datetime.utcnow()
+    db.session.execute(event_members.insert(), [
+        {'event_id': event_id, 'member_id': member_id, 'created_at': now}
+        for event_id, (_, member_ids) in zip(event_ids, linked)
+        for member_id in dict.fromkeys(member_ids)
+    ])
+    return event_ids
+
+
+# 核对多行 INSERT 主键时比较的列
+EVENT_CHECK_COLUMNS = ('title', 'event_date', 'start_time', 'created_by')
+
+
+def _insert_each(table, rows):
+    """逐条插入，按顺序返回主键"""
+    return [db.session.execute(table.insert(), values).inserted_primary_key[0] for values in rows]
+
+
+def _insert_consecutive(table, rows):
+    """
+    用一条多行 INSERT 插入日程，按顺序返回主键（MySQL）
+    
+    MySQL 的 lastrowid 是本条语句第一行的主键，之后各行依次递增；
+    innodb_autoinc_lock_mode=2（MySQL 8 默认）时并发插入可能打断连续性，
+    因此回读这段主键核对内容，不一致时回滚到保存点改为逐条插入。
+    """
+    savepoint = db.session.begin_nested()
+    first_id = db.session.execute(table.insert().values(rows)).lastrowid
+    event_ids = list(range(first_id, first_id + len(rows)))
+    
+    columns = [table.c[name] for name in EVENT_CHECK_COLUMNS]
+    stored = db.session.execute(
+        select(table.c.id, *columns)
+        .where(table.c.id.between(event_ids[0], event_ids[-1]))
+        .order_by(table.c.id)
+    ).all()
+    expected = [
+        (event_id, *(values[name] for name in EVENT_CHECK_COLUMNS))
+        for event_id, values in zip(event_ids, rows)
+    ]
+    if [tuple(row) for row in stored] == expected:
+        savepoint.commit()
+        return event_ids
+    
+    savepoint.rollback()
+    return _insert_each(table, rows)
+
+
+MEMBER_FIELDS = ('name', 'phone', 'email', 'department', 'position', 'is_active')
+MEMBER_KEYS = ('email', 'phone', 'name')
+
+
+def normalize_contact(field, value):
+    """
+    规范化联系方式后再保存：邮箱去空白并转小写，电话去掉空格、横线、括号和点
+    
+    其他字段原样返回（只去除首尾空白）。
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if field == 'email':
+        return value.casefold()
+    if field == 'phone':
+        return re.sub(r'[\s\-().]', '', value)
+    return value
+
+
+def member_match_key(field, value):
+    """
+    按唯一键匹配人员时使用的比较键
+    
+    与 MySQL 默认排序规则（不区分大小写和重音）一致，否则数据库查到的人员
+    在 Python 中匹配不上，会被当作新人员重复插入。
+    """
+    value = normalize_contact(field, value)
+    if value is None:
+        return None
+    value = ' '.join(value.split()).casefold()
+    return ''.join(c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c))
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y', '是'):
+        return True
+    if text in ('0', 'false', 'no', 'n', '否'):
+        return False
+    raise ValueError(f'is_active 取值无效: {value}')
+
+
+def parse_member_row(row, key):
+    """
+    校验并解析一行人员数据，只返回行中提供了值的字段
+    
+    Raises:
+        ValueError: 数据不合法
+    """
+    if not isinstance(row, dict):
+        raise ValueError('每行数据必须是对象')
+    
+    values = {}
+    for field in MEMBER_FIELDS:
+        if field in row and not _blank(row[field]):
+            values[field] = _parse_bool(row[field]) if field == 'is_active' else normalize_contact(field, row[field])
+    
+    if not values.get('name'):
+        raise ValueError('姓名不能为空')
+    if not values.get(key):
+        raise ValueError(f'缺少唯一键字段: {key}')
+    return values
+
+
+def upsert_member_chunk(chunk, key):
+    """
+    按唯一键批量新增或更新一个分片的人员（调用方负责提交事务）
+    
+    一次查询取出已存在的人员，新增与更新分别使用 executemany；
+    与现有数据完全一致的行计为跳过。
+    
+    Args:
+        chunk: [(行号, 字段字典), ...]
+        key: 唯一键字段（email / phone / name）
+        
+    Returns:
+        dict: {'inserted': n, 'updated': n, 'skipped': n, 'renamed_ids': [...]}
+    """
+    # 同一分片内重复的键（按规范化后的比较键）以最后一行为准
+    by_key = {}
+    for _, values in chunk:
+        by_key.setdefault(member_match_key(key, values[key]), {}).update(values)
+    skipped = len(chunk) - len(by_key)
+    
+    # 数据库按排序规则匹配（可能不区分大小写），已有数据也可能未规范化，统一按比较键对应
+    key_column = getattr(Member, key)
+    lookup = {values[key] for values in by_key.values()}
+    existing = {
+        member_match_key(key, getattr(member, key)): member
+        for member in Member.query.filter(key_column.in_(list(lookup))).all()
+    }
+    
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+    renamed_ids = []
+    reindex_keys = []
+    for key_value, values in by_key.items():
+        member = existing.get(key_value)
+        if member is None:
+            reindex_keys.append(values[key])
+            inserts.append({
+                'name': values['name'],
+                'phone': values.get('phone'),
+                'email': values.get('email'),
+                'department': values.get('department'),
+                'position': values.get('position'),
+                'is_active': values.get('is_active', True),
+                'created_at': now,
+                'updated_at': now
+            })
+            continue
+        
+        changes = {
+            field: value for field, value in values.items()
+            if getattr(member, field) != value
+        }
+        if not changes:
+            skipped += 1
+            continue
+        if 'name' in changes:
+            renamed_ids.append(member.id)
+        if any(field in changes for field in member_search.SEARCH_FIELDS):
+            reindex_keys.append(values[key])
+        updates.append((member.id, changes))
+    
+    table = Member.__table__
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    
+    # 按更新的字段组合分组，每组一次 executemany
+    # （绑定参数名不能与列名相同，统一加 new_ 前缀）
+    groups = {}
+    for member_id, changes in updates:
+        params = {'member_id': member_id, 'new_updated_at': now}
+        params.update({f'new_{field}': value for field, value in changes.items()})
+        groups.setdefault(tuple(sorted(changes)), []).append(params)
+    for fields, params in groups.items():
+        statement = table.update().where(table.c.id == bindparam('member_id')).values(
+            {field: bindparam(f'new_{field}') for field in fields + ('updated_at',)}
+        )
+        db.session.execute(statement, params)
+    
+    # 已加载的人员对象不再代表最新数据
+    for member in existing.values():
+        db.session.expire(member)
+    
+    # 新增人员与可搜索字段变化的人员重建搜索索引
+    if reindex_keys:
+        member_search.reindex_members(Member.query.filter(key_column.in_(reindex_keys)).all())
+    
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'skipped': skipped,
+        'renamed_ids': renamed_ids
+    }
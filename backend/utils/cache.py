@@ -0,0 +1,114 @@
+"""
+进程内缓存工具
+提供带容量上限和命中统计的 LRU 缓存
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存"""
+    
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+    
+    def resize(self, maxsize):
+        """调整容量上限，超出部分按最久未使用淘汰"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+    
+    def get(self, key):
+        """
+        读取缓存
+        
+        Returns:
+            tuple: (value, generation)，未命中时 value 为 None。
+                   generation 需在回填时传给 set，用于丢弃读取期间已失效的结果。
+        """
+        with self._lock:
+            generation = self._generation(key)
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key], generation
+            self.misses += 1
+            return None, generation
+    
+    def set(self, key, value, generation=None):
+        """写入缓存；若 key 在读取后已被失效则放弃写入"""
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                return False
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+            return True
+    
+    def invalidate(self, key):
+        """使指定 key 失效"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+    
+    def stats(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 1) if total > 0 else 0
+            }
+    
+    def _generation(self, key):
+        return self._epoch, self._generations.get(key, 0)
+    
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class TTLCache(LRUCache):
+    """带过期时间的 LRU 缓存"""
+    
+    def __init__(self, maxsize=128, ttl=60):
+        super().__init__(maxsize)
+        self.ttl = ttl
+    
+    def get(self, key):
+        value, generation = super().get(key)
+        if value is None:
+            return None, generation
+        
+        expires_at, payload = value
+        if expires_at < time.monotonic():
+            with self._lock:
+                # 过期视为未命中
+                self.hits -= 1
+                self.misses += 1
+                self._data.pop(key, None)
+            return None, generation
+        return payload, generation
+    
+    def set(self, key, value, generation=None):
+        return super().set(key, (time.monotonic() + self.ttl, value), generation)
+
+
+# 月历数据缓存：key 为 (year, month)，value 为序列化后的月历响应
+calendar_cache = LRUCache(maxsize=24)
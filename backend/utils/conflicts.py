@@ -0,0 +1,155 @@
+"""
+人员日程冲突检测
+为一批人员在相关日期内已安排的日程建立 (人员, 日期) -> 时间段 的区间索引，
+一次查询即可检查整批人员在候选时间段内的冲突（包括重复日程的每次发生）
+"""
+from bisect import bisect_left
+from datetime import timedelta
+from models import db, Event, Member, event_members
+from utils import recurrence
+
+CONFLICT_MODES = ('off', 'warn', 'reject')
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def time_slot(start_time, end_time, default_minutes=60):
+    """
+    日程占用的时间段（当天的分钟数，左闭右开），未设置开始时间的日程不占用时间段
+    
+    未设置结束时间（或结束时间不晚于开始时间）时按 default_minutes 计算。
+    """
+    if start_time is None:
+        return None
+    start = _minutes(start_time)
+    end = _minutes(end_time) if end_time else 0
+    if end <= start:
+        end = min(start + default_minutes, MINUTES_PER_DAY)
+    return start, end
+
+
+class IntervalIndex:
+    """
+    区间索引：每个 key 下的时间段按开始时间排序，并记录前缀最大结束时间
+    
+    查询 [start, end) 时先二分找到开始时间早于 end 的区间，
+    再向前扫描到前缀最大结束时间不晚于 start 为止，只访问可能重叠的区间。
+    """
+    
+    def __init__(self):
+        self._slots = {}
+        self._frozen = {}
+    
+    def add(self, key, start, end, value):
+        self._slots.setdefault(key, []).append((start, end, value))
+        self._frozen.pop(key, None)
+    
+    def _sorted(self, key):
+        frozen = self._frozen.get(key)
+        if frozen is None:
+            slots = sorted(self._slots.get(key, ()), key=lambda slot: slot[:2])
+            starts = [slot[0] for slot in slots]
+            max_ends = []
+            running = 0
+            for slot in slots:
+                running = max(running, slot[1])
+                max_ends.append(running)
+            frozen = self._frozen[key] = (slots, starts, max_ends)
+        return frozen
+    
+    def overlapping(self, key, start, end):
+        """与 [start, end) 重叠的区间值（按开始时间排序）"""
+        slots, starts, max_ends = self._sorted(key)
+        i = bisect_left(starts, end) - 1
+        found = []
+        while i >= 0 and max_ends[i] > start:
+            if slots[i][1] > start:
+                found.append(slots[i][2])
+            i -= 1
+        found.reverse()
+        return found
+    
+    def __len__(self):
+        return sum(len(slots) for slots in self._slots.values())
+
+
+def candidate_dates(event, horizon_days):
+    """候选日程需要检查的日期：单次日程为当天，重复日程为首次日期起 horizon_days 天内的每次发生"""
+    rule = recurrence.rule_of(event)
+    if rule is None:
+        return [event.event_date]
+    return list(recurrence.occurrences(rule, event.event_date, event.event_date + timedelta(days=horizon_days)))
+
+
+def build_index(member_ids, start, end, exclude_event_id=None, default_minutes=60):
+    """
+    一次查询加载这些人员在 [start, end] 内已安排的日程，建立 (人员 ID, 日期) 的区间索引
+    
+    已取消和未设置开始时间的日程不参与冲突检测。
+    """
+    query = db.session.query(event_members.c.member_id, Event).join(
+        Event, Event.id == event_members.c.event_id
+    ).filter(
+        event_members.c.member_id.in_(member_ids),
+        Event.start_time.isnot(None),
+        Event.status != 'cancelled',
+        recurrence.window_filter(start, end)
+    )
+    if exclude_event_id is not None:
+        query = query.filter(Event.id != exclude_event_id)
+    
+    index = IntervalIndex()
+    for member_id, event in query:
+        slot_start, slot_end = time_slot(event.start_time, event.end_time, default_minutes)
+        for _, occurrence_date in recurrence.expand([event], start, end):
+            index.add((member_id, occurrence_date), slot_start, slot_end, event)
+    return index
+
+
+def find_conflicts(event, member_ids, horizon_days=180, default_minutes=60):
+    """
+    检查 member_ids 中的人员参加 event（可以是尚未保存的日程）是否与其已安排的日程时间重叠
+    
+    Returns:
+        list: [{'member_id', 'member_name', 'date', 'event_id', 'title', 'start_time', 'end_time'}, ...]，
+              按日期、人员排序
+    """
+    member_ids = sorted({int(member_id) for member_id in member_ids or []})
+    slot = time_slot(event.start_time, event.end_time, default_minutes)
+    if not member_ids or slot is None or event.status == 'cancelled':
+        return []
+    
+    dates = candidate_dates(event, horizon_days)
+    if not dates:
+        return []
+    
+    index = build_index(member_ids, dates[0], dates[-1], event.id, default_minutes)
+    if not len(index):
+        return []
+    
+    conflicts = []
+    for occurrence_date in dates:
+        for member_id in member_ids:
+            for other in index.overlapping((member_id, occurrence_date), *slot):
+                conflicts.append({
+                    'member_id': member_id,
+                    'date': occurrence_date.isoformat(),
+                    'event_id': other.id,
+                    'title': other.title,
+                    'start_time': other.start_time.strftime('%H:%M:%S'),
+                    'end_time': other.end_time.strftime('%H:%M:%S') if other.end_time else None
+                })
+    
+    if conflicts:
+        names = dict(
+            db.session.query(Member.id, Member.name)
+            .filter(Member.id.in_({conflict['member_id'] for conflict in conflicts}))
+            .all()
+        )
+        for conflict in conflicts:
+            conflict['member_name'] = names.get(conflict['member_id'])
+    return conflicts
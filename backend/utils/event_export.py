@@ -0,0 +1,68 @@
+"""
+日程流式导出
+使用服务端游标分批读取日程，边读边输出 NDJSON / CSV
+"""
+import csv
+import io
+import json
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import db, Event
+
+CSV_COLUMNS = (
+    'id', 'title', 'description', 'event_date', 'start_time', 'end_time',
+    'priority', 'status', 'organizer_department', 'expected_participants', 'location',
+    'participant_count', 'member_ids', 'member_names', 'created_by', 'creator_name',
+    'background_image', 'created_at', 'updated_at'
+)
+
+
+def iter_event_batches(filters, batch_size):
+    """
+    按批读取日程并序列化
+    
+    日程本身通过独立连接上的服务端游标（yield_per）读取，
+    每批的创建者和参与人员再用默认会话批量查询——
+    MySQL 在服务端游标未读完时同一连接上不能执行其他查询。
+    
+    Yields:
+        list: 每批日程的 to_dict 结果
+    """
+    statement = select(Event).where(*filters).order_by(
+        Event.event_date.asc(), Event.start_time.asc(), Event.id.asc()
+    ).execution_options(yield_per=batch_size)
+    
+    with Session(db.engine) as stream_session:
+        for partition in stream_session.execute(statement).scalars().partitions():
+            yield Event.to_dict_batch(partition)
+
+
+def ndjson_lines(batches):
+    """每个日程输出一行 JSON"""
+    for batch in batches:
+        yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in batch)
+
+
+def csv_lines(batches):
+    """输出 CSV（首行为表头，参与人员以 ; 分隔）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    # 表头在查询开始前先发出（带 BOM，便于 Excel 识别 UTF-8）
+    writer.writerow(CSV_COLUMNS)
+    yield '\ufeff' + _drain(buffer)
+    
+    for batch in batches:
+        for item in batch:
+            row = dict(item)
+            row['member_ids'] = ';'.join(str(member['id']) for member in item['members'])
+            row['member_names'] = ';'.join(member['name'] for member in item['members'])
+            writer.writerow(['' if row[column] is None else row[column] for column in CSV_COLUMNS])
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return value
@@ -1,58 +1,81 @@
 """
-本地文件存储助手
-替代 OSS，使用本地文件系统存储图片
+文件存储助手
+替代 OSS，默认使用本地文件系统存储图片，也可切换为内存或 S3 兼容后端
 """
 import os
-import uuid
-from datetime import datetime
-from flask import current_app, url_for
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
-from pathlib import Path
+from models import db, Event, StoredFile
+from utils import image_variants
+from utils.storage_backends import create_backend
+from utils.job_queue import register, enqueue_after_commit
+
+
+class UploadTooLarge(Exception):
+    """上传文件超过大小限制"""
 
 
 class FileStorage:
-    """本地文件存储助手"""
+    """文件存储助手（每个应用一个实例，通过 get_storage() 获取）"""
     
-    def __init__(self):
-        self.upload_folder = None
-        self.base_url = None
-        self._init_storage()
+    def __init__(self, backend, base_url, tmp_folder):
+        """
+        Args:
+            backend: 存储后端（见 utils.storage_backends）
+            base_url: 文件访问 URL 前缀（如 '/uploads'）
+            tmp_folder: 上传临时目录（本地后端时与存储目录在同一文件系统，便于原子重命名）
+        """
+        self.backend = backend
+        self.base_url = base_url.rstrip('/')
+        self.tmp_folder = tmp_folder
+        os.makedirs(self.tmp_folder, exist_ok=True)
     
-    def _init_storage(self):
-        """初始化存储目录"""
-        try:
-            # 获取上传文件夹路径（相对于项目根目录）
-            self.upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-            
-            # 如果是相对路径，转换为绝对路径
-            if not os.path.isabs(self.upload_folder):
-                # 获取项目根目录（backend 的父目录）
-                backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                self.upload_folder = os.path.join(backend_dir, self.upload_folder)
-            
-            # 创建上传目录
-            os.makedirs(self.upload_folder, exist_ok=True)
-            
-            # 获取基础 URL（用于生成访问路径）
-            self.base_url = current_app.config.get('FILE_SERVER_URL', '/uploads')
-            
-            current_app.logger.info("=" * 60)
-            current_app.logger.info("文件存储初始化:")
-            current_app.logger.info(f"  存储路径: {self.upload_folder}")
-            current_app.logger.info(f"  访问路径: {self.base_url}")
-            current_app.logger.info("=" * 60)
-            current_app.logger.info("✅ 本地文件存储初始化成功!")
-            
-        except Exception as e:
-            current_app.logger.error("=" * 60)
-            current_app.logger.error(f"❌ 文件存储初始化失败: {str(e)}")
-            import traceback
-            current_app.logger.error(f"   详细错误:\n{traceback.format_exc()}")
-            current_app.logger.error("=" * 60)
+    @classmethod
+    def from_app(cls, app):
+        """根据应用配置创建存储实例"""
+        upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
+        
+        # 如果是相对路径，转换为绝对路径
+        if not os.path.isabs(upload_folder):
+            # 获取项目根目录（backend 的父目录）
+            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            upload_folder = os.path.join(backend_dir, upload_folder)
+        
+        backend = create_backend(app.config, upload_folder)
+        if backend.local_path('') is not None:
+            tmp_folder = os.path.join(upload_folder, '.tmp')
+        else:
+            tmp_folder = app.config.get('UPLOAD_TMP_FOLDER') or \
+                os.path.join(tempfile.gettempdir(), 'qd-calendar-uploads')
+        
+        storage = cls(backend, app.config.get('FILE_SERVER_URL', '/uploads'), tmp_folder)
+        app.logger.info(f"文件存储初始化: backend={backend.describe()} url={storage.base_url}")
+        return storage
+    
+    def key_of(self, file_url):
+        """从文件 URL 提取存储 key（相对路径），无法解析时返回 None"""
+        if not file_url:
+            return None
+        if file_url.startswith(self.base_url + '/'):
+            return file_url[len(self.base_url):].lstrip('/')
+        # 尝试提取 /uploads/ 后面的部分
+        if '/uploads/' in file_url:
+            return file_url.split('/uploads/', 1)[1]
+        return None
     
     def upload_file(self, file_obj, folder='events'):
         """
-        保存文件到本地
+        保存文件（内容寻址，相同内容只保存一份）
+        
+        文件按内容的 SHA-256 存放在 <folder>/ab/cd/<sha256>.<ext>，
+        并在 stored_files 表登记。再次上传相同内容时直接返回已有 URL。
+        新登记的文件引用计数为 0，由引用它的日程通过 acquire_files 增加。
         
         Args:
             file_obj: 文件对象
@@ -61,66 +84,168 @@ class FileStorage:
         Returns:
             dict: 包含文件访问 URL
                 {
-                    'url': '/uploads/events/2025/10/30/abc123.jpg',
-                    'filename': 'abc123.jpg',
-                    'filepath': '/absolute/path/to/file.jpg'
+                    'url': '/uploads/events/ab/cd/abcd...ef.jpg',
+                    'filename': 'abcd...ef.jpg',
+                    'filepath': '/absolute/path/to/file.jpg',  # 非本地后端为 None
+                    'size': 12345,
+                    'sha256': 'abcd...ef',
+                    'deduplicated': False
                 }
         """
-        if not self.upload_folder:
-            current_app.logger.error("❌ 文件存储未初始化")
-            return None
-        
+        result = self._store(file_obj, folder)
+        if result is not None:
+            # 上传成功后再在后台生成缩略图，提交失败不影响上传结果；
+            # 去重命中时也会补交之前失败或未完成的任务（清单已存在则跳过）
+            self._schedule_variants(result['url'])
+        return result
+    
+    def _store(self, file_obj, folder):
+        """保存文件并登记 stored_files，返回 upload_file 的结果，失败时回滚并返回 None"""
+        tmp_path = None
         try:
-            # 读取文件内容
-            file_content = file_obj.read()
+            # 先分块写入临时文件，同时计算哈希和大小，内存占用不超过一个分块
+            tmp_path, digest, size = self._write_temp(file_obj)
+            
+            # 相同内容已存在：丢弃临时文件，直接返回已有 URL
+            stored = StoredFile.query.filter_by(sha256=digest).first()
+            if stored and self.file_exists(stored.url):
+                # 刷新修改时间：未被引用的旧文件重新交给上传者后，重新计算回收保留期
+                self._touch(stored.url)
+                current_app.logger.info(f"file_stored url={stored.url} size={stored.size} deduplicated=true")
+                return self._result(stored.url, stored.size, digest, deduplicated=True)
             
             # 生成安全的文件名
             original_filename = secure_filename(file_obj.filename)
             ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
             
-            # 生成唯一文件名：日期_UUID.扩展名
-            date_str = datetime.now().strftime('%Y%m%d')
-            unique_id = uuid.uuid4().hex[:12]  # 使用12位UUID
-            new_filename = f"{date_str}_{unique_id}.{ext}"
+            # 内容寻址路径：events/ab/cd/<sha256>.<ext>
+            key = self.key_of(stored.url) if stored else f"{folder}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+            self.backend.save(key, tmp_path)
+            tmp_path = None
             
-            # 创建子目录结构：uploads/events/2025/10/30/
-            date_path = datetime.now().strftime('%Y/%m/%d')
-            full_folder = os.path.join(self.upload_folder, folder, date_path)
-            os.makedirs(full_folder, exist_ok=True)
+            file_url = f"{self.base_url}/{key}"
+            if not stored:
+                try:
+                    db.session.add(StoredFile(sha256=digest, url=file_url, size=size, ref_count=0))
+                    db.session.commit()
+                except IntegrityError:
+                    # 并发上传了相同内容，文件路径一致，使用先登记的记录即可
+                    db.session.rollback()
             
-            # 完整的文件路径
-            file_path = os.path.join(full_folder, new_filename)
-            
-            # 保存文件
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
-            
-            # 生成访问 URL（相对路径）
-            relative_path = f"{folder}/{date_path}/{new_filename}"
-            file_url = f"{self.base_url}/{relative_path}"
-            
-            current_app.logger.info(f"✅ 文件保存成功:")
-            current_app.logger.info(f"   文件名: {new_filename}")
-            current_app.logger.info(f"   路径: {file_path}")
-            current_app.logger.info(f"   URL: {file_url}")
-            current_app.logger.info(f"   大小: {len(file_content)} bytes")
-            
-            return {
-                'url': file_url,
-                'filename': new_filename,
-                'filepath': file_path,
-                'size': len(file_content)
-            }
+            current_app.logger.info(f"file_stored url={file_url} size={size} deduplicated=false")
+            return self._result(file_url, size, digest, deduplicated=False)
             
+        except UploadTooLarge:
+            raise
         except Exception as e:
-            current_app.logger.error(f"❌ 文件保存失败: {str(e)}")
-            import traceback
-            current_app.logger.error(traceback.format_exc())
+            db.session.rollback()
+            current_app.logger.exception(f"❌ 文件保存失败: {str(e)}")
             return None
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _touch(self, file_url):
+        """把本地文件的修改时间更新为当前时间（垃圾回收按原图及衍生图中最新的修改时间计算保留期）"""
+        path = self.backend.local_path(self.key_of(file_url))
+        if path is None:
+            return
+        try:
+            os.utime(path)
+        except OSError as e:
+            current_app.logger.warning(f"更新文件修改时间失败: {str(e)}")
+    
+    def _result(self, file_url, size, digest, deduplicated):
+        """组装 upload_file 的返回值"""
+        key = self.key_of(file_url)
+        return {
+            'url': file_url,
+            'filename': os.path.basename(key),
+            'filepath': self.backend.local_path(key),
+            'size': size,
+            'sha256': digest,
+            'deduplicated': deduplicated
+        }
+    
+    def _write_temp(self, file_obj):
+        """
+        把上传流分块写入临时文件
+        
+        Args:
+            file_obj: 文件对象（werkzeug FileStorage 或任意带 read 的对象）
+            
+        Returns:
+            tuple: (临时文件路径, sha256 十六进制摘要, 字节数)
+            
+        Raises:
+            UploadTooLarge: 超过 UPLOAD_MAX_SIZE 时立即停止读取
+        """
+        chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+        max_size = current_app.config['UPLOAD_MAX_SIZE']
+        stream = getattr(file_obj, 'stream', file_obj)
+        
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size and size > max_size:
+                        raise UploadTooLarge(f'文件大小超过限制（{max_size} 字节）')
+                    hasher.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        return tmp_path, hasher.hexdigest(), size
+    
+    def _schedule_variants(self, url):
+        """本地后端时提交衍生图生成任务，完成后把引用该图片的日程标记为已更新（使 ETag 和月历缓存失效）"""
+        if self.backend.local_path('') is None:
+            return
+        
+        app = current_app._get_current_object()
+        
+        def on_ready(ready_url):
+            with app.app_context():
+                try:
+                    Event.touch_by_image(ready_url)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"更新衍生图状态失败: {str(e)}")
+        
+        image_variants.schedule(url, on_ready)
+    
+    def remove(self, file_url):
+        """
+        删除文件（本地后端同时删除衍生图），出错时抛出异常
+        
+        Returns:
+            bool: 文件是否存在并已删除
+        """
+        key = self.key_of(file_url)
+        if not key:
+            raise ValueError(f"无法解析文件 URL: {file_url}")
+        
+        file_path = self.backend.local_path(key)
+        if file_path:
+            image_variants.remove_variants(file_path, file_url)
+        
+        deleted = self.backend.delete(key)
+        current_app.logger.info(f"file_deleted url={file_url} found={str(deleted).lower()}")
+        return deleted
     
     def delete_file(self, file_url):
         """
-        删除本地文件
+        删除文件（本地后端同时删除衍生图）
         
         Args:
             file_url: 文件 URL（如 '/uploads/events/2025/10/30/abc123.jpg'）
@@ -128,36 +253,8 @@ class FileStorage:
         Returns:
             bool: 是否删除成功
         """
-        if not file_url:
-            return False
-        
         try:
-            # 从 URL 提取相对路径
-            if file_url.startswith(self.base_url):
-                relative_path = file_url[len(self.base_url):].lstrip('/')
-            else:
-                # 尝试提取 /uploads/ 后面的部分
-                if '/uploads/' in file_url:
-                    relative_path = file_url.split('/uploads/')[1]
-                else:
-                    current_app.logger.warning(f"无法解析文件 URL: {file_url}")
-                    return False
-            
-            # 构建完整路径
-            file_path = os.path.join(self.upload_folder, relative_path)
-            
-            # 检查文件是否存在
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                current_app.logger.info(f"✅ 文件删除成功: {file_path}")
-                
-                # 尝试删除空目录
-                self._cleanup_empty_dirs(os.path.dirname(file_path))
-                return True
-            else:
-                current_app.logger.warning(f"文件不存在: {file_path}")
-                return False
-                
+            return self.remove(file_url)
         except Exception as e:
             current_app.logger.error(f"❌ 文件删除失败: {str(e)}")
             return False
@@ -172,23 +269,12 @@ class FileStorage:
         Returns:
             bool: 文件是否存在
         """
-        if not file_url:
+        key = self.key_of(file_url)
+        if not key:
             return False
         
         try:
-            # 从 URL 提取相对路径
-            if file_url.startswith(self.base_url):
-                relative_path = file_url[len(self.base_url):].lstrip('/')
-            elif '/uploads/' in file_url:
-                relative_path = file_url.split('/uploads/')[1]
-            else:
-                return False
-            
-            # 构建完整路径
-            file_path = os.path.join(self.upload_folder, relative_path)
-            
-            return os.path.exists(file_path) and os.path.isfile(file_path)
-            
+            return self.backend.exists(key)
         except Exception as e:
             current_app.logger.error(f"检查文件存在性失败: {str(e)}")
             return False
@@ -201,50 +287,12 @@ class FileStorage:
             file_url: 文件 URL
             
         Returns:
-            str: 文件的完整路径，不存在则返回 None
+            str: 文件的完整路径，不存在或不是本地后端则返回 None
         """
-        if not file_url:
-            return None
-        
-        try:
-            # 从 URL 提取相对路径
-            if file_url.startswith(self.base_url):
-                relative_path = file_url[len(self.base_url):].lstrip('/')
-            elif '/uploads/' in file_url:
-                relative_path = file_url.split('/uploads/')[1]
-            else:
-                return None
-            
-            # 构建完整路径
-            file_path = os.path.join(self.upload_folder, relative_path)
-            
-            if os.path.exists(file_path) and os.path.isfile(file_path):
-                return file_path
-            return None
-            
-        except Exception as e:
-            current_app.logger.error(f"获取文件路径失败: {str(e)}")
+        key = self.key_of(file_url)
+        if not key or not self.backend.exists(key):
             return None
-    
-    def _cleanup_empty_dirs(self, dir_path):
-        """清理空目录"""
-        try:
-            # 只清理 uploads 目录下的空文件夹
-            if not dir_path.startswith(self.upload_folder):
-                return
-            
-            # 如果目录为空，删除它
-            if os.path.isdir(dir_path) and not os.listdir(dir_path):
-                os.rmdir(dir_path)
-                current_app.logger.info(f"清理空目录: {dir_path}")
-                
-                # 递归清理父目录
-                parent_dir = os.path.dirname(dir_path)
-                if parent_dir != self.upload_folder:
-                    self._cleanup_empty_dirs(parent_dir)
-        except Exception as e:
-            # 清理失败不影响主流程
-            pass
+        return self.backend.local_path(key)
     
     def get_file_info(self, file_url):
         """
@@ -254,25 +302,100 @@ class FileStorage:
             file_url: 文件 URL
             
         Returns:
-            dict: 文件信息（大小、创建时间等）
+            dict: 文件信息（大小、修改时间等）
         """
-        file_path = self.get_file_path(file_url)
-        if not file_path:
+        key = self.key_of(file_url)
+        if not key:
             return None
         
         try:
-            stat = os.stat(file_path)
-            return {
-                'size': stat.st_size,
-                'created': datetime.fromtimestamp(stat.st_ctime),
-                'modified': datetime.fromtimestamp(stat.st_mtime),
-                'exists': True
-            }
+            info = self.backend.stat(key)
+            if info is None:
+                return None
+            return dict(info, exists=True)
         except Exception as e:
             current_app.logger.error(f"获取文件信息失败: {str(e)}")
             return None
 
 
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """获取当前应用的文件存储实例（首次调用时创建，之后复用）"""
+    app = current_app._get_current_object()
+    storage = app.extensions.get('file_storage')
+    if storage is None:
+        with _storage_lock:
+            storage = app.extensions.get('file_storage')
+            if storage is None:
+                storage = FileStorage.from_app(app)
+                app.extensions['file_storage'] = storage
+    return storage
+
+
+def acquire_files(urls):
+    """
+    增加文件引用计数（日程开始引用图片时调用，调用方负责提交事务）
+    
+    未在 stored_files 登记的 URL（旧版按日期存放的文件或外部链接）会被忽略。
+    """
+    for url, n in Counter(u for u in urls if u).items():
+        StoredFile.query.filter_by(url=url).update(
+            {StoredFile.ref_count: StoredFile.ref_count + n}, synchronize_session=False
+        )
+
+
+def release_files(urls):
+    """
+    减少文件引用计数（日程删除或更换图片时调用，调用方负责提交事务）
+    
+    引用计数降为 0 的登记记录在同一事务中删除。旧版未登记的文件在
+    没有日程再引用时也视为可删除。调用前需先 flush 日程的变更。
+    
+    文件删除登记为提交后任务，事务回滚时不会删除任何文件。
+    外部图片链接等无法解析为存储 key 的 URL 直接忽略。
+    
+    Returns:
+        list: 已无引用、将在提交后删除的文件 URL
+    """
+    storage = get_storage()
+    released = []
+    for url, n in Counter(u for u in urls if u and storage.key_of(u)).items():
+        stored = StoredFile.query.filter_by(url=url).first()
+        if stored is None:
+            in_use = db.session.query(func.count(Event.id)).filter(Event.background_image == url).scalar()
+            if not in_use:
+                released.append(url)
+            continue
+        
+        StoredFile.query.filter_by(id=stored.id).update(
+            {StoredFile.ref_count: StoredFile.ref_count - n}, synchronize_session=False
+        )
+        deleted = StoredFile.query.filter(
+            StoredFile.id == stored.id, StoredFile.ref_count <= 0
+        ).delete(synchronize_session=False)
+        if deleted:
+            released.append(url)
+    
+    for url in released:
+        enqueue_after_commit(db.session, 'delete_file', {'url': url})
+    return released
+
+
+@register('delete_file')
+def _delete_released_file(payload):
+    """任务：删除已无引用的文件（期间被重新登记的文件保留）"""
+    url = payload['url']
+    storage = get_storage()
+    if not storage.key_of(url):
+        # 不是本存储中的文件（如外部图片链接），无需删除，也不应重试
+        current_app.logger.info(f"跳过删除非本地存储文件: {url}")
+        return
+    if StoredFile.query.filter_by(url=url).first() is None:
+        storage.remove(url)
+
+
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
     allowed_extensions = current_app.config['ALLOWED_EXTENSIONS']
@@ -0,0 +1,44 @@
+"""
+HTTP 条件请求助手
+基于日程数据版本号生成 ETag，并处理 If-None-Match
+"""
+import hashlib
+from flask import request, Response
+from werkzeug.http import quote_etag
+from models import DataVersion, EVENTS_VERSION
+
+
+def event_validator():
+    """
+    日程数据的校验值
+    
+    读取日程版本号（data_versions 表的主键查询），日程、人员或参与关系的
+    任何写入都会在同一事务中递增版本号，因此代价与数据量和查询范围无关。
+    
+    Returns:
+        tuple: 校验值
+    """
+    return (DataVersion.current(EVENTS_VERSION),)
+
+
+def make_etag(*parts):
+    """根据任意可 repr 的部分生成 ETag（不含引号）"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag):
+    """客户端携带的 If-None-Match 是否与当前 ETag 匹配"""
+    return request.if_none_match.contains(etag)
+
+
+def not_modified_response(etag):
+    """构造 304 响应"""
+    return Response(status=304, headers=etag_headers(etag))
+
+
+def etag_headers(etag):
+    """附加在 200 响应上的缓存相关响应头"""
+    return {
+        'ETag': quote_etag(etag),
+        'Cache-Control': 'no-cache'
+    }
@@ -0,0 +1,196 @@
+"""
+iCalendar (.ics) 订阅源生成
+每个日程的 VEVENT 文本按修订号缓存，只有发生变化的日程才会重新生成
+"""
+from datetime import timedelta
+from models import Event
+from utils.cache import LRUCache
+
+PRODID = '-//QD-Calendar//QD Calendar Feed//ZH'
+
+STATUS_MAP = {
+    'pending': 'TENTATIVE',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED'
+}
+
+PRIORITY_MAP = {
+    'high': 1,
+    'medium': 5,
+    'low': 9
+}
+
+# 单个日程的 VEVENT 文本缓存：key 为日程 ID，value 为 (修订号, 更新时间, 文本)
+vevent_cache = LRUCache(maxsize=5000)
+
+# 订阅源缓存：key 为过滤条件，value 为 (ETag, 完整文本)
+feed_cache = LRUCache(maxsize=64)
+
+
+def escape_text(value):
+    """按 RFC 5545 转义 TEXT 值"""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """按 75 字节折行（不拆分多字节字符）"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    
+    parts = []
+    current = ''
+    current_size = 0
+    limit = 75
+    for char in line:
+        size = len(char.encode('utf-8'))
+        if current_size + size > limit:
+            parts.append(current)
+            current = char
+            current_size = size
+            limit = 74  # 续行以一个空格开头
+        else:
+            current += char
+            current_size += size
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _format_utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_vevent(event):
+    """生成单个日程的 VEVENT 文本"""
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.id}@qd-calendar',
+        f'DTSTAMP:{_format_utc(event.updated_at or event.created_at)}',
+        f'SEQUENCE:{event.revision or 0}'
+    ]
+    
+    if event.start_time:
+        # 无时区的本地时间（floating time），由订阅客户端按本地时区显示
+        lines.append(f"DTSTART:{event.event_date.strftime('%Y%m%d')}T{event.start_time.strftime('%H%M%S')}")
+        if event.end_time:
+            lines.append(f"DTEND:{event.event_date.strftime('%Y%m%d')}T{event.end_time.strftime('%H%M%S')}")
+    else:
+        # 未设置开始时间的日程作为全天事件
+        lines.append(f"DTSTART;VALUE=DATE:{event.event_date.strftime('%Y%m%d')}")
+        lines.append(f"DTEND;VALUE=DATE:{(event.event_date + timedelta(days=1)).strftime('%Y%m%d')}")
+    
+    if event.recurrence_freq:
+        lines.extend(_recurrence_lines(event))
+    
+    lines.append(f'SUMMARY:{escape_text(event.title)}')
+    if event.description:
+        lines.append(f'DESCRIPTION:{escape_text(event.description)}')
+    if event.location:
+        lines.append(f'LOCATION:{escape_text(event.location)}')
+    if event.organizer_department:
+        lines.append(f'CATEGORIES:{escape_text(event.organizer_department)}')
+    if event.status in STATUS_MAP:
+        lines.append(f'STATUS:{STATUS_MAP[event.status]}')
+    if event.priority in PRIORITY_MAP:
+        lines.append(f'PRIORITY:{PRIORITY_MAP[event.priority]}')
+    if event.updated_at:
+        lines.append(f'LAST-MODIFIED:{_format_utc(event.updated_at)}')
+    lines.append('END:VEVENT')
+    
+    return ''.join(fold_line(line) for line in lines)
+
+
+def _recurrence_lines(event):
+    """重复日程的 RRULE / EXDATE 行"""
+    rule = f'RRULE:FREQ={event.recurrence_freq.upper()}'
+    if event.recurrence_interval and event.recurrence_interval > 1:
+        rule += f';INTERVAL={event.recurrence_interval}'
+    if event.recurrence_count:
+        rule += f';COUNT={event.recurrence_count}'
+    elif event.recurrence_until:
+        rule += f";UNTIL={event.recurrence_until.strftime('%Y%m%d')}"
+        if event.start_time:
+            rule += 'T235959'
+    lines = [rule]
+    
+    exdates = event.recurrence_dict()['exdates']
+    if exdates:
+        if event.start_time:
+            suffix = 'T' + event.start_time.strftime('%H%M%S')
+            lines.append('EXDATE:' + ','.join(d.replace('-', '') + suffix for d in exdates))
+        else:
+            lines.append('EXDATE;VALUE=DATE:' + ','.join(d.replace('-', '') for d in exdates))
+    return lines
+
+
+def calendar_header(name):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}'
+    ]
+    return ''.join(fold_line(line) for line in lines)
+
+
+def calendar_footer():
+    return 'END:VCALENDAR\r\n'
+
+
+def iter_vevents(filters, batch_size=500):
+    """
+    按日程顺序输出 VEVENT 文本
+    
+    先只查询 (id, 修订号, 更新时间)，命中缓存的日程直接复用文本，
+    其余日程按批加载完整数据并重新生成。
+    """
+    versions = Event.query.with_entities(
+        Event.id, Event.revision, Event.updated_at
+    ).filter(*filters).order_by(
+        Event.event_date.asc(), Event.start_time.asc(), Event.id.asc()
+    ).all()
+    
+    for start in range(0, len(versions), batch_size):
+        batch = versions[start:start + batch_size]
+        
+        texts = {}
+        stale_ids = []
+        for event_id, revision, updated_at in batch:
+            cached, _ = vevent_cache.get(event_id)
+            if cached is not None and cached[:2] == (revision, updated_at):
+                texts[event_id] = cached[2]
+            else:
+                stale_ids.append(event_id)
+        
+        if stale_ids:
+            for event in Event.query.filter(Event.id.in_(stale_ids)).all():
+                text = render_vevent(event)
+                vevent_cache.set(event.id, (event.revision, event.updated_at, text))
+                texts[event.id] = text
+        
+        yield ''.join(texts[event_id] for event_id, _, _ in batch if event_id in texts)
+
+
+def iter_feed(filters, name, cache_key, etag, generation):
+    """流式输出完整订阅源，输出完毕后写入订阅源缓存"""
+    parts = [calendar_header(name)]
+    yield parts[0]
+    
+    for chunk in iter_vevents(filters):
+        parts.append(chunk)
+        yield chunk
+    
+    parts.append(calendar_footer())
+    yield parts[-1]
+    
+    feed_cache.set(cache_key, (etag, ''.join(parts)), generation)
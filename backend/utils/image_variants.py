@@ -0,0 +1,228 @@
+"""
+图片衍生尺寸生成
+上传后在后台进程池中为原图生成固定宽度的 WebP 和 JPEG 缩略图，
+生成完成后写入清单文件（<sha256>.variants.json）；清单存在前接口回退使用原图
+"""
+import os
+import json
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from utils.cache import TTLCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 未安装时不生成衍生图，接口始终返回原图
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = '.variants.json'
+
+# 衍生图 URL 缓存：key 为原图 URL，value 为 {宽度: {...}}，清单不存在时为 False
+# 设置过期时间，使其他进程生成完成的衍生图也能在短时间内被读到
+variant_cache = TTLCache(maxsize=5000, ttl=30)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def available():
+    """是否可以生成衍生图（需要安装 Pillow）"""
+    return Image is not None
+
+
+def _source_path(url):
+    """
+    原图 URL 对应的本地路径，非本地存储后端或不是上传文件时返回 None
+    
+    通过 get_storage() 解析，与上传、删除使用同一个存储实例和 URL 规则。
+    """
+    from utils.file_storage import get_storage  # file_storage 导入了本模块，在此延迟导入
+    
+    storage = get_storage()
+    if storage.backend.local_path('') is None:
+        return None
+    key = storage.key_of(url)
+    return storage.backend.local_path(key) if key else None
+
+
+def manifest_path(source_path):
+    """原图对应的清单文件路径"""
+    return os.path.splitext(source_path)[0] + MANIFEST_SUFFIX
+
+
+def _atomic_write(path, write):
+    """写入同目录临时文件后原子重命名"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_variants(source_path, widths, quality):
+    """
+    生成衍生图并写入清单（在子进程中执行）
+    
+    只生成不超过原图宽度的尺寸；原图比最小尺寸还窄时按原宽度生成一份。
+    
+    Returns:
+        dict: 清单内容
+    """
+    base = os.path.splitext(source_path)[0]
+    variants = {}
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        targets = [w for w in widths if w <= img.width] or [img.width]
+        for width in targets:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.LANCZOS)
+            if resized.mode not in ('RGB', 'RGBA'):
+                resized = resized.convert('RGBA')
+            
+            files = {}
+            for fmt, ext, frame in (
+                ('WEBP', 'webp', resized),
+                ('JPEG', 'jpg', resized.convert('RGB')),
+            ):
+                out_path = f"{base}_w{width}.{ext}"
+                _atomic_write(out_path, lambda f: frame.save(f, fmt, quality=quality))
+                files[fmt.lower()] = os.path.basename(out_path)
+            variants[str(width)] = dict(files, width=width, height=height)
+    
+    manifest = {'source': os.path.basename(source_path), 'variants': variants}
+    _atomic_write(manifest_path(source_path), lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+    return manifest
+
+
+def _get_executor(max_workers):
+    """
+    后台进程池（首次调用时创建，之后复用）
+    
+    子进程以 spawn 方式启动：Web 进程中已有任务队列、密码哈希等线程在运行，
+    fork 会把这些线程持有的锁原样复制到子进程中。
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def _discard_executor(executor):
+    """丢弃已损坏的进程池（其他线程已经替换过时不再处理）"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def schedule(url, on_ready=None):
+    """
+    为已保存的原图提交后台生成任务（不阻塞上传请求）
+    
+    Args:
+        url: 原图 URL
+        on_ready: 生成成功后调用的回调（在回调线程中执行，参数为原图 URL）
+    
+    Returns:
+        bool: 是否已提交
+    """
+    source_path = _source_path(url)
+    if not available() or not source_path or os.path.exists(manifest_path(source_path)):
+        return False
+    
+    executor = _get_executor(current_app.config['IMAGE_VARIANT_WORKERS'])
+    try:
+        future = executor.submit(
+            generate_variants, source_path,
+            tuple(current_app.config['IMAGE_VARIANT_WIDTHS']),
+            current_app.config['IMAGE_VARIANT_QUALITY']
+        )
+    except (BrokenProcessPool, RuntimeError) as e:
+        # 子进程被杀死后进程池不再可用：丢弃它，下次提交时重新创建
+        _discard_executor(executor)
+        logger.error(f"提交衍生图任务失败 {url}: {e}")
+        return False
+    
+    def _done(f):
+        variant_cache.invalidate(url)
+        if f.exception() is not None:
+            logger.error(f"生成衍生图失败 {url}: {f.exception()}")
+        elif on_ready is not None:
+            on_ready(url)
+    
+    future.add_done_callback(_done)
+    return True
+
+
+def variant_urls(url):
+    """
+    原图的衍生图 URL
+    
+    Returns:
+        dict: {'320': {'webp': url, 'jpeg': url, 'width': 320, 'height': 180}, ...}，
+              衍生图尚未生成或不可用时返回 None（调用方使用原图）
+    """
+    source_path = _source_path(url)
+    if not source_path:
+        return None
+    
+    cached, generation = variant_cache.get(url)
+    if cached is not None:
+        return cached or None
+    
+    try:
+        with open(manifest_path(source_path), 'rb') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # 未就绪（或旧版文件没有衍生图）：短时间内不再重复读取
+        variant_cache.set(url, False, generation)
+        return None
+    
+    prefix = url.rsplit('/', 1)[0]
+    urls = {
+        width: {
+            key: (f"{prefix}/{value}" if key in ('webp', 'jpeg') else value)
+            for key, value in info.items()
+        }
+        for width, info in manifest['variants'].items()
+    }
+    variant_cache.set(url, urls, generation)
+    return urls
+
+
+def remove_variants(source_path, url=None):
+    """删除原图的衍生图和清单（删除原图前调用）"""
+    manifest_file = manifest_path(source_path)
+    try:
+        with open(manifest_file, 'rb') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {'variants': {}}
+    
+    folder = os.path.dirname(source_path)
+    for info in manifest['variants'].values():
+        for key in ('webp', 'jpeg'):
+            path = os.path.join(folder, info.get(key, ''))
+            if info.get(key) and os.path.exists(path):
+                os.remove(path)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    if url:
+        variant_cache.invalidate(url)
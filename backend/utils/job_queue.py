@@ -0,0 +1,247 @@
+"""
+提交后执行的持久化任务队列
+删除文件等副作用在数据库事务成功提交后才写入本地 SQLite 日志，
+由后台工作线程执行，失败按指数退避重试；进程重启后未完成的任务会继续执行
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from sqlalchemy import event
+from sqlalchemy.orm import Session, scoped_session
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    locked_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at);
+'''
+
+# 任务处理函数：key 为任务类型，value 为 handler(payload)
+_handlers = {}
+
+
+def register(kind):
+    """装饰器：注册任务处理函数（在应用上下文中执行，抛出异常即视为失败并重试）"""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+class JobQueue:
+    """SQLite 日志 + 工作线程池"""
+    
+    def __init__(self):
+        self.path = None
+        self.app = None
+        self.workers = 0
+        self.max_attempts = 5
+        self.backoff = 2.0
+        self.lease = 60
+        self.poll_interval = 1.0
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._counter_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+    
+    def init_app(self, app):
+        """根据配置打开任务日志并启动工作线程（JOB_QUEUE_WORKERS 为 0 时在提交后同步执行）"""
+        self.app = app
+        self.path = app.config['JOB_QUEUE_PATH']
+        self.workers = app.config['JOB_QUEUE_WORKERS']
+        self.max_attempts = app.config['JOB_QUEUE_MAX_ATTEMPTS']
+        self.backoff = app.config['JOB_QUEUE_RETRY_BACKOFF']
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        
+        if self.workers and not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def _connect(self):
+        """打开任务日志（自动提交模式，用完即关闭）"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return closing(conn)
+    
+    def enqueue(self, jobs):
+        """写入任务日志并唤醒工作线程，jobs 为 [(任务类型, 参数字典), ...]"""
+        if not jobs:
+            return
+        
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO jobs (kind, payload, run_at, created_at) VALUES (?, ?, ?, ?)',
+                [(kind, json.dumps(payload), now, now) for kind, payload in jobs]
+            )
+        
+        if self.workers:
+            with self._wakeup:
+                self._wakeup.notify(len(jobs))
+        else:
+            # 未启用工作线程（测试、脚本）：立即在当前线程执行
+            while self.run_once():
+                pass
+    
+    def _claim(self):
+        """领取一个到期任务（租约到期前其他线程/进程不会重复领取）"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                "WHERE status = 'pending' AND run_at <= ? AND (locked_until IS NULL OR locked_until < ?) "
+                "ORDER BY run_at, id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE jobs SET locked_until = ? WHERE id = ?', (now + self.lease, row[0]))
+            conn.execute('COMMIT')
+            return row
+    
+    def run_once(self):
+        """执行一个到期任务，没有任务时返回 False"""
+        row = self._claim()
+        if row is None:
+            return False
+        
+        job_id, kind, payload, attempts = row
+        try:
+            handler = _handlers[kind]
+            with self.app.app_context():
+                handler(json.loads(payload))
+        except Exception as e:
+            self._fail(job_id, kind, attempts + 1, e)
+        else:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            with self._counter_lock:
+                self.processed += 1
+        return True
+    
+    def _fail(self, job_id, kind, attempts, error):
+        """记录失败：未超过次数时按指数退避重试，否则标记为 dead"""
+        dead = attempts >= self.max_attempts
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET attempts = ?, status = ?, run_at = ?, locked_until = NULL, last_error = ? '
+                'WHERE id = ?',
+                (attempts, 'dead' if dead else 'pending',
+                 time.time() + self.backoff * (2 ** (attempts - 1)), str(error)[:1000], job_id)
+            )
+        with self._counter_lock:
+            if dead:
+                self.failed += 1
+            else:
+                self.retried += 1
+        logger.warning(f"任务 {kind}#{job_id} 第 {attempts} 次执行失败{'，已放弃' if dead else ''}: {error}")
+    
+    def _worker(self):
+        while not self._stopping:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error(f"任务队列工作线程出错: {e}")
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+    
+    def stats(self):
+        """队列深度与执行计数"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kind, status, COUNT(*), MIN(created_at) FROM jobs GROUP BY kind, status"
+            ).fetchall()
+        
+        depth = {}
+        pending = dead = 0
+        oldest = None
+        for kind, status, count, created_at in rows:
+            if status == 'pending':
+                pending += count
+                depth[kind] = count
+                oldest = created_at if oldest is None else min(oldest, created_at)
+            else:
+                dead += count
+        
+        return {
+            'workers': self.workers,
+            'pending': pending,
+            'dead': dead,
+            'depth_by_kind': depth,
+            'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else None,
+            'processed': self.processed,
+            'retried': self.retried,
+            'failed': self.failed
+        }
+
+
+# 全局任务队列：由 create_app 调用 init_app 初始化
+job_queue = JobQueue()
+
+
+def enqueue_after_commit(session, kind, payload):
+    """
+    登记在当前事务成功提交后才写入队列的任务（回滚时丢弃）
+    
+    任务记在登记时最内层的事务（保存点）上：保存点回滚只丢弃在其中登记的任务，
+    最外层事务提交后才写入队列。
+    
+    任务在数据库提交之后才写入日志，两者之间进程崩溃会丢失任务；
+    目前只有 delete_file 任务，丢失的删除由 gc_uploads.py 按日程引用回收。
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    session.info.setdefault('pending_jobs', []).append((transaction, kind, payload))
+
+
+def _started_within(transaction, ancestor):
+    """transaction 是否就是 ancestor 或其内层的保存点"""
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_pending(session):
+    if session.in_nested_transaction():
+        return  # 释放保存点，外层事务尚未提交
+    jobs = session.info.pop('pending_jobs', None)
+    if jobs:
+        job_queue.enqueue([(kind, payload) for _, kind, payload in jobs])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('pending_jobs', None)
+    elif previous_transaction.nested and session.info.get('pending_jobs'):
+        session.info['pending_jobs'] = [
+            job for job in session.info['pending_jobs']
+            if not _started_within(job[0], previous_transaction)
+        ]
@@ -0,0 +1,161 @@
+"""
+人员搜索索引
+为姓名、部门、职位维护单字 + 双字 n-gram 倒排索引，
+中文姓名和英文文本都能走索引做子串匹配，避免前置通配符 LIKE 全表扫描
+"""
+from sqlalchemy import func, case, literal, select, union_all, exists, false
+from models import db, Member, member_search_grams
+
+SEARCH_FIELDS = ('name', 'department', 'position')
+
+# 候选人员除出发片段外最多再校验的片段数，其余片段由子串校验保证
+MAX_CHECKED_GRAMS = 3
+
+
+def _encode(gram):
+    """
+    片段编码为码点十六进制串
+    
+    纯 ASCII 的编码结果不受 MySQL 大小写/重音不敏感排序规则影响，
+    避免 'é' 与 'e' 这类片段在主键上冲突。
+    """
+    return '.'.join(f'{ord(char):x}' for char in gram)
+
+
+def _grams_of(text):
+    """文本的单字与双字片段编码（小写，忽略包含空白的片段）"""
+    text = (text or '').lower()
+    grams = set()
+    for i, char in enumerate(text):
+        if not char.isspace():
+            grams.add(_encode(char))
+            pair = text[i:i + 2]
+            if len(pair) == 2 and not pair[1].isspace():
+                grams.add(_encode(pair))
+    return grams
+
+
+def member_grams(member):
+    """人员所有可搜索字段的片段集合"""
+    grams = set()
+    for field in SEARCH_FIELDS:
+        grams |= _grams_of(getattr(member, field))
+    return grams
+
+
+def query_grams(term):
+    """搜索词需要全部命中的片段：单字词用单字，否则用全部双字片段"""
+    grams = _grams_of(term)
+    pairs = {gram for gram in grams if '.' in gram}
+    return pairs or grams
+
+
+def reindex_members(members):
+    """重建这些人员的索引片段（在当前事务内执行）"""
+    members = [member for member in members if member.id is not None]
+    if not members:
+        return
+    
+    remove_members([member.id for member in members])
+    rows = [
+        {'gram': gram, 'member_id': member.id}
+        for member in members
+        for gram in member_grams(member)
+    ]
+    if rows:
+        db.session.execute(member_search_grams.insert(), rows)
+
+
+def remove_members(member_ids):
+    """删除这些人员的索引片段"""
+    if member_ids:
+        db.session.execute(
+            member_search_grams.delete().where(member_search_grams.c.member_id.in_(member_ids))
+        )
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _posting_counts(grams, cap):
+    """
+    一次查询得到每个片段的倒排记录数（最多统计到 cap + 1 条，cap 为 0 时不限）
+    """
+    parts = []
+    for gram in grams:
+        postings = select(member_search_grams.c.member_id).where(member_search_grams.c.gram == gram)
+        if cap:
+            postings = postings.limit(cap + 1)
+        parts.append(
+            select(literal(gram).label('gram'), func.count().label('postings'))
+            .select_from(postings.subquery())
+        )
+    return dict(db.session.execute(union_all(*parts)).all())
+
+
+def candidate_filter(grams, cap):
+    """
+    只保留包含全部片段的候选人员的过滤条件
+    
+    先统计各片段的倒排记录数，从最少的片段出发按主键 (gram, member_id) 顺序扫描其全部倒排记录，
+    再按主键校验其后最少的 MAX_CHECKED_GRAMS 个片段，扫描量与常见片段的记录总数无关。
+    
+    Returns:
+        过滤条件；有片段没有任何记录时为 false()，
+        最少的片段也超过 cap 条记录（索引过滤不掉多少人员）时返回 None，由调用方直接做子串匹配
+    """
+    counts = _posting_counts(grams, cap)
+    driving, *checked = sorted(grams, key=lambda gram: (counts.get(gram, 0), gram))
+    if not counts.get(driving):
+        return false()
+    if cap and counts[driving] > cap:
+        return None
+    
+    postings = (
+        select(member_search_grams.c.member_id)
+        .where(member_search_grams.c.gram == driving)
+        .subquery()
+    )
+    others = member_search_grams.alias()
+    return Member.id.in_(select(postings.c.member_id).where(*(
+        exists().where(others.c.member_id == postings.c.member_id, others.c.gram == gram)
+        for gram in checked[:MAX_CHECKED_GRAMS]
+    )))
+
+
+def apply_search(query, term, max_candidates=0):
+    """
+    为人员查询加上搜索条件与相关度排序
+    
+    先通过倒排索引找出包含全部片段的候选人员（见 candidate_filter），
+    再对候选人员做精确子串校验；排序：姓名完全匹配 > 姓名前缀 > 姓名包含 > 部门/职位前缀 > 其他。
+    候选记录超过 max_candidates 条时不使用索引，直接做子串匹配，结果始终完整。
+    """
+    grams = query_grams(term)
+    contains = f'%{_escape_like(term)}%'
+    prefix = f'{_escape_like(term)}%'
+    
+    candidates = candidate_filter(grams, max_candidates) if grams else None
+    if candidates is not None:
+        query = query.filter(candidates)
+    
+    query = query.filter(
+        db.or_(
+            Member.name.like(contains, escape='\\'),
+            Member.department.like(contains, escape='\\'),
+            Member.position.like(contains, escape='\\')
+        )
+    )
+    
+    rank = case(
+        (func.lower(Member.name) == term.lower(), 0),
+        (Member.name.like(prefix, escape='\\'), 1),
+        (Member.name.like(contains, escape='\\'), 2),
+        (db.or_(
+            Member.department.like(prefix, escape='\\'),
+            Member.position.like(prefix, escape='\\')
+        ), 3),
+        else_=4
+    )
+    return query.order_by(rank, Member.created_at.desc())
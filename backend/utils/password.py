@@ -0,0 +1,157 @@
+"""
+密码哈希工具
+密码哈希和校验在独立的有界线程池中执行，避免登录高峰占满请求线程；
+排队已满时立即拒绝（接口返回 503），并记录哈希耗时指标
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# 方法参数缺省时 Werkzeug 使用的默认值，用于把配置补全为哈希串中保存的完整形式
+_METHOD_DEFAULTS = {
+    'pbkdf2': ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)],
+    'scrypt': ['32768', '8', '1'],
+}
+
+
+class HasherBusy(Exception):
+    """哈希线程池排队已满或等待超时"""
+
+
+def normalize_method(method):
+    """
+    把哈希方法补全为哈希串中保存的形式
+    
+    例如 'pbkdf2' -> 'pbkdf2:sha256:600000'，'scrypt' -> 'scrypt:32768:8:1'
+    """
+    name, *args = method.split(':')
+    defaults = _METHOD_DEFAULTS.get(name)
+    if defaults is None:
+        raise ValueError(f'不支持的密码哈希方法: {method}')
+    return ':'.join([name] + args + defaults[len(args):])
+
+
+def method_of(password_hash):
+    """哈希串使用的方法（'$' 之前的部分）"""
+    return (password_hash or '').split('$', 1)[0]
+
+
+class PasswordHasher:
+    """有界线程池上的密码哈希器"""
+    
+    def __init__(self, method='scrypt', workers=2, queue_depth=16, timeout=10):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._latencies = {'hash': deque(maxlen=1024), 'verify': deque(maxlen=1024)}
+        self._counts = {'hash': 0, 'verify': 0}
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.configure(method, workers, queue_depth, timeout)
+    
+    def configure(self, method, workers, queue_depth, timeout):
+        """调整哈希方法和线程池参数（应用启动时调用）"""
+        with self._lock:
+            self.method = normalize_method(method)
+            self.workers = workers
+            self.queue_depth = queue_depth
+            self.timeout = timeout
+            old, self._executor = self._executor, ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='password-hash'
+            )
+        if old is not None:
+            old.shutdown(wait=False)
+    
+    def hash(self, password):
+        """生成密码哈希"""
+        return self._run('hash', generate_password_hash, password, method=self.method)
+    
+    def verify(self, password_hash, password):
+        """校验密码"""
+        return self._run('verify', check_password_hash, password_hash, password)
+    
+    def rehash(self, password):
+        """按当前策略重新生成哈希（登录时发现旧策略哈希后调用）"""
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return new_hash
+    
+    def needs_rehash(self, password_hash):
+        """哈希串的方法与当前策略不一致时需要重新哈希"""
+        return method_of(password_hash) != self.method
+    
+    def _run(self, op, func, *args, **kwargs):
+        # 正在执行和排队的任务总数超过 workers + queue_depth 时立即拒绝
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise HasherBusy('密码服务繁忙')
+            self._in_flight += 1
+            executor = self._executor
+        
+        try:
+            future = executor.submit(self._timed, op, func, *args, **kwargs)
+        except RuntimeError:
+            self._done()
+            raise HasherBusy('密码服务繁忙')
+        future.add_done_callback(lambda _: self._done())
+        
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 任务仍在线程池中执行，完成后由回调释放名额
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise HasherBusy('密码服务等待超时')
+    
+    def _timed(self, op, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._counts[op] += 1
+                self._latencies[op].append(elapsed)
+    
+    def _done(self):
+        with self._lock:
+            self._in_flight -= 1
+    
+    def stats(self):
+        """线程池状态和哈希耗时（毫秒，按最近 1024 次统计）"""
+        with self._lock:
+            latency = {}
+            for op, samples in self._latencies.items():
+                ordered = sorted(samples)
+                latency[op] = {
+                    'count': self._counts[op],
+                    'avg_ms': round(sum(ordered) / len(ordered), 2) if ordered else None,
+                    'p50_ms': round(ordered[len(ordered) // 2], 2) if ordered else None,
+                    'p95_ms': round(ordered[int(len(ordered) * 0.95)], 2) if ordered else None,
+                    'max_ms': round(ordered[-1], 2) if ordered else None,
+                }
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'in_flight': self._in_flight,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'rehashed': self.rehashed,
+                'latency': latency,
+            }
+
+
+# 全局密码哈希器：参数由 create_app 根据配置调整
+password_hasher = PasswordHasher()
+
+
+def generate_hash(password):
+    """在当前线程按当前策略生成哈希（用于初始化脚本等非请求场景）"""
+    return generate_password_hash(password, method=password_hasher.method)
@@ -0,0 +1,236 @@
+"""
+重复日程
+重复规则（RRULE 子集：按天/周/月、间隔、截止日期或次数、排除日期）保存在日程上，
+查询时只在请求的日期窗口内按需展开为具体日期，展开结果按 (规则, 窗口) 缓存
+"""
+import calendar
+import json
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from models import db, Event
+from utils.cache import LRUCache
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+# 单个重复规则允许的最大次数与间隔
+MAX_COUNT = 1000
+MAX_INTERVAL = 366
+
+# 重复规则：start 为首次日期，exdates 为排除日期的有序元组
+Rule = namedtuple('Rule', 'start freq interval until count exdates')
+
+# 展开结果缓存：key 为 (规则, 窗口起始, 窗口结束)，value 为日期元组
+occurrence_cache = LRUCache(maxsize=4096)
+
+
+def rule_of(event):
+    """日程的重复规则，非重复日程返回 None"""
+    if not event.recurrence_freq:
+        return None
+    return Rule(
+        start=event.event_date,
+        freq=event.recurrence_freq,
+        interval=event.recurrence_interval or 1,
+        until=event.recurrence_until,
+        count=event.recurrence_count,
+        exdates=tuple(sorted(_load_exdates(event.recurrence_exdates)))
+    )
+
+
+def _load_exdates(value):
+    if not value:
+        return []
+    return [datetime.strptime(d, '%Y-%m-%d').date() for d in json.loads(value)]
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} 日期格式错误，应为 YYYY-MM-DD')
+
+
+def parse_recurrence(data, event_date):
+    """
+    解析请求中的 recurrence 字段，返回要写入日程的字段值
+    
+    Args:
+        data: {'freq': 'weekly', 'interval': 1, 'until': '2025-12-31', 'count': None,
+               'exdates': ['2025-11-05']}，为 None 时表示取消重复
+        event_date: 首次日期
+    
+    Raises:
+        ValueError: 规则不合法
+    """
+    if not data:
+        return {
+            'recurrence_freq': None, 'recurrence_interval': 1, 'recurrence_until': None,
+            'recurrence_count': None, 'recurrence_exdates': None, 'recurrence_end': None
+        }
+    
+    if not isinstance(data, dict):
+        raise ValueError('recurrence 格式错误')
+    
+    freq = data.get('freq')
+    if freq not in FREQUENCIES:
+        raise ValueError(f"重复频率必须是 {', '.join(FREQUENCIES)} 之一")
+    
+    interval = data.get('interval') or 1
+    if not isinstance(interval, int) or not 1 <= interval <= MAX_INTERVAL:
+        raise ValueError(f'重复间隔必须是 1-{MAX_INTERVAL} 的整数')
+    
+    until = _parse_date(data['until'], 'until') if data.get('until') else None
+    count = data.get('count')
+    if until and count:
+        raise ValueError('until 和 count 不能同时设置')
+    if until and until < event_date:
+        raise ValueError('重复截止日期不能早于首次日期')
+    if count is not None and (not isinstance(count, int) or not 1 <= count <= MAX_COUNT):
+        raise ValueError(f'重复次数必须是 1-{MAX_COUNT} 的整数')
+    
+    exdates = sorted({_parse_date(d, 'exdates') for d in data.get('exdates') or []})
+    
+    rule = Rule(event_date, freq, interval, until, count, tuple(exdates))
+    return {
+        'recurrence_freq': freq,
+        'recurrence_interval': interval,
+        'recurrence_until': until,
+        'recurrence_count': count,
+        'recurrence_exdates': json.dumps([d.isoformat() for d in exdates]) if exdates else None,
+        'recurrence_end': last_date(rule)
+    }
+
+
+def _add_months(start, months):
+    """start 之后第 months 个月的同一天，该月没有这一天时返回 None"""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    if start.day > calendar.monthrange(year, month)[1]:
+        return None
+    return date(year, month, start.day)
+
+
+def _iter_candidates(rule, window_start):
+    """
+    按顺序生成规则的全部日期（不含排除日期的过滤），从不早于 window_start 的附近开始
+    
+    按天/周重复时直接跳到窗口起点；按月重复时不存在的日期（如 2 月 30 日）
+    不计入次数，需要从首次日期开始计数。
+    """
+    if rule.freq == 'monthly':
+        n = 0
+        months = 0
+        while True:
+            candidate = _add_months(rule.start, months * rule.interval)
+            months += 1
+            if candidate is None:
+                continue
+            if rule.count and n >= rule.count:
+                return
+            n += 1
+            yield candidate
+    else:
+        step = rule.interval * (7 if rule.freq == 'weekly' else 1)
+        k = max(0, -(-(window_start - rule.start).days // step))
+        while True:
+            if rule.count and k >= rule.count:
+                return
+            yield rule.start + timedelta(days=k * step)
+            k += 1
+
+
+def iter_dates(rule, start, end):
+    """生成规则在 [start, end] 内的日期（已去除排除日期）"""
+    exdates = set(rule.exdates)
+    for candidate in _iter_candidates(rule, start):
+        if candidate > end or (rule.until and candidate > rule.until):
+            return
+        if candidate >= start and candidate not in exdates:
+            yield candidate
+
+
+def occurrences(rule, start, end):
+    """规则在 [start, end] 内的日期元组（按规则和窗口缓存）"""
+    key = (rule, start, end)
+    cached, generation = occurrence_cache.get(key)
+    if cached is not None:
+        return cached
+    dates = tuple(iter_dates(rule, start, end))
+    occurrence_cache.set(key, dates, generation)
+    return dates
+
+
+def last_date(rule):
+    """规则的最后一个日期（不考虑排除日期），无限重复时返回 None"""
+    if rule.until:
+        return rule.until
+    if not rule.count:
+        return None
+    last = None
+    for last in _iter_candidates(rule, rule.start):
+        pass
+    return last
+
+
+def window_filter(start=None, end=None):
+    """
+    与日期范围 [start, end] 有交集的日程（任一端为 None 表示不限）
+    
+    单次日程按日期判断，重复日程按首次日期和最后日期判断。
+    """
+    single = [Event.recurrence_freq.is_(None)]
+    series = [Event.recurrence_freq.isnot(None)]
+    if start:
+        single.append(Event.event_date >= start)
+        series.append(db.or_(Event.recurrence_end.is_(None), Event.recurrence_end >= start))
+    if end:
+        single.append(Event.event_date <= end)
+        series.append(Event.event_date <= end)
+    return db.or_(db.and_(*single), db.and_(*series))
+
+
+def order_key(event_date, start_time, event_id):
+    """与列表排序 (event_date, start_time, id) 一致的排序键（start_time 为空时排在前面）"""
+    return (event_date, start_time is not None, start_time or time.min, event_id)
+
+
+def sort_key(event, occurrence_date):
+    """(日程, 日期) 的排序键"""
+    return order_key(occurrence_date, event.start_time, event.id)
+
+
+def expand(events, start, end):
+    """
+    把日程展开为窗口内的 (日程, 日期) 列表并排序，普通日程原样保留
+    """
+    items = []
+    for event in events:
+        rule = rule_of(event)
+        if rule is None:
+            items.append((event, event.event_date))
+        else:
+            items.extend((event, d) for d in occurrences(rule, start, end))
+    items.sort(key=lambda item: sort_key(*item))
+    return items
+
+
+def occurrence_dicts(items, summary=False):
+    """
+    (日程, 日期) 列表转换为字典列表
+    
+    每一项都带有 occurrence_date 字段（普通日程即 event_date），(id, occurrence_date) 可作为每次发生的唯一键；
+    重复日程的每次发生使用发生日期作为 event_date，id 仍为日程 ID，编辑或删除作用于整个系列。
+    """
+    if summary:
+        base = {event.id: event.to_summary_dict() for event, _ in items}
+    else:
+        unique = list({event.id: event for event, _ in items}.values())
+        base = dict(zip((event.id for event in unique), Event.to_dict_batch(unique)))
+    
+    result = []
+    for event, occurrence_date in items:
+        data = dict(base[event.id], occurrence_date=occurrence_date.isoformat())
+        if event.recurrence_freq:
+            data['event_date'] = data['occurrence_date']
+        result.append(data)
+    return result
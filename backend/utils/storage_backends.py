@@ -0,0 +1,222 @@
+"""
+文件存储后端
+FileStorage 通过后端读写文件内容，文件以相对路径（如 'events/ab/cd/<sha256>.png'）为 key：
+- LocalBackend：本地文件系统（默认）
+- MemoryBackend：进程内存（用于测试）
+- S3Backend：S3 兼容对象存储（如 MinIO），需要额外安装 boto3（requirements-s3.txt）
+"""
+import io
+import os
+import threading
+from datetime import datetime, timezone
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # 未安装 boto3 时不能使用 S3Backend
+    boto3 = None
+    ClientError = None
+
+
+class StorageBackend:
+    """存储后端接口"""
+    
+    name = 'base'
+    
+    def save(self, key, tmp_path):
+        """把已写完的临时文件保存为 key（成功后临时文件不再存在）"""
+        raise NotImplementedError
+    
+    def exists(self, key):
+        """key 是否存在"""
+        raise NotImplementedError
+    
+    def delete(self, key):
+        """删除 key，返回是否删除了文件"""
+        raise NotImplementedError
+    
+    def open(self, key):
+        """以二进制只读方式打开 key，不存在时抛出 FileNotFoundError"""
+        raise NotImplementedError
+    
+    def stat(self, key):
+        """返回 {'size': 字节数, 'modified': datetime}，不存在时返回 None"""
+        raise NotImplementedError
+    
+    def local_path(self, key):
+        """key 在本地文件系统中的路径，非本地后端返回 None"""
+        return None
+    
+    def describe(self):
+        """用于日志的后端描述"""
+        return self.name
+
+
+class LocalBackend(StorageBackend):
+    """本地文件系统后端"""
+    
+    name = 'local'
+    
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+    
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+    
+    def save(self, key, tmp_path):
+        path = self.local_path(key)
+        try:
+            # 原子重命名到位：读者不会看到写了一半的文件
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # 目标子目录尚不存在时才创建
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+    
+    def delete(self, key):
+        path = self.local_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        self._cleanup_empty_dirs(os.path.dirname(path))
+        return True
+    
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+    
+    def stat(self, key):
+        try:
+            st = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return {'size': st.st_size, 'modified': datetime.fromtimestamp(st.st_mtime)}
+    
+    def describe(self):
+        return f'local:{self.root}'
+    
+    def _cleanup_empty_dirs(self, dir_path):
+        """逐级清理存储目录下的空目录（失败不影响主流程）"""
+        while dir_path.startswith(self.root) and dir_path != self.root:
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                return
+            dir_path = os.path.dirname(dir_path)
+
+
+class MemoryBackend(StorageBackend):
+    """进程内存后端（用于测试，进程重启后数据丢失）"""
+    
+    name = 'memory'
+    
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+    
+    def save(self, key, tmp_path):
+        with open(tmp_path, 'rb') as f:
+            data = f.read()
+        os.remove(tmp_path)
+        with self._lock:
+            self._files[key] = (data, datetime.now())
+    
+    def exists(self, key):
+        return key in self._files
+    
+    def delete(self, key):
+        with self._lock:
+            return self._files.pop(key, None) is not None
+    
+    def open(self, key):
+        try:
+            data, _ = self._files[key]
+        except KeyError:
+            raise FileNotFoundError(key)
+        return io.BytesIO(data)
+    
+    def stat(self, key):
+        entry = self._files.get(key)
+        if entry is None:
+            return None
+        return {'size': len(entry[0]), 'modified': entry[1]}
+
+
+class S3Backend(StorageBackend):
+    """S3 兼容对象存储后端（AWS S3、MinIO 等）"""
+    
+    name = 's3'
+    
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None):
+        if boto3 is None:
+            raise RuntimeError('STORAGE_BACKEND=s3 需要安装 boto3：pip install -r requirements-s3.txt')
+        if not bucket:
+            raise ValueError('STORAGE_BACKEND=s3 需要配置 S3_BUCKET')
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        # 访问密钥使用 boto3 的默认来源（环境变量、配置文件等）
+        self.client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region or None)
+    
+    def _object_key(self, key):
+        return self.prefix + key
+    
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+    
+    def save(self, key, tmp_path):
+        self.client.upload_file(tmp_path, self.bucket, self._object_key(key))
+        os.remove(tmp_path)
+    
+    def exists(self, key):
+        return self._head(key) is not None
+    
+    def delete(self, key):
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        return True
+    
+    def open(self, key):
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key)
+            raise
+        return io.BytesIO(obj['Body'].read())
+    
+    def stat(self, key):
+        head = self._head(key)
+        if head is None:
+            return None
+        modified = head['LastModified'].astimezone(timezone.utc).replace(tzinfo=None)
+        return {'size': head['ContentLength'], 'modified': modified}
+    
+    def describe(self):
+        return f's3:{self.bucket}/{self.prefix}'
+
+
+def create_backend(config, upload_folder):
+    """根据配置创建存储后端（STORAGE_BACKEND: local / memory / s3）"""
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalBackend(upload_folder)
+    if backend == 'memory':
+        return MemoryBackend()
+    if backend == 's3':
+        return S3Backend(
+            config.get('S3_BUCKET'),
+            prefix=config.get('S3_PREFIX', ''),
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION')
+        )
+    raise ValueError(f'不支持的存储后端: {backend}')
@@ -0,0 +1,223 @@
+"""
+上传文件垃圾回收
+找出不再被任何日程引用的上传文件（表单中放弃的上传、更换背景图片后的旧图等），
+超过保留期后删除或移入隔离目录。按目录逐个处理，可中断后从断点继续
+"""
+import os
+import re
+import json
+import shutil
+import time
+from models import db, Event, StoredFile
+from utils.image_variants import MANIFEST_SUFFIX
+
+# 衍生图文件名：<原图名>_w<宽度>.<webp|jpg>
+VARIANT_RE = re.compile(r'^(?P<stem>.+)_w\d+\.(webp|jpg)$')
+
+STATE_FILE = '.gc_state.json'
+
+
+def referenced_keys(storage, batch_size=5000):
+    """所有日程引用的文件 key（一次流式查询读取）"""
+    keys = set()
+    query = db.session.query(Event.background_image).filter(
+        Event.background_image.isnot(None), Event.background_image != ''
+    ).yield_per(batch_size)
+    for (url,) in query:
+        key = storage.key_of(url)
+        if key:
+            keys.add(key)
+    return keys
+
+
+def iter_dirs(root, start_after=None):
+    """
+    按路径字典序遍历 root 下包含文件的目录，返回 (相对目录, [文件名])
+    
+    跳过以 '.' 开头的目录（临时目录等）；start_after 之前（含）的目录不再返回，
+    与断点无关的子树直接跳过。
+    """
+    def walk(rel):
+        path = os.path.join(root, rel) if rel else root
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except FileNotFoundError:
+            return
+        
+        files = [e.name for e in entries if e.is_file(follow_symlinks=False) and not e.name.startswith('.')]
+        if files and rel and (start_after is None or rel > start_after):
+            yield rel, files
+        
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False) or entry.name.startswith('.'):
+                continue
+            child = f"{rel}/{entry.name}" if rel else entry.name
+            # 断点之前且不是断点祖先的子树已处理过
+            if start_after and child < start_after and not start_after.startswith(child + '/'):
+                continue
+            yield from walk(child)
+    
+    yield from walk('')
+
+
+def _owner(name):
+    """文件所属原图的文件名主干（衍生图和清单归属于原图）"""
+    if name.endswith(MANIFEST_SUFFIX):
+        return name[:-len(MANIFEST_SUFFIX)], False
+    match = VARIANT_RE.match(name)
+    if match:
+        return match.group('stem'), False
+    return os.path.splitext(name)[0], True
+
+
+def find_orphans(rel_dir, files, referenced, root, cutoff):
+    """
+    找出目录中的孤儿文件
+    
+    原图未被引用且修改时间早于 cutoff 时，原图及其衍生图、清单都视为孤儿；
+    原图已不存在的衍生图和清单也视为孤儿。
+    
+    Returns:
+        tuple: (孤儿原图 key 列表, 全部孤儿文件名列表, 因保留期跳过的原图数)
+    """
+    groups = {}
+    for name in files:
+        stem, is_original = _owner(name)
+        group = groups.setdefault(stem, {'originals': [], 'derived': []})
+        group['originals' if is_original else 'derived'].append(name)
+    
+    orphan_keys = []
+    orphan_files = []
+    recent = 0
+    for group in groups.values():
+        keys = [f"{rel_dir}/{name}" for name in group['originals']]
+        if any(key in referenced for key in keys):
+            continue
+        
+        names = group['originals'] + group['derived']
+        mtime = max(os.path.getmtime(os.path.join(root, rel_dir, name)) for name in names)
+        if mtime >= cutoff:
+            recent += len(group['originals'])
+            continue
+        
+        orphan_keys.extend(keys)
+        orphan_files.extend(names)
+    return orphan_keys, orphan_files, recent
+
+
+def still_unreferenced(storage, keys):
+    """删除前按 URL 再查一次，排除遍历期间被新日程引用的文件"""
+    if not keys:
+        return set()
+    urls = {f"{storage.base_url}/{key}": key for key in keys}
+    in_use = {
+        url for (url,) in db.session.query(Event.background_image).filter(
+            Event.background_image.in_(list(urls))
+        )
+    }
+    return {key for url, key in urls.items() if url not in in_use}
+
+
+def collect(storage, grace_seconds, quarantine=None, dry_run=False,
+            resume=False, max_dirs=0, log=print):
+    """
+    回收孤儿上传文件（仅支持本地存储后端）
+    
+    Args:
+        storage: FileStorage 实例
+        grace_seconds: 保留期，修改时间在此之内的文件不处理
+        quarantine: 隔离目录，指定时移动文件而不是删除
+        dry_run: 只统计不修改
+        resume: 从上次中断的目录继续
+        max_dirs: 本次最多处理的目录数（0 表示不限），未处理完时保存断点
+    
+    Returns:
+        dict: 统计信息
+    """
+    root = storage.backend.local_path('')
+    if root is None:
+        raise ValueError('上传文件回收只支持本地存储后端')
+    root = root.rstrip(os.sep)
+    
+    state_path = os.path.join(root, STATE_FILE)
+    start_after = None
+    if resume and os.path.exists(state_path):
+        with open(state_path) as f:
+            start_after = json.load(f).get('last_dir')
+        log(f"[INFO] Resuming after {start_after}")
+    
+    cutoff = time.time() - grace_seconds
+    referenced = referenced_keys(storage)
+    log(f"[INFO] Loaded {len(referenced)} referenced files")
+    
+    stats = {'dirs': 0, 'files': 0, 'orphans': 0, 'recent': 0, 'bytes': 0, 'finished': False}
+    last_dir = None
+    for rel_dir, files in iter_dirs(root, start_after):
+        if max_dirs and stats['dirs'] >= max_dirs:
+            break
+        
+        stats['dirs'] += 1
+        stats['files'] += len(files)
+        orphan_keys, orphan_files, recent = find_orphans(rel_dir, files, referenced, root, cutoff)
+        stats['recent'] += recent
+        
+        confirmed = still_unreferenced(storage, orphan_keys)
+        # 被重新引用的原图连同衍生图一起保留
+        kept_stems = {_owner(key.rsplit('/', 1)[1])[0] for key in orphan_keys if key not in confirmed}
+        removable = [name for name in orphan_files if _owner(name)[0] not in kept_stems]
+        
+        for name in removable:
+            path = os.path.join(root, rel_dir, name)
+            stats['bytes'] += os.path.getsize(path)
+            log(f"[{'DRY-RUN' if dry_run else 'REMOVE'}] {rel_dir}/{name}")
+            if dry_run:
+                continue
+            if quarantine:
+                target = os.path.join(quarantine, rel_dir, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        stats['orphans'] += len(removable)
+        
+        if not dry_run:
+            if confirmed:
+                urls = [f"{storage.base_url}/{key}" for key in confirmed]
+                StoredFile.query.filter(StoredFile.url.in_(urls)).delete(synchronize_session=False)
+                db.session.commit()
+            _remove_if_empty(os.path.join(root, rel_dir), root)
+            
+            last_dir = rel_dir
+            with open(state_path, 'w') as f:
+                json.dump({'last_dir': last_dir}, f)
+    else:
+        stats['finished'] = True
+        if not dry_run and os.path.exists(state_path):
+            os.remove(state_path)
+    
+    stats['tmp_removed'] = 0 if dry_run else clean_tmp(storage.tmp_folder, cutoff)
+    return stats
+
+
+def clean_tmp(tmp_folder, cutoff):
+    """删除中断上传遗留的临时文件"""
+    removed = 0
+    try:
+        entries = list(os.scandir(tmp_folder))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def _remove_if_empty(dir_path, root):
+    """逐级删除空目录"""
+    while dir_path != root and dir_path.startswith(root):
+        try:
+            os.rmdir(dir_path)
+        except OSError:
+            return
+        dir_path = os.path.dirname(dir_path)
@@ -5,6 +5,18 @@ export const getEvents = (params) => {
   return axios.get('/events', { params })
 }
 
+// 获取全部日程（按 next_cursor 逐页读取，直到 has_more 为 false）
+export const getAllEvents = async (params = {}) => {
+  const events = []
+  let cursor = null
+  do {
+    const page = await getEvents({ limit: 500, ...params, ...(cursor ? { cursor } : {}) })
+    events.push(...page.events)
+    cursor = page.has_more ? page.next_cursor : null
+  } while (cursor)
+  return { events, count: events.length }
+}
+
 // 获取单个日程详情
 export const getEvent = (id) => {
   return axios.get(`/events/${id}`)
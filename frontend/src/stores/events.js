@@ -1,6 +1,6 @@
 import { defineStore } from 'pinia'
 import { ref } from 'vue'
-import { getEvents, getEvent, createEvent, updateEvent, deleteEvent, getCalendar } from '@/api/events'
+import { getAllEvents, getEvent, createEvent, updateEvent, deleteEvent, getCalendar } from '@/api/events'
 
 export const useEventsStore = defineStore('events', () => {
   const events = ref([])
@@ -12,7 +12,8 @@ export const useEventsStore = defineStore('events', () => {
   async function fetchEvents(params = {}) {
     loading.value = true
     try {
-      const response = await getEvents(params)
+      // 列表接口按游标分页，管理页面需要全部日程
+      const response = await getAllEvents(params)
       events.value = response.events
       return { success: true, events: response.events }
     } catch (error) {